@@ -1,7 +1,10 @@
 from django.contrib import admin
 from .models import (
     Profile, RoleRequest, LibraryStatus, LabStatus, ClassroomStatus,
-    LibraryUpdateRequest, LabUpdateRequest, RoomRequest, FaultReport
+    LibraryUpdateRequest, LabUpdateRequest, RoomRequest, FaultReport,
+    ImageBlob, Job, DomainEvent, ProjectionCheckpoint, BuildingActivity, UserActivity,
+    Campus, Building, ArchivedRecord, FaultDaily, BookingDaily, FaultStatusChange,
+    Technician, IdempotencyKey,
 )
 
 admin.site.register(Profile)
@@ -13,3 +16,17 @@ admin.site.register(LibraryUpdateRequest)
 admin.site.register(LabUpdateRequest)
 admin.site.register(RoomRequest)
 admin.site.register(FaultReport)
+admin.site.register(ImageBlob)
+admin.site.register(Job)
+admin.site.register(DomainEvent)
+admin.site.register(ProjectionCheckpoint)
+admin.site.register(BuildingActivity)
+admin.site.register(UserActivity)
+admin.site.register(Campus)
+admin.site.register(Building)
+admin.site.register(ArchivedRecord)
+admin.site.register(FaultDaily)
+admin.site.register(BookingDaily)
+admin.site.register(FaultStatusChange)
+admin.site.register(Technician)
+admin.site.register(IdempotencyKey)
@@ -0,0 +1,83 @@
+"""
+Compare-and-set status transitions for approval requests.
+
+Room, library, lab and role requests carry a version that every status
+change increments. An approval or rejection reads the pending request,
+then moves it out of "pending" with a single UPDATE ... WHERE
+status = 'pending' AND version = <the version it read>, as the first write
+of the view's transaction. When two managers decide on the same request at
+once, exactly one UPDATE matches a row. The other one sees no match and
+returns 409 straight away, without waiting on the winner's row lock or
+writing anything else. A client can also send the version it was shown
+(the list endpoints include it), so that a decision made on a stale
+screen is refused in the same way.
+
+transactional only rolls back on a 5xx, so a view that fails after its
+transition has to call rollback() itself. conflict() does that for you.
+"""
+import json
+
+from django.db import transaction
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .routing import write_databases
+
+
+def expected_version(request):
+    """The version the client decided on, from the JSON body, or None.
+
+    Raises ValueError if it is not a whole number.
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return None
+    raw = data.get("version") if isinstance(data, dict) else None
+    if raw is None or raw == "":
+        return None
+    if isinstance(raw, bool) or not str(raw).isdigit():
+        raise ValueError("version must be a non-negative integer")
+    return int(raw)
+
+
+def transition(req, status, version=None, **fields):
+    """Move a pending request to `status` if nobody changed it since it was read.
+
+    `version` defaults to the one on `req`. On success the UPDATE also sets
+    `fields`, `req` is updated in place and True is returned; otherwise
+    nothing is written and False is returned.
+    """
+    model = type(req)
+    version = req.version if version is None else version
+    if any(field.name == "updated_at" for field in model._meta.concrete_fields):
+        fields.setdefault("updated_at", timezone.now())
+    changed = model._base_manager.filter(pk=req.pk, status="pending", version=version).update(
+        status=status, version=F("version") + 1, **fields
+    )
+    if not changed:
+        return False
+    req.status = status
+    req.version = version + 1
+    for name, value in fields.items():
+        setattr(req, name, value)
+    return True
+
+
+def rollback():
+    """Undo the writes of the current transactional view without a 5xx."""
+    for alias in write_databases():
+        if transaction.get_connection(alias).in_atomic_block:
+            transaction.set_rollback(True, using=alias)
+
+
+def conflict(req):
+    """409 for a request that was decided or changed by someone else."""
+    current = type(req)._base_manager.filter(pk=req.pk).values("status", "version").first() or {}
+    rollback()
+    return JsonResponse({
+        "message": "This request was already handled or changed by someone else",
+        "status": current.get("status"),
+        "version": current.get("version"),
+    }, status=409)
@@ -0,0 +1,180 @@
+"""
+Archival of settled fault reports and requests.
+
+Resolved/closed faults and approved/rejected room, role and update requests
+are moved out of their hot tables once they have been settled for longer
+than ARCHIVE_AFTER_DAYS (`manage.py archive_settled`, run from cron). Each
+row becomes an ArchivedRecord holding its serialized fields, partitioned by
+kind and by the month it was created in, so the hot tables and their
+indexes only hold rows that are still live.
+
+Rows are moved in batches of a few hundred, each batch in its own
+transaction: copy into the archive, check that every row was stored, drop
+the search index entries, delete the originals. Records are keyed by the
+database they came from as well as the row id, since campus databases
+number their rows independently. Approved bookings are only archived once their last
+occurrence is past the cutoff, so conflict checks never miss them, and a
+fault is kept while an open duplicate still points at it.
+
+Archived rows come back as unsaved model instances (restore(), get()), so
+views render them with the same code as live rows; with_archived() merges them
+into a live list for the ?include_archived=1 query path. The archive always
+lives on the primary database.
+"""
+import contextlib
+import heapq
+from collections import namedtuple
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.core import serializers
+from django.db import router, transaction
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
+
+from . import resultcache, search
+from .models import (
+    ArchivedRecord, FaultReport, RoomRequest, RoleRequest,
+    LibraryUpdateRequest, LabUpdateRequest,
+)
+from .routing import write_databases
+
+OPEN_FAULT_STATUSES = ["open", "in_progress", "done"]
+
+# model, owner field, path to the campus id, cached list endpoint
+Kind = namedtuple("Kind", "model owner campus endpoint")
+
+KINDS = {
+    "faultreport": Kind(FaultReport, "reported_by", "campus_id", "faults"),
+    "roomrequest": Kind(RoomRequest, "requested_by", "campus_id", "room_requests"),
+    "rolerequest": Kind(RoleRequest, "user", None, None),
+    "libraryupdaterequest": Kind(LibraryUpdateRequest, "requested_by", "library__campus_id", None),
+    "labupdaterequest": Kind(LabUpdateRequest, "requested_by", "lab__campus_id", None),
+}
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, "ARCHIVE_AFTER_DAYS", 180))
+
+
+def settled(kind, cutoff):
+    """Rows of a kind that were settled before `cutoff` (an aware datetime)."""
+    model = KINDS[kind].model
+    qs = model._default_manager.all()
+    if kind == "faultreport":
+        return qs.filter(status__in=["resolved", "closed"], updated_at__lt=cutoff).exclude(
+            duplicates__status__in=OPEN_FAULT_STATUSES
+        )
+    if kind == "roomrequest":
+        last_day = cutoff.date()
+        return qs.filter(
+            Q(status="rejected", updated_at__lt=cutoff)
+            | Q(status="approved", recurrence="", requested_date__lt=last_day)
+            | (Q(status="approved", recurrence_until__lt=last_day) & ~Q(recurrence=""))
+        )
+    if kind == "rolerequest":
+        # Role requests have no updated_at; they are settled soon after creation
+        return qs.filter(status__in=["approved", "rejected"], created_at__lt=cutoff)
+    return qs.filter(status__in=["approved", "rejected"], updated_at__lt=cutoff)
+
+
+@contextlib.contextmanager
+def _atomic():
+    # The primary, which holds the archive, is entered last so it commits
+    # first: if the campus database then fails to commit, the originals
+    # are still there and the next run archives them again
+    with contextlib.ExitStack() as atomic:
+        for alias in reversed(write_databases()):
+            atomic.enter_context(transaction.atomic(using=alias))
+        yield
+
+
+def archive_batch(kind, cutoff, batch_size=500):
+    """Move one batch of settled rows into the archive; returns how many."""
+    spec = KINDS[kind]
+    database = router.db_for_write(spec.model)
+    with _atomic():
+        columns = ("pk", spec.campus) if spec.campus else ("pk",)
+        picked = list(settled(kind, cutoff).order_by("pk").values_list(*columns)[:batch_size])
+        if not picked:
+            return 0
+        campus_of = {row[0]: (row[1] if spec.campus else None) for row in picked}
+        rows = list(spec.model._default_manager.filter(pk__in=campus_of).order_by("pk"))
+        records = []
+        for row, item in zip(rows, serializers.serialize("python", rows)):
+            records.append(ArchivedRecord(
+                kind=kind,
+                database=database,
+                record_id=row.pk,
+                month=row.created_at.date().replace(day=1),
+                campus_id=campus_of[row.pk],
+                owner_id=getattr(row, f"{spec.owner}_id"),
+                created_at=row.created_at,
+                data=item["fields"],
+            ))
+        copies = ArchivedRecord.objects.filter(database=database, kind=kind, record_id__in=campus_of)
+        # A copy from a run whose delete did not commit is replaced by the live row
+        copies.delete()
+        ArchivedRecord.objects.bulk_create(records)
+        stored = copies.count()
+        if stored != len(rows):
+            raise RuntimeError(f"Archived {stored} of {len(rows)} {kind} rows; nothing was deleted")
+        if kind == "faultreport":
+            for record in records:
+                search.remove_fault(record.record_id)
+        spec.model._default_manager.filter(pk__in=campus_of).delete()
+        if spec.endpoint:
+            for campus_id in set(campus_of.values()):
+                resultcache.invalidate_campus(spec.endpoint, campus_id)
+    return len(records)
+
+
+def archive(kind, cutoff=None, batch_size=500):
+    """Archive every settled row of a kind visible in the current context."""
+    cutoff = cutoff or default_cutoff()
+    total = 0
+    while True:
+        moved = archive_batch(kind, cutoff, batch_size)
+        total += moved
+        if moved < batch_size:
+            return total
+
+
+def restore(record):
+    """An archived row as an unsaved model instance."""
+    spec = KINDS[record.kind]
+    return next(serializers.deserialize("python", [{
+        "model": spec.model._meta.label_lower,
+        "pk": record.record_id,
+        "fields": record.data,
+    }], ignorenonexistent=True)).object
+
+
+def get(kind, record_id):
+    """The archived row of a kind with this id in the current database, or None."""
+    record = ArchivedRecord.objects.filter(
+        kind=kind, database=router.db_for_write(KINDS[kind].model), record_id=record_id
+    ).first()
+    return restore(record) if record else None
+
+
+def load(kind, campus=None, owner=None):
+    """Archived rows of a kind, newest first, as model instances."""
+    records = ArchivedRecord.objects.filter(kind=kind)
+    if campus is not None:
+        records = records.filter(campus=campus)
+    if owner is not None:
+        records = records.filter(owner=owner)
+    return [restore(record) for record in records.order_by("-created_at")]
+
+
+def with_archived(rows, kind, campus=None, owner=None, related=()):
+    """Merge live `rows` (newest first) with the archived rows of a kind."""
+    archived = load(kind, campus, owner)
+    prefetch_related_objects(archived, *related)
+    return list(heapq.merge(rows, archived, key=attrgetter("created_at"), reverse=True))
+
+
+def include_archived(request):
+    return request.GET.get("include_archived", "").lower() in ("1", "true", "yes")
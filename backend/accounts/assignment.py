@@ -0,0 +1,213 @@
+"""
+Technician roster and load-balanced fault assignment.
+
+Each Technician has skills (fault categories), an on_shift flag and
+open_faults, the number of assigned faults still open or in progress.
+The views keep that counter current: assign() counts a new assignment,
+and track(before, after) moves a fault's count when its technician or
+status changes, in the same way as the occupancy rollups.
+
+A new fault goes to the least-loaded on-shift technician with its
+category. Picking one does not scan the roster. Every process keeps one
+min-heap of (open faults, technician id) per (campus, category), loaded
+from the database on first use and then caught up from the rows whose
+updated_at moved since the last pick, like the duplicate index in
+dedup.py. An entry whose load or shift is out of date is left in the heap
+and dropped when it reaches the top. The current entry was pushed when
+the change was seen.
+
+The database stays the authority. The pick is claimed with one
+compare-and-swap UPDATE that increments open_faults only if the row has
+not changed since it was read. If another worker got there first, the
+row is re-read and the next candidate is tried.
+
+When a technician goes off shift, reassign() hands their open faults,
+most urgent first, to the other qualified technicians on shift. The fault
+rows are written with one UPDATE per receiving technician.
+"""
+import heapq
+import threading
+from datetime import timedelta
+
+from django.db import router
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import FaultReport, Technician
+
+WORKLOAD_STATUSES = ("open", "in_progress")
+
+# Rows updated this close to the last catch-up are read again, since they
+# may have been committed late; a full reload now and then covers writes
+# that were rolled back
+SETTLE = timedelta(seconds=2)
+RELOAD_EVERY = timedelta(minutes=5)
+
+
+class Roster:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (campus id, category) -> [(open faults, technician id)]
+        self._heaps = {}
+        # technician id -> (updated_at, open faults, campus id, skills, on shift)
+        self._techs = {}
+        self._synced_at = None
+        self._loaded_at = None
+
+    def _push(self, tech_id, updated_at, load, campus_id, skills, on_shift):
+        skills = frozenset(skills or ())
+        state = (updated_at, load, campus_id, skills, on_shift)
+        if self._techs.get(tech_id) == state:
+            return
+        self._techs[tech_id] = state
+        if not on_shift:
+            return
+        for category in skills:
+            heap = self._heaps.setdefault((campus_id, category), [])
+            heapq.heappush(heap, (load, tech_id))
+            if len(heap) > 2 * len(self._techs) + 32:
+                self._compact(campus_id, category)
+
+    def _compact(self, campus_id, category):
+        self._heaps[(campus_id, category)] = heap = [
+            (load, tech_id)
+            for tech_id, (_, load, tech_campus, skills, on_shift) in self._techs.items()
+            if tech_campus == campus_id and on_shift and category in skills
+        ]
+        heapq.heapify(heap)
+
+    def _read(self, qs):
+        for row in qs.values_list("id", "updated_at", "open_faults", "campus_id", "skills", "on_shift").iterator():
+            self._push(*row)
+
+    def _catch_up(self):
+        now = timezone.now()
+        if self._loaded_at is None or now - self._loaded_at > RELOAD_EVERY:
+            self._heaps, self._techs = {}, {}
+            self._read(Technician.all_campuses.all())
+            self._loaded_at = now
+        else:
+            self._read(Technician.all_campuses.filter(updated_at__gte=self._synced_at - SETTLE))
+        self._synced_at = now
+
+    def _best(self, campus_id, category):
+        heap = self._heaps.get((campus_id, category), [])
+        while heap:
+            load, tech_id = heap[0]
+            state = self._techs.get(tech_id)
+            if state is not None and state[1] == load and state[4] and category in state[3]:
+                return tech_id
+            heapq.heappop(heap)
+        return None
+
+    def claim(self, campus_id, category):
+        """Count one more fault for the least-loaded qualified technician and return their id."""
+        with self._lock:
+            self._catch_up()
+            while True:
+                tech_id = self._best(campus_id, category)
+                if tech_id is None:
+                    return None
+                updated_at, load, _, skills, on_shift = self._techs[tech_id]
+                now = timezone.now()
+                claimed = Technician.all_campuses.filter(id=tech_id, updated_at=updated_at).update(
+                    open_faults=F("open_faults") + 1, updated_at=now
+                )
+                if claimed:
+                    self._push(tech_id, now, load + 1, campus_id, skills, on_shift)
+                    return tech_id
+                # Changed by someone else since we read it
+                self._techs.pop(tech_id)
+                self._read(Technician.all_campuses.filter(id=tech_id))
+
+    def refresh(self, tech_ids):
+        """Re-read technicians this process just changed."""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._read(Technician.all_campuses.filter(id__in=tech_ids))
+
+
+_rosters = {}
+_rosters_lock = threading.Lock()
+
+
+def get_roster():
+    """The roster for the database technicians are stored in right now."""
+    alias = router.db_for_write(Technician)
+    with _rosters_lock:
+        if alias not in _rosters:
+            _rosters[alias] = Roster()
+        return _rosters[alias]
+
+
+def workload_of(fault):
+    """The technician whose open_faults counts this fault, or None."""
+    return fault.technician_id if fault.status in WORKLOAD_STATUSES else None
+
+
+def _adjust(deltas):
+    deltas = {tech_id: delta for tech_id, delta in deltas.items() if tech_id and delta}
+    if not deltas:
+        return
+    now = timezone.now()
+    for tech_id, delta in deltas.items():
+        Technician.all_campuses.filter(id=tech_id).update(open_faults=F("open_faults") + delta, updated_at=now)
+    get_roster().refresh(list(deltas))
+
+
+def track(before, after):
+    """Move a fault's count from technician `before` to `after` (ids or None)."""
+    if before != after:
+        _adjust({before: -1, after: 1})
+
+
+def assign(fault):
+    """Give a new fault to the least-loaded qualified technician, if any.
+
+    Counts it for them; the caller saves the fault. Returns the technician id or None.
+    """
+    tech_id = get_roster().claim(fault.campus_id, fault.category)
+    if tech_id:
+        fault.technician_id = tech_id
+        fault.assigned_to = Technician.all_campuses.values_list("name", flat=True).get(id=tech_id)
+    return tech_id
+
+
+def reassign(technician):
+    """Hand an off-shift technician's open faults to other technicians.
+
+    Faults nobody on shift can take are left unassigned. Returns the
+    reassigned faults.
+    """
+    faults = list(
+        FaultReport.all_campuses.filter(technician=technician, status__in=WORKLOAD_STATUSES)
+        .order_by(F("sla_due_at").asc(nulls_last=True), "id")
+    )
+    roster = get_roster()
+    roster.refresh([technician.id])
+    picked = {fault.id: roster.claim(fault.campus_id, fault.category) for fault in faults}
+    names = dict(Technician.all_campuses.filter(id__in=set(picked.values()) - {None}).values_list("id", "name"))
+    by_technician = {}
+    for fault in faults:
+        fault.technician_id = picked[fault.id]
+        fault.assigned_to = names.get(fault.technician_id, "")
+        by_technician.setdefault(fault.technician_id, []).append(fault.id)
+    now = timezone.now()
+    for tech_id, fault_ids in by_technician.items():
+        FaultReport.all_campuses.filter(id__in=fault_ids).update(
+            technician_id=tech_id, assigned_to=names.get(tech_id, ""), updated_at=now
+        )
+    _adjust({technician.id: -len(faults)})
+    return faults
+
+
+def recount():
+    """Recompute open_faults for the technicians visible in the current context."""
+    counts = dict(
+        FaultReport.objects.filter(technician__isnull=False, status__in=WORKLOAD_STATUSES)
+        .values_list("technician").annotate(n=Count("id")).order_by()
+    )
+    now = timezone.now()
+    for tech in Technician.objects.only("id", "open_faults"):
+        if tech.open_faults != counts.get(tech.id, 0):
+            Technician.objects.filter(id=tech.id).update(open_faults=counts.get(tech.id, 0), updated_at=now)
@@ -1,6 +1,9 @@
 from django.http import JsonResponse
 from django.contrib.auth.models import User
 from .jwt import decode_token
+from .models import Campus
+from .rollups import default_campus
+from . import campuses
 
 def get_user_from_request(request):
     # Try multiple ways to get the Authorization header
@@ -64,7 +67,7 @@ def get_user_from_request(request):
             return None
         
         print(f"DEBUG: Extracted user_id from token: {user_id} (type: {type(user_id)})")
-        user = User.objects.filter(id=user_id).first()
+        user = User.objects.select_related("profile__campus").filter(id=user_id).first()
         if not user:
             print(f"DEBUG: User with id {user_id} not found in database")
             return None
@@ -98,5 +101,20 @@ def require_auth(view_func):
             return JsonResponse({"message": "Unauthorized - Please log in again"}, status=401)
         request.user_obj = user
         print(f"DEBUG: require_auth passed for {view_func.__name__}, user: {user.email}")
-        return view_func(request, *args, **kwargs)
+        
+        # Scope every campus-partitioned query in the view to the user's campus
+        profile = getattr(user, "profile", None)
+        campus = profile.campus if profile and profile.campus_id else default_campus()
+        requested = request.GET.get("campus", "").strip()
+        if requested and profile and profile.role == "admin":
+            # Admins can work on another campus, or read across all of them
+            if requested == "all" and request.method == "GET":
+                campus = None
+            elif requested != "all":
+                campus = Campus.objects.filter(name=requested).first()
+                if campus is None:
+                    return JsonResponse({"message": "Campus not found"}, status=404)
+        request.campus = campus
+        with campuses.activated(campus, user):
+            return view_func(request, *args, **kwargs)
     return wrapper
@@ -0,0 +1,170 @@
+"""
+Derive ClassroomStatus/LabStatus.is_available from approved bookings.
+
+The scheduler keeps a min-heap of upcoming booking start and end times for
+the next HORIZON. Each tick pops the events that came due since the last
+tick and recomputes only the rooms they belong to, so rooms whose state
+does not change are never written. The time of the last tick is stored in
+ProjectionCheckpoint, so after a restart the scheduler replays the events
+it missed before continuing. A campus with its own database gets its own
+Scheduler.
+"""
+import heapq
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import campuses
+from .models import ClassroomStatus, LabStatus, RoomRequest, ProjectionCheckpoint
+from .recurrence import occurrences
+
+CHECKPOINT = "availability_scheduler"
+HORIZON = timedelta(hours=6)
+# Longest outage we replay after a restart
+MAX_CATCH_UP = timedelta(days=7)
+
+ROOM_MODELS = {"classroom": ClassroomStatus, "lab": LabStatus}
+
+
+def local_now():
+    # Bookings store naive local dates and times
+    return timezone.localtime().replace(tzinfo=None)
+
+
+def _room_key(req):
+    return req.room_type, req.classroom_id if req.room_type == "classroom" else req.lab_id
+
+
+def _bookings(start, end, rooms=None):
+    qs = RoomRequest.objects.filter(status="approved", requested_date__lte=end.date()).filter(
+        Q(recurrence="", requested_date__gte=start.date()) | Q(recurrence_until__gte=start.date())
+    )
+    if rooms is not None:
+        room_q = Q(pk__in=[])
+        for room_type, room_id in rooms:
+            room_q |= Q(room_type=room_type, **{"classroom_id" if room_type == "classroom" else "lab_id": room_id})
+        qs = qs.filter(room_q)
+    return qs.exclude(classroom__isnull=True, lab__isnull=True)
+
+
+def _windows(req, start, end):
+    for day, start_time, end_time in occurrences(req, start.date(), end.date()):
+        yield datetime.combine(day, start_time), datetime.combine(day, end_time)
+
+
+def booked_rooms(now, rooms=None):
+    """The subset of rooms (all rooms if None) with a booking in progress."""
+    busy = set()
+    for req in _bookings(now, now, rooms):
+        for begin, finish in _windows(req, now, now):
+            if begin <= now < finish:
+                busy.add(_room_key(req))
+    return busy
+
+
+def apply(rooms, now):
+    """Set is_available for the given rooms from their bookings at `now`.
+
+    Returns the rooms whose flag actually changed.
+    """
+    rooms = set(rooms)
+    if not rooms:
+        return set()
+    busy = booked_rooms(now, rooms)
+    changed = set()
+    for room_type, model in ROOM_MODELS.items():
+        ids = [room_id for kind, room_id in rooms if kind == room_type]
+        if not ids:
+            continue
+        busy_ids = [room_id for kind, room_id in busy if kind == room_type]
+        free_ids = [room_id for room_id in ids if (room_type, room_id) not in busy]
+        # Only rows whose flag differs are updated
+        to_busy = list(model.objects.filter(id__in=busy_ids, is_available=True).values_list("id", flat=True))
+        to_free = list(model.objects.filter(id__in=free_ids, is_available=False).values_list("id", flat=True))
+        if to_busy:
+            model.objects.filter(id__in=to_busy).update(is_available=False)
+        if to_free:
+            model.objects.filter(id__in=to_free).update(is_available=True)
+        changed.update((room_type, room_id) for room_id in to_busy + to_free)
+    return changed
+
+
+class Scheduler:
+    def __init__(self, campus=None):
+        # None: every campus on the shared database
+        self.campus = campus
+        self.checkpoint = CHECKPOINT if campus is None else f"{CHECKPOINT}:{campus.name}"
+        self.heap = []
+        self.loaded_until = None
+        self.last_tick = None
+
+    def _load_checkpoint(self, now):
+        checkpoint = ProjectionCheckpoint.objects.filter(name=self.checkpoint).first()
+        if checkpoint is None:
+            return None
+        last = datetime.fromtimestamp(checkpoint.position)
+        return max(last, now - MAX_CATCH_UP)
+
+    def _save_checkpoint(self, when):
+        ProjectionCheckpoint.objects.update_or_create(
+            name=self.checkpoint, defaults={"position": int(when.timestamp())}
+        )
+
+    def _fill(self, start, end):
+        # Push every start/end strictly after `start` up to `end`
+        for req in _bookings(start, end):
+            key = _room_key(req)
+            for begin, finish in _windows(req, start, end):
+                for when in (begin, finish):
+                    if start < when <= end:
+                        heapq.heappush(self.heap, (when, key))
+        self.loaded_until = end
+
+    def reload(self, now):
+        """Rebuild the heap, e.g. after bookings were approved or rejected."""
+        with campuses.activated(self.campus):
+            self.heap = []
+            self._fill(self.last_tick or now, now + HORIZON)
+
+    def start(self, now=None):
+        """Catch up on anything missed since the last run. Returns changed rooms."""
+        now = now or local_now()
+        with campuses.activated(self.campus):
+            return self._start(now)
+
+    def _start(self, now):
+        self.last_tick = self._load_checkpoint(now)
+        if self.last_tick is None:
+            # First run ever: derive every booked room from scratch
+            rooms = set(booked_rooms(now))
+            rooms.update(("classroom", pk) for pk in ClassroomStatus.objects.filter(is_available=False).values_list("id", flat=True))
+            rooms.update(("lab", pk) for pk in LabStatus.objects.filter(is_available=False).values_list("id", flat=True))
+            changed = apply(rooms, now)
+            self.last_tick = now
+            self._save_checkpoint(now)
+            self.reload(now)
+            return changed
+        self.reload(now)
+        return self.tick(now)
+
+    def tick(self, now=None):
+        """Apply every start/end event due by `now`. Returns changed rooms."""
+        now = now or local_now()
+        with campuses.activated(self.campus):
+            return self._tick(now)
+
+    def _tick(self, now):
+        if self.loaded_until is None or now + HORIZON / 2 > self.loaded_until:
+            self._fill(self.loaded_until or self.last_tick or now, now + HORIZON)
+        touched = set()
+        while self.heap and self.heap[0][0] <= now:
+            _, key = heapq.heappop(self.heap)
+            touched.add(key)
+        changed = apply(touched, now)
+        self.last_tick = now
+        self._save_checkpoint(now)
+        return changed
+
+    def next_event(self):
+        return self.heap[0][0] if self.heap else None
@@ -0,0 +1,87 @@
+"""
+Campus partitioning.
+
+Spaces, room requests and fault reports carry a campus. require_auth
+activates the user's campus for the length of the request, and the default
+manager of every CampusScoped model (models.py) filters on it, so views see
+only their own campus without filtering by hand. New rows get the active
+campus on save, or DEFAULT_CAMPUS when none is active. Code running outside a request (workers, commands, the
+admin site) has no active campus and sees everything; `all_campuses` is
+the unscoped manager for code that must look across campuses.
+
+A campus can live in its own database: list it in CAMPUS_DATABASES
+(campus name -> alias) and the router sends the partitioned tables there
+while that campus is active. Users, profiles and the campus row itself stay
+on the primary and are copied to the campus database the first time they
+are needed there, so foreign keys resolve.
+"""
+import contextlib
+import copy
+import threading
+
+from django.conf import settings
+
+# Campus of everything created outside a request
+DEFAULT_CAMPUS = "Main campus"
+
+_local = threading.local()
+
+# Tables that live in a campus database when the campus has one
+PARTITIONED_MODELS = {
+    "librarystatus", "labstatus", "classroomstatus", "building",
+    "libraryupdaterequest", "labupdaterequest", "roomrequest",
+    "faultreport", "faultstatuschange", "technician", "imageblob",
+}
+
+
+def current():
+    return getattr(_local, "campus", None)
+
+
+def database_for(campus):
+    if campus is None:
+        return None
+    return getattr(settings, "CAMPUS_DATABASES", {}).get(campus.name)
+
+
+def current_database():
+    return database_for(current())
+
+
+def activate(campus, user=None):
+    _local.campus = campus
+    alias = database_for(campus)
+    if alias and user is not None:
+        ensure_reference_rows(alias, user, campus)
+
+
+def deactivate():
+    _local.campus = None
+
+
+@contextlib.contextmanager
+def activated(campus, user=None):
+    previous = current()
+    activate(campus, user)
+    try:
+        yield campus
+    finally:
+        _local.campus = previous
+
+
+_copied = set()
+
+
+def ensure_reference_rows(alias, user, campus):
+    """Copy the rows partitioned tables point at onto a campus database."""
+    profile = getattr(user, "profile", None)
+    for obj in (campus, user, profile):
+        if obj is None:
+            continue
+        key = (alias, type(obj).__name__, obj.pk)
+        if key in _copied:
+            continue
+        if not type(obj)._base_manager.using(alias).filter(pk=obj.pk).exists():
+            # Save a copy so the original still belongs to the primary
+            copy.copy(obj).save(using=alias, force_insert=True)
+        _copied.add(key)
@@ -0,0 +1,228 @@
+"""
+Near-duplicate detection for fault reports.
+
+Every open fault gets a MinHash signature over character shingles of its
+title and description. The signature is a one-permutation MinHash: each
+shingle is hashed once, the top bits of the hash pick one of NUM_PERM bins
+and each bin keeps its smallest value, so signing costs one hash per
+shingle rather than NUM_PERM. Bins that no shingle fell into (short titles)
+borrow the value of the next filled bin, tagged with the distance, so two
+signatures still agree in a bin with probability equal to the Jaccard
+similarity of their shingle sets. Signatures are split into LSH bands and bucketed by
+(campus, location, band), so a new report only gets compared with the
+handful of open faults at the same location that share a band with it. The lookup
+cost depends on the number of bands, not on the number of open faults.
+
+Signatures are stored on FaultReport.minhash when the report is created.
+The index lives in process memory; it is loaded from those stored
+signatures on first use and then caught up by primary key before every
+lookup, so faults created by other worker processes are picked up too.
+There is one index per database, since campuses with their own database
+number their faults independently.
+"""
+import re
+import random
+import struct
+import threading
+import zlib
+
+from django.db import router
+
+from . import campuses
+from .models import FaultReport
+
+OPEN_STATUSES = ("open", "in_progress")
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+# Only the start of long descriptions is shingled, which keeps signing cheap
+MAX_TEXT = 400
+# Estimated Jaccard similarity above which two reports count as duplicates
+THRESHOLD = 0.5
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_A, _B = _rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)
+# A 61-bit hash: the top _BIN_BITS pick the bin, the low _VALUE_BITS are
+# kept, and the bits above those record how far a borrowed value travelled
+_BIN_BITS = (NUM_PERM - 1).bit_length()
+_BIN_SHIFT = 61 - _BIN_BITS
+_VALUE_BITS = 32 - _BIN_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_EMPTY = 1 << 32
+
+_SIG_STRUCT = struct.Struct(">%dI" % NUM_PERM)
+
+_NORMALIZE_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def _normalize(text):
+    return _NORMALIZE_RE.sub(" ", (text or "").lower()).strip()
+
+
+def shingles(title, description):
+    text = _normalize(f"{title} {description}")[:MAX_TEXT]
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {
+        zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(text) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(title, description):
+    bins = [_EMPTY] * NUM_PERM
+    for h in shingles(title, description):
+        x = (_A * h + _B) % _PRIME
+        i = (x >> _BIN_SHIFT) % NUM_PERM
+        value = x & _VALUE_MASK
+        if value < bins[i]:
+            bins[i] = value
+    # shingles() is never empty, so every empty bin finds a filled one
+    sig = []
+    for i in range(NUM_PERM):
+        distance = 0
+        while bins[(i + distance) % NUM_PERM] == _EMPTY:
+            distance += 1
+        sig.append((distance << _VALUE_BITS) | bins[(i + distance) % NUM_PERM])
+    return tuple(sig)
+
+
+def pack(sig):
+    return _SIG_STRUCT.pack(*sig)
+
+
+def unpack(data):
+    return _SIG_STRUCT.unpack(bytes(data))
+
+
+def similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _band_keys(campus_id, location, sig):
+    loc = _normalize(location)
+    return [(campus_id, loc, i, sig[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+
+class DuplicateIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        # fault id -> (band keys, signature, canonical fault id)
+        self._entries = {}
+        self._high_water = 0
+        self._loaded = False
+
+    def _add(self, fault_id, campus_id, location, sig, canonical_id):
+        keys = _band_keys(campus_id, location, sig)
+        self._entries[fault_id] = (keys, sig, canonical_id)
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(fault_id)
+        self._high_water = max(self._high_water, fault_id)
+
+    def _remove(self, fault_id):
+        entry = self._entries.pop(fault_id, None)
+        if entry is None:
+            return
+        for key in entry[0]:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(fault_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _catch_up(self):
+        # Load everything on first use, afterwards only rows newer than the
+        # highest id we have seen (created by this or another process).
+        qs = FaultReport.all_campuses.filter(status__in=OPEN_STATUSES)
+        if self._loaded:
+            qs = qs.filter(id__gt=self._high_water)
+        rows = qs.order_by("id").values_list("id", "campus_id", "location", "minhash", "duplicate_of_id")
+        unsigned = []
+        for fault_id, campus_id, location, minhash, duplicate_of_id in rows.iterator(chunk_size=2000):
+            if fault_id in self._entries:
+                continue
+            if minhash:
+                self._add(fault_id, campus_id, location, unpack(minhash), duplicate_of_id or fault_id)
+            else:
+                # Reported before signatures were stored, or signed with an older scheme
+                unsigned.append((fault_id, campus_id, location, duplicate_of_id))
+        for start in range(0, len(unsigned), 500):
+            chunk = unsigned[start:start + 500]
+            texts = FaultReport.all_campuses.only("title", "description").in_bulk([row[0] for row in chunk])
+            for fault_id, campus_id, location, duplicate_of_id in chunk:
+                fault = texts.get(fault_id)
+                if fault is not None:
+                    sig = signature(fault.title, fault.description)
+                    self._add(fault_id, campus_id, location, sig, duplicate_of_id or fault_id)
+        self._loaded = True
+
+    def find_duplicate(self, campus_id, location, sig):
+        """Return (canonical fault id, matched fault id) of the best match, or None."""
+        with self._lock:
+            self._catch_up()
+            candidates = set()
+            for key in _band_keys(campus_id, location, sig):
+                candidates.update(self._buckets.get(key, ()))
+            best, best_score = None, THRESHOLD
+            for fault_id in candidates:
+                score = similarity(sig, self._entries[fault_id][1])
+                if score >= best_score:
+                    best, best_score = (self._entries[fault_id][2], fault_id), score
+        return best
+
+    def add(self, fault):
+        sig = unpack(fault.minhash) if fault.minhash else signature(fault.title, fault.description)
+        with self._lock:
+            self._remove(fault.id)
+            self._add(fault.id, fault.campus_id, fault.location, sig, fault.duplicate_of_id or fault.id)
+
+    def remove(self, fault_id):
+        with self._lock:
+            self._remove(fault_id)
+
+    def sync(self, fault):
+        """Keep the index in step with a fault whose status may have changed."""
+        if fault.status in OPEN_STATUSES:
+            self.add(fault)
+        else:
+            self.remove(fault.id)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index():
+    """The index for the database faults are stored in right now."""
+    alias = router.db_for_write(FaultReport)
+    with _indexes_lock:
+        if alias not in _indexes:
+            _indexes[alias] = DuplicateIndex()
+        return _indexes[alias]
+
+
+def find_canonical(location, title, description):
+    """Check a new report against the open faults at its location.
+
+    Returns (canonical FaultReport or None, packed signature); the caller
+    stores both on the new FaultReport and then calls get_index().add().
+    """
+    sig = signature(title, description)
+    campus = campuses.current()
+    index = get_index()
+    match = index.find_duplicate(campus.id if campus else None, location, sig)
+    canonical = None
+    if match is not None:
+        canonical_id, matched_id = match
+        open_faults = FaultReport.all_campuses.filter(id__in=set(match), status__in=OPEN_STATUSES).in_bulk()
+        # If the canonical fault was closed while its duplicates are still
+        # open, the matched duplicate becomes the new canonical fault.
+        canonical = open_faults.get(canonical_id) or open_faults.get(matched_id)
+        for fault_id in set(match) - set(open_faults):
+            # Closed by another process since we indexed it
+            index.remove(fault_id)
+    return canonical, pack(sig)
@@ -0,0 +1,214 @@
+"""
+Append-only domain event log and the projections built from it.
+
+Write views are wrapped in @transactional. Inside one, record() only
+buffers the event; the buffer is written with a single bulk insert just
+before the view's transaction commits, so an event exists exactly when the
+change it describes does. A view that answers with a 5xx status has its
+transaction rolled back. When the active campus has its own database the
+view runs in a transaction on both.
+
+Projectors read the log from their checkpoint in batches and keep the
+BuildingActivity and UserActivity read models up to date. They run in the
+run_jobs worker: writing events queues a project_events job unless one is
+already pending, and `manage.py project_events --follow` can run them
+instead. Read views only read the projected tables. rebuild() wipes a
+read model and replays the whole log into it.
+"""
+import contextlib
+import functools
+import threading
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import jobs
+from .models import DomainEvent, Job, ProjectionCheckpoint, BuildingActivity, UserActivity
+from .routing import write_databases
+
+# On PostgreSQL ids are handed out before commit, so a lower id can become
+# visible after a higher one. Projectors leave the newest events alone for
+# this long so they never step past one that is still committing.
+SETTLE = timedelta(seconds=2)
+
+PROJECT_JOB = "project_events"
+
+_local = threading.local()
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def record(aggregate_type, aggregate_id, event_type, actor=None, **data):
+    event = DomainEvent(
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        event_type=event_type,
+        actor=actor,
+        data=data,
+    )
+    stack = _stack()
+    if stack:
+        stack[-1].append(event)
+    else:
+        event.save()
+        schedule_projections()
+    return event
+
+
+def flush():
+    stack = _stack()
+    if stack and stack[-1]:
+        DomainEvent.objects.bulk_create(stack[-1])
+        stack[-1].clear()
+        schedule_projections()
+
+
+def schedule_projections():
+    """Queue a project_events job unless one is already waiting to run.
+
+    The job is delayed by SETTLE, so the events that queued it are old
+    enough to be projected when it runs.
+    """
+    if not Job.objects.filter(name=PROJECT_JOB, status="pending").exists():
+        jobs.enqueue(PROJECT_JOB, lane="low", delay=SETTLE.total_seconds())
+
+
+def transactional(view_func):
+    """Run a view in one transaction together with the events it records."""
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        stack = _stack()
+        stack.append([])
+        try:
+            with contextlib.ExitStack() as atomic:
+                aliases = write_databases()
+                for alias in aliases:
+                    atomic.enter_context(transaction.atomic(using=alias))
+                response = view_func(request, *args, **kwargs)
+                if getattr(response, "status_code", 200) >= 500:
+                    for alias in aliases:
+                        transaction.set_rollback(True, using=alias)
+                else:
+                    flush()
+            return response
+        finally:
+            stack.pop()
+    return wrapper
+
+
+# Projections
+
+class Projector:
+    name = None
+    batch_size = 500
+
+    def handle(self, event):
+        raise NotImplementedError
+
+    def reset(self):
+        raise NotImplementedError
+
+
+def _bump(model, lookup, **fields):
+    obj, _ = model.objects.get_or_create(**lookup)
+    model.objects.filter(pk=obj.pk).update(**{name: F(name) + n for name, n in fields.items()})
+
+
+class BuildingProjector(Projector):
+    name = "building_activity"
+
+    def handle(self, event):
+        building = event.data.get("building")
+        if not building:
+            return
+        lookup = {"building": building}
+        key = (event.aggregate_type, event.event_type)
+        if key == ("room_request", "created"):
+            _bump(BuildingActivity, lookup, room_requests=1)
+        elif key == ("room_request", "approved"):
+            _bump(BuildingActivity, lookup, bookings_approved=1)
+        elif key == ("room_request", "rejected"):
+            _bump(BuildingActivity, lookup, bookings_rejected=1)
+        elif event.aggregate_type in ("lab", "classroom") and event.event_type in ("created", "updated"):
+            _bump(BuildingActivity, lookup, space_updates=1)
+
+    def reset(self):
+        BuildingActivity.objects.all().delete()
+
+
+class UserActivityProjector(Projector):
+    name = "user_activity"
+
+    COUNTERS = {
+        ("fault", "created"): "faults_reported",
+        ("room_request", "created"): "room_requests",
+        ("role_request", "created"): "role_requests",
+        ("library_update_request", "created"): "update_requests",
+        ("lab_update_request", "created"): "update_requests",
+    }
+
+    def handle(self, event):
+        if not event.actor_id:
+            return
+        counter = self.COUNTERS.get((event.aggregate_type, event.event_type))
+        if counter is None and event.event_type in ("approved", "rejected"):
+            counter = "decisions_made"
+        obj, _ = UserActivity.objects.get_or_create(user_id=event.actor_id)
+        updates = {"last_active_at": event.created_at}
+        if counter:
+            updates[counter] = F(counter) + 1
+        UserActivity.objects.filter(pk=obj.pk).update(**updates)
+
+    def reset(self):
+        UserActivity.objects.all().delete()
+
+
+PROJECTORS = [BuildingProjector(), UserActivityProjector()]
+
+
+def run_projector(projector):
+    """Apply all events newer than the projector's checkpoint; returns the count."""
+    applied = 0
+    while True:
+        with transaction.atomic():
+            checkpoint, _ = ProjectionCheckpoint.objects.select_for_update().get_or_create(name=projector.name)
+            pending = DomainEvent.objects.filter(id__gt=checkpoint.position)
+            if connection.vendor == "postgresql":
+                pending = pending.filter(created_at__lt=timezone.now() - SETTLE)
+            events = list(pending.order_by("id")[:projector.batch_size])
+            if not events:
+                return applied
+            for event in events:
+                projector.handle(event)
+            # Checkpoint moves in the same transaction as the read model
+            ProjectionCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                position=events[-1].id, updated_at=timezone.now()
+            )
+        applied += len(events)
+
+
+def run_projections():
+    return {projector.name: run_projector(projector) for projector in PROJECTORS}
+
+
+def has_backlog():
+    """True if some projector has events left to apply."""
+    positions = dict(ProjectionCheckpoint.objects.values_list("name", "position"))
+    behind = min(positions.get(projector.name, 0) for projector in PROJECTORS)
+    return DomainEvent.objects.filter(id__gt=behind).exists()
+
+
+def rebuild(names=None):
+    for projector in PROJECTORS:
+        if names and projector.name not in names:
+            continue
+        with transaction.atomic():
+            projector.reset()
+            ProjectionCheckpoint.objects.update_or_create(name=projector.name, defaults={"position": 0})
+        run_projector(projector)
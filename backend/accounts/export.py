@@ -0,0 +1,214 @@
+"""
+Streaming exports of fault reports and room requests.
+
+Rows are read with QuerySet.iterator(chunk_size), which uses a server-side
+cursor on PostgreSQL and fetchmany() elsewhere, and written out one chunk
+at a time, so an export of any size runs in constant memory. Each chunk is
+flattened into a fixed set of columns with values_list(); related names
+(campus, reporter, approver) come from joins, not per-row queries.
+
+Two formats:
+
+- csv: UTF-8 CSV with a header row. Text cells that a spreadsheet would
+  run as a formula are prefixed with a quote.
+- arrow: an Arrow IPC stream (one record batch per chunk, zstd-compressed,
+  low-cardinality columns dictionary-encoded), readable with pyarrow,
+  pandas or polars. Needs the optional pyarrow package.
+
+Used by the /api/export/* views and `manage.py export_data`.
+"""
+import csv
+import io
+from collections import namedtuple
+from datetime import date
+from itertools import islice
+
+from .models import FaultReport, RoomRequest
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+# name in the output, values_list() lookup, Arrow type name
+Column = namedtuple("Column", "name lookup type")
+
+FAULT_COLUMNS = [
+    Column("id", "id", "int"),
+    Column("created_at", "created_at", "timestamp"),
+    Column("updated_at", "updated_at", "timestamp"),
+    Column("resolved_at", "resolved_at", "timestamp"),
+    Column("campus", "campus__name", "category"),
+    Column("title", "title", "string"),
+    Column("description", "description", "string"),
+    Column("location", "location", "string"),
+    Column("severity", "severity", "category"),
+    Column("category", "category", "category"),
+    Column("status", "status", "category"),
+    Column("assigned_to", "assigned_to", "category"),
+    Column("reported_by", "reported_by__email", "string"),
+    Column("duplicate_of", "duplicate_of_id", "int"),
+]
+
+ROOM_REQUEST_COLUMNS = [
+    Column("id", "id", "int"),
+    Column("created_at", "created_at", "timestamp"),
+    Column("campus", "campus__name", "category"),
+    Column("requested_by", "requested_by__email", "string"),
+    Column("room_type", "room_type", "category"),
+    Column("classroom", "classroom__name", "category"),
+    Column("lab", "lab__name", "category"),
+    Column("purpose", "purpose", "string"),
+    Column("expected_attendees", "expected_attendees", "int"),
+    Column("requested_date", "requested_date", "date"),
+    Column("start_time", "start_time", "time"),
+    Column("end_time", "end_time", "time"),
+    Column("recurrence", "recurrence", "category"),
+    Column("recurrence_until", "recurrence_until", "date"),
+    Column("status", "status", "category"),
+    Column("approved_by", "approved_by__email", "string"),
+    Column("approved_at", "approved_at", "timestamp"),
+]
+
+DATASETS = {
+    "faults": (FaultReport, FAULT_COLUMNS, "created_at"),
+    "room_requests": (RoomRequest, ROOM_REQUEST_COLUMNS, "requested_date"),
+}
+FILTERS = {
+    "faults": ("status", "severity", "category", "location"),
+    "room_requests": ("status", "room_type"),
+}
+
+
+class ExportError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def queryset(dataset, params):
+    """The rows of a dataset matching `params` (request.GET or a dict).
+
+    Equality filters per dataset (FILTERS), plus from/to as ISO dates on
+    created_at for faults and requested_date for room requests.
+    """
+    model, columns, date_field = DATASETS[dataset]
+    qs = model.objects.all()
+    for name in FILTERS[dataset]:
+        value = params.get(name)
+        if value:
+            qs = qs.filter(**{name: value})
+    lookup = f"{date_field}__date" if date_field == "created_at" else date_field
+    for param, op in (("from", "gte"), ("to", "lte")):
+        if params.get(param):
+            try:
+                qs = qs.filter(**{f"{lookup}__{op}": date.fromisoformat(params[param])})
+            except ValueError:
+                raise ExportError(f"{param} must be an ISO date")
+    # Freeze the database now: a streamed response is read after the view
+    # (and the campus it activated) has returned
+    qs = qs.order_by("id")
+    return qs.using(qs.db)
+
+
+def _chunks(qs, columns, chunk_size):
+    rows = qs.values_list(*[c.lookup for c in columns]).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@", "\t", "\r"):
+        return "'" + value
+    return value
+
+
+def stream_csv(qs, columns, chunk_size=CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c.name for c in columns])
+    for chunk in _chunks(qs, columns, chunk_size):
+        writer.writerows([_cell(value) for value in row] for row in chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Sink(io.RawIOBase):
+    # File object the Arrow writer writes into; drained after every batch
+    def __init__(self):
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def _arrow_type(pa, name):
+    return {
+        "int": pa.int64(),
+        "string": pa.string(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "date": pa.date32(),
+        "time": pa.time64("us"),
+    }[name]
+
+
+def stream_arrow(qs, columns, chunk_size=CHUNK_SIZE):
+    import pyarrow as pa
+
+    schema = pa.schema([(c.name, _arrow_type(pa, c.type)) for c in columns])
+    sink = _Sink()
+    options = pa.ipc.IpcWriteOptions(compression="zstd" if pa.Codec.is_available("zstd") else None)
+    with pa.ipc.new_stream(sink, schema, options=options) as writer:
+        yield sink.drain()
+        for chunk in _chunks(qs, columns, chunk_size):
+            arrays = []
+            for index, column in enumerate(columns):
+                values = [row[index] for row in chunk]
+                if column.type == "category":
+                    arrays.append(pa.array(values, pa.string()).dictionary_encode())
+                else:
+                    arrays.append(pa.array(values, schema.field(index).type))
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def arrow_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream(dataset, fmt, params, chunk_size=CHUNK_SIZE):
+    """(content type, file extension, iterator of bytes) for an export."""
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(FORMATS)}")
+    if fmt == "arrow" and not arrow_available():
+        raise ExportError("The arrow format needs pyarrow, which is not installed", status=501)
+    _, columns, _ = DATASETS[dataset]
+    qs = queryset(dataset, params)
+    writer = stream_csv if fmt == "csv" else stream_arrow
+    content_type, extension = FORMATS[fmt]
+    return content_type, extension, writer(qs, columns, chunk_size)
@@ -0,0 +1,172 @@
+"""
+Idempotency keys for create endpoints.
+
+A client that may retry a POST (mobile clients on flaky Wi-Fi do) sends an
+Idempotency-Key header with a value unique to the operation, such as a
+UUID. The first request with a key inserts an IdempotencyKey row, runs the
+view and stores the view's response in the row, all in one transaction on
+the primary database that the view's own transaction is nested in. The
+key is therefore never committed without the response, and a crash before
+the commit rolls back the key with everything the view wrote, so a retry
+simply runs again. A retry with the same key gets the stored response
+back, marked with an Idempotent-Replayed header, and the view does not run
+again, so the fault or booking is only created once. A retry that arrives
+while the first request is still running waits on the key's row lock and
+then replays; a key reused for a different request gets 422.
+
+Keys belong to one user and one endpoint and live for
+IDEMPOTENCY_KEY_TTL_HOURS. Responses that mean nothing happened (5xx, 429)
+are not kept, so retrying them runs the view. Only an expired key is ever
+taken over, however old the first request is. An expired key counts as
+unused, so correctness never depends on when rows are deleted: a
+purge_idempotency_keys job on the low lane deletes PURGE_BATCH expired rows
+per run and queues itself again while more are left. Each process queues
+one at most every PURGE_EVERY seconds.
+"""
+import hashlib
+import threading
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from . import jobs
+from .models import IdempotencyKey, Job
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+
+PURGE_JOB = "purge_idempotency_keys"
+PURGE_BATCH = 500
+PURGE_EVERY = 300  # seconds
+
+_purge_lock = threading.Lock()
+_purge_queued_at = None
+
+
+def ttl():
+    return timedelta(hours=getattr(settings, "IDEMPOTENCY_KEY_TTL_HOURS", 24))
+
+
+def fingerprint(request):
+    """A hash of what the request asks for, to catch a key reused for another one."""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    if request.content_type == "multipart/form-data":
+        # Clients pick a new boundary on every retry, so hash the parts
+        for name, values in sorted(request.POST.lists()):
+            digest.update(f"{name}={values!r}\n".encode())
+        for name, files in sorted(request.FILES.lists()):
+            for upload in files:
+                digest.update(f"{name}:{upload.name}:{upload.size}\n".encode())
+                for chunk in upload.chunks():
+                    digest.update(chunk)
+                upload.seek(0)
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _claim(user, endpoint, key, request_fingerprint):
+    # (claimed row, None) for a new key, (None, existing row) otherwise
+    for _ in range(2):
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user, endpoint=endpoint, key=key,
+                    fingerprint=request_fingerprint, expires_at=now + ttl(),
+                ), None
+        except IntegrityError:
+            pass
+        row = IdempotencyKey.objects.filter(user=user, endpoint=endpoint, key=key).first()
+        if row is None:
+            # Purged in between; insert again
+            continue
+        taken = IdempotencyKey.objects.filter(pk=row.pk, expires_at__lte=now).update(
+            fingerprint=request_fingerprint, status_code=None, content_type="", body=b"",
+            created_at=now, expires_at=now + ttl(),
+        )
+        if taken:
+            return row, None
+        return None, row
+    return None, None
+
+
+def _replay(row):
+    response = HttpResponse(bytes(row.body), status=row.status_code, content_type=row.content_type)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(endpoint):
+    """Answer retries of a POST with the same Idempotency-Key from the first response.
+
+    Goes below @require_auth, since keys belong to a user, and above
+    @rate_limit and @transactional, so replays are not rate limited and the
+    view's transaction is nested in the one that holds the key.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER, "").strip()
+            if request.method != "POST" or not key:
+                return view_func(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return JsonResponse({"message": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters"}, status=400)
+
+            request_fingerprint = fingerprint(request)
+            with transaction.atomic():
+                row, existing = _claim(request.user_obj, endpoint, key, request_fingerprint)
+                if existing is not None:
+                    if existing.fingerprint != request_fingerprint:
+                        return JsonResponse({"message": f"This {HEADER} was already used for a different request"}, status=422)
+                    if existing.status_code is None:
+                        # Only rows written before responses were stored with the key
+                        response = JsonResponse({"message": f"A request with this {HEADER} is still being processed"}, status=409)
+                        response["Retry-After"] = "1"
+                        return response
+                    return _replay(existing)
+                if row is None:
+                    return view_func(request, *args, **kwargs)
+
+                # An exception rolls the key back together with the view
+                response = view_func(request, *args, **kwargs)
+                if response.status_code >= 500 or response.status_code == 429 or response.streaming:
+                    IdempotencyKey.objects.filter(pk=row.pk).delete()
+                else:
+                    IdempotencyKey.objects.filter(pk=row.pk).update(
+                        status_code=response.status_code,
+                        content_type=response.get("Content-Type", ""),
+                        body=response.content,
+                    )
+            schedule_purge()
+            return response
+        return wrapper
+    return decorator
+
+
+def schedule_purge():
+    """Queue a purge job unless this process did so recently or one is queued."""
+    global _purge_queued_at
+    with _purge_lock:
+        if _purge_queued_at is not None and time.monotonic() - _purge_queued_at < PURGE_EVERY:
+            return
+        _purge_queued_at = time.monotonic()
+    if not Job.objects.filter(name=PURGE_JOB, status__in=["pending", "running"]).exists():
+        jobs.enqueue(PURGE_JOB, lane="low")
+
+
+def purge(limit=None):
+    """Delete up to `limit` (PURGE_BATCH) expired keys, oldest first; returns how many."""
+    limit = limit or PURGE_BATCH
+    ids = list(
+        IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
+        .order_by("expires_at").values_list("id", flat=True)[:limit]
+    )
+    if ids:
+        IdempotencyKey.objects.filter(id__in=ids).delete()
+    return len(ids)
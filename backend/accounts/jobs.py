@@ -0,0 +1,148 @@
+"""
+Durable background job queue stored in the Job table.
+
+Views call enqueue() inside their own transaction and return; a worker
+started with `python manage.py run_jobs` claims due jobs in priority order
+and runs the handler registered for each job name. No broker is needed,
+the database is the queue.
+
+Claiming is a compare-and-set UPDATE (status='pending' -> 'running' with a
+fresh claim token), so several workers can share the table on SQLite as
+well as PostgreSQL. Failed jobs are retried with exponential backoff until
+max_attempts; jobs left 'running' by a crashed worker are released after
+STALE_AFTER.
+"""
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+PRIORITIES = {"high": 0, "default": 1, "low": 2}
+
+BACKOFF_BASE = 5       # seconds
+BACKOFF_MAX = 3600     # seconds
+STALE_AFTER = timedelta(minutes=10)
+
+# name -> (handler, batch)
+_handlers = {}
+
+
+def register(name, batch=False):
+    """Register a job handler.
+
+    Plain handlers are called with one payload. Batch handlers are called
+    with the list of payloads of every claimed job of that name at once.
+    """
+    def decorator(func):
+        _handlers[name] = (func, batch)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, lane="default", delay=0, max_attempts=5):
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        priority=PRIORITIES[lane],
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts,
+    )
+
+
+def enqueue_many(name, payloads, lane="default", max_attempts=5):
+    run_at = timezone.now()
+    return Job.objects.bulk_create([
+        Job(name=name, payload=payload, priority=PRIORITIES[lane], run_at=run_at, max_attempts=max_attempts)
+        for payload in payloads
+    ])
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+    # Jitter so jobs that failed together don't all retry together
+    return delay * random.uniform(0.8, 1.2)
+
+
+def release_stale():
+    return Job.objects.filter(status="running", locked_at__lt=timezone.now() - STALE_AFTER).update(
+        status="pending", claim_token="", locked_at=None
+    )
+
+
+def claim(batch_size=20, lanes=None):
+    now = timezone.now()
+    due = Job.objects.filter(status="pending", run_at__lte=now)
+    if lanes:
+        due = due.filter(priority__in=[PRIORITIES[lane] for lane in lanes])
+    ids = list(due.order_by("priority", "run_at", "id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    # Only rows still pending are taken; another worker may have won some
+    Job.objects.filter(id__in=ids, status="pending").update(
+        status="running", claim_token=token, locked_at=now, updated_at=now
+    )
+    return list(Job.objects.filter(claim_token=token, status="running").order_by("priority", "run_at", "id"))
+
+
+def _finish(jobs):
+    Job.objects.filter(id__in=[j.id for j in jobs]).update(
+        status="done", claim_token="", locked_at=None, last_error="", updated_at=timezone.now()
+    )
+
+
+def _fail(job, error):
+    job.attempts += 1
+    job.last_error = error[-4000:]
+    job.claim_token = ""
+    job.locked_at = None
+    if job.attempts >= job.max_attempts:
+        job.status = "failed"
+    else:
+        job.status = "pending"
+        job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+    job.save(update_fields=["attempts", "last_error", "claim_token", "locked_at", "status", "run_at", "updated_at"])
+
+
+def run_batch(jobs):
+    """Run claimed jobs; returns (succeeded, failed) counts."""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.name, []).append(job)
+
+    succeeded = failed = 0
+    for name, group in groups.items():
+        if name not in _handlers:
+            for job in group:
+                _fail(job, f"No handler registered for job '{name}'")
+            failed += len(group)
+            continue
+        handler, batch = _handlers[name]
+        calls = [group] if batch else [[job] for job in group]
+        for chunk in calls:
+            try:
+                with transaction.atomic():
+                    if batch:
+                        handler([job.payload for job in chunk])
+                    else:
+                        handler(chunk[0].payload)
+                _finish(chunk)
+                succeeded += len(chunk)
+            except Exception:
+                error = traceback.format_exc()
+                for job in chunk:
+                    _fail(job, error)
+                failed += len(chunk)
+    return succeeded, failed
+
+
+def work_once(batch_size=20, lanes=None):
+    jobs = claim(batch_size=batch_size, lanes=lanes)
+    if not jobs:
+        return 0, 0
+    return run_batch(jobs)
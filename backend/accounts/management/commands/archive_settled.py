@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts import archive, campuses
+from accounts.models import Campus
+
+
+class Command(BaseCommand):
+    help = 'Moves settled faults and requests older than ARCHIVE_AFTER_DAYS into the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help='Archive rows settled more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--kind', choices=sorted(archive.KINDS), action='append',
+                            help='Only archive these kinds (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        kinds = options['kind'] or list(archive.KINDS)
+        # The shared database first, then each campus that has its own
+        passes = [(None, kinds)]
+        partitioned = [k for k in kinds if k in campuses.PARTITIONED_MODELS]
+        for campus in Campus.objects.filter(name__in=settings.CAMPUS_DATABASES):
+            passes.append((campus, partitioned))
+        for campus, pass_kinds in passes:
+            with campuses.activated(campus):
+                for kind in pass_kinds:
+                    if options['dry_run']:
+                        count = archive.settled(kind, cutoff).count()
+                        verb = 'Would archive'
+                    else:
+                        count = archive.archive(kind, cutoff, options['batch_size'])
+                        verb = 'Archived'
+                    where = f' on {campus.name}' if campus else ''
+                    self.stdout.write(f'{verb} {count} {kind} rows{where}')
+        self.stdout.write(self.style.SUCCESS('Archival finished'))
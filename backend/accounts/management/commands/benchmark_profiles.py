@@ -0,0 +1,132 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = {
+    'full': ('campus_api.settings', 'campus_api.wsgi'),
+    'api': ('campus_api.settings_api', 'campus_api.wsgi_api'),
+}
+
+# Runs in a fresh interpreter per profile, so imports are measured cold
+CHILD = r'''
+import io, json, os, sys, time
+started = time.perf_counter()
+import importlib
+application = importlib.import_module(sys.argv[1]).application
+startup = time.perf_counter() - started
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+from wsgiref.util import setup_testing_defaults
+from django.conf import settings
+
+def call(method, path, headers):
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "wsgi.input": io.BytesIO(b"")}
+    environ.update(headers)
+    setup_testing_defaults(environ)
+    status = []
+    body = b"".join(application(environ, lambda s, h, e=None: status.append(s)))
+    return status[0], body
+
+headers = json.loads(sys.argv[4])
+rss_started = rss_kb()
+first_started = time.perf_counter()
+status, _ = call(sys.argv[5], sys.argv[2], headers)
+first = time.perf_counter() - first_started
+timings = []
+for _ in range(int(sys.argv[3])):
+    t = time.perf_counter()
+    call(sys.argv[5], sys.argv[2], headers)
+    timings.append(time.perf_counter() - t)
+print("BENCH " + json.dumps({
+    "startup_ms": startup * 1000,
+    "first_request_ms": first * 1000,
+    "request_us": sorted(timings),
+    "status": status,
+    "rss_started_kb": rss_started,
+    "rss_kb": rss_kb(),
+    "modules": len(sys.modules),
+    "apps": len(settings.INSTALLED_APPS),
+    "middleware": len(settings.MIDDLEWARE),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Compares startup time, per-request overhead and memory of the full and API-only settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/test', help='Request path to time (default /api/test)')
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--token', default='', help='Bearer token for authenticated paths')
+        parser.add_argument('--requests', type=int, default=2000, help='Timed requests per run')
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes per profile')
+
+    def handle(self, *args, **options):
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {options['token']}"} if options['token'] else {}
+        results = {}
+        for name, (settings_module, wsgi_module) in PROFILES.items():
+            runs = [self._run(settings_module, wsgi_module, options, headers) for _ in range(options['runs'])]
+            timings = sorted(t for run in runs for t in run['request_us'])
+            results[name] = {
+                'startup_ms': statistics.median(run['startup_ms'] for run in runs),
+                'first_request_ms': statistics.median(run['first_request_ms'] for run in runs),
+                'ready_ms': statistics.median(run['startup_ms'] + run['first_request_ms'] for run in runs),
+                'request_p50_us': timings[len(timings) // 2] * 1e6,
+                'request_p99_us': timings[int(len(timings) * 0.99)] * 1e6,
+                'rss_started_mb': statistics.median(run['rss_started_kb'] for run in runs) / 1024,
+                'rss_mb': statistics.median(run['rss_kb'] for run in runs) / 1024,
+                'modules': runs[0]['modules'],
+                'apps': runs[0]['apps'],
+                'middleware': runs[0]['middleware'],
+                'status': runs[0]['status'],
+            }
+
+        self.stdout.write(f"{options['method']} {options['path']}, {options['runs']} runs x {options['requests']} requests")
+        self.stdout.write(f"{'':22}{'full':>12}{'api':>12}{'change':>10}")
+        for key, label in (
+            ('startup_ms', 'startup (ms)'),
+            ('first_request_ms', 'first request (ms)'),
+            ('ready_ms', 'start + first (ms)'),
+            ('request_p50_us', 'request p50 (us)'),
+            ('request_p99_us', 'request p99 (us)'),
+            ('rss_started_mb', 'RSS after start (MB)'),
+            ('rss_mb', 'RSS after run (MB)'),
+            ('modules', 'modules loaded'),
+            ('apps', 'installed apps'),
+            ('middleware', 'middleware'),
+        ):
+            full, api = results['full'][key], results['api'][key]
+            change = f"{(api - full) / full * 100:+.0f}%" if full else ''
+            self.stdout.write(f"{label:22}{full:>12.1f}{api:>12.1f}{change:>10}")
+        if results['full']['status'] != results['api']['status']:
+            self.stdout.write(self.style.WARNING(
+                f"Status differs: full {results['full']['status']}, api {results['api']['status']}"
+            ))
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
+
+    def _run(self, settings_module, wsgi_module, options, headers):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+        proc = subprocess.run(
+            [sys.executable, '-c', CHILD, wsgi_module, options['path'], str(options['requests']),
+             json.dumps(headers), options['method']],
+            cwd=str(settings.BASE_DIR), env=env, capture_output=True, text=True,
+        )
+        for line in proc.stdout.splitlines():
+            if line.startswith('BENCH '):
+                return json.loads(line[len('BENCH '):])
+        raise CommandError(f'{settings_module} run failed:\n{proc.stderr[-2000:]}')
@@ -0,0 +1,46 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import campuses, export
+from accounts.models import Campus
+
+
+class Command(BaseCommand):
+    help = 'Streams fault reports or room requests to a CSV or Arrow file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(export.DATASETS))
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help='File to write (default: stdout)')
+        parser.add_argument('--campus', help='Only this campus (default: every campus on the shared database)')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+        for name in sorted({f for filters in export.FILTERS.values() for f in filters}):
+            parser.add_argument(f'--{name}')
+        parser.add_argument('--from', dest='from', help='ISO date, inclusive')
+        parser.add_argument('--to', help='ISO date, inclusive')
+
+    def handle(self, *args, **options):
+        campus = None
+        if options['campus']:
+            campus = Campus.objects.filter(name=options['campus']).first()
+            if campus is None:
+                raise CommandError(f"Unknown campus {options['campus']!r}")
+
+        params = {key: value for key, value in options.items() if isinstance(value, str)}
+        with campuses.activated(campus):
+            try:
+                _, _, chunks = export.stream(options['dataset'], options['format'], params, options['chunk_size'])
+            except export.ExportError as e:
+                raise CommandError(str(e))
+            out = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+            written = 0
+            try:
+                for chunk in chunks:
+                    out.write(chunk)
+                    written += len(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} bytes to {options['output']}"))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import events
+
+
+class Command(BaseCommand):
+    help = 'Applies new domain events to the read models'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Wipe the read models and replay the whole event log'
+        )
+        parser.add_argument(
+            '--follow',
+            action='store_true',
+            help='Keep polling for new events instead of exiting'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds between polls with --follow'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            events.rebuild()
+            self.stdout.write(self.style.SUCCESS('Read models rebuilt from the event log'))
+        
+        while True:
+            close_old_connections()
+            applied = events.run_projections()
+            if any(applied.values()):
+                self.stdout.write(', '.join(f'{name}: {count} events' for name, count in applied.items()))
+            if not options['follow']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts import campuses, rollups
+from accounts.models import Campus
+
+
+class Command(BaseCommand):
+    help = 'Recomputes campus and building occupancy totals from the rooms'
+
+    def handle(self, *args, **options):
+        separate = settings.CAMPUS_DATABASES
+        with transaction.atomic():
+            rollups.rebuild(list(Campus.objects.exclude(name__in=separate).values_list('id', flat=True)))
+        for campus in Campus.objects.filter(name__in=separate):
+            with campuses.activated(campus), transaction.atomic(), transaction.atomic(using=separate[campus.name]):
+                rollups.rebuild([campus.id])
+        self.stdout.write(self.style.SUCCESS('Occupancy rollups rebuilt'))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts import assignment, campuses
+from accounts.models import Campus
+
+
+class Command(BaseCommand):
+    help = 'Recounts the open faults assigned to each technician'
+
+    def handle(self, *args, **options):
+        separate = settings.CAMPUS_DATABASES
+        with transaction.atomic():
+            assignment.recount()
+        for campus in Campus.objects.filter(name__in=separate):
+            with campuses.activated(campus), transaction.atomic(using=separate[campus.name]):
+                assignment.recount()
+        self.stdout.write(self.style.SUCCESS('Technician workloads recounted'))
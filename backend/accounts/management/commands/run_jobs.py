@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import jobs, tasks  # noqa: F401  (registers the job handlers)
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lanes',
+            type=str,
+            default='',
+            help='Comma separated priority lanes to serve (high,default,low). Default: all'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Maximum number of jobs claimed at once'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the due jobs and exit instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        lanes = [lane.strip() for lane in options['lanes'].split(',') if lane.strip()]
+        for lane in lanes:
+            if lane not in jobs.PRIORITIES:
+                self.stderr.write(self.style.ERROR(f'Unknown lane: {lane}'))
+                return
+        
+        self.stdout.write(f'Job worker started (lanes: {", ".join(lanes) or "all"})')
+        last_stale_check = 0
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_stale_check > 60:
+                    released = jobs.release_stale()
+                    if released:
+                        self.stdout.write(self.style.WARNING(f'Released {released} stale jobs'))
+                    last_stale_check = time.monotonic()
+                
+                succeeded, failed = jobs.work_once(batch_size=options['batch_size'], lanes=lanes or None)
+                if succeeded or failed:
+                    self.stdout.write(f'Ran {succeeded + failed} jobs ({failed} failed)')
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Job worker stopped'))
@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from accounts import availability, snapshot
+from accounts.models import Campus
+
+
+class Command(BaseCommand):
+    help = 'Keeps room availability in step with approved bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reload',
+            type=float,
+            default=60.0,
+            help='Seconds between re-reading bookings (picks up new approvals)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Catch up to the current time and exit'
+        )
+
+    def report(self, changed):
+        if changed:
+            snapshot.invalidate()
+            self.stdout.write(f'Updated availability of {len(changed)} rooms')
+
+    def handle(self, *args, **options):
+        # One for the shared database, one per campus with its own
+        schedulers = [availability.Scheduler()] + [
+            availability.Scheduler(campus)
+            for campus in Campus.objects.filter(name__in=settings.CAMPUS_DATABASES)
+        ]
+        for scheduler in schedulers:
+            self.report(scheduler.start())
+        if options['once']:
+            return
+        
+        last_reload = time.monotonic()
+        try:
+            while True:
+                close_old_connections()
+                reload = time.monotonic() - last_reload >= options['reload']
+                for scheduler in schedulers:
+                    if reload:
+                        scheduler.reload(availability.local_now())
+                    self.report(scheduler.tick())
+                if reload:
+                    last_reload = time.monotonic()
+                
+                # Sleep until the next start/end, but wake up for reloads
+                wait = options['reload'] - (time.monotonic() - last_reload)
+                upcoming = [s.next_event() for s in schedulers if s.next_event() is not None]
+                if upcoming:
+                    wait = min(wait, (min(upcoming) - availability.local_now()).total_seconds())
+                time.sleep(max(wait, 0.5))
+        except KeyboardInterrupt:
+            pass
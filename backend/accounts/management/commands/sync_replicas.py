@@ -0,0 +1,28 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database onto the local file-based replicas'
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if 'sqlite3' not in primary['ENGINE']:
+            raise CommandError('Only SQLite replicas can be synced locally; use database replication instead')
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured (set DB_REPLICAS)')
+
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                target = sqlite3.connect(str(settings.DATABASES[alias]['NAME']))
+                try:
+                    # Online backup: consistent even while the primary is in use
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f'Synced {alias}'))
+        finally:
+            source.close()
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS accounts_faultreport_fts "
+                "USING fts5(title, description, location, tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(
+                "INSERT INTO accounts_faultreport_fts (rowid, title, description, location) "
+                "SELECT id, title, description, location FROM accounts_faultreport"
+            )
+        elif connection.vendor == "postgresql":
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS accounts_faultreport_search ("
+                "fault_id bigint PRIMARY KEY REFERENCES accounts_faultreport (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS accounts_faultreport_search_gin "
+                "ON accounts_faultreport_search USING gin (document)"
+            )
+            cursor.execute(
+                "INSERT INTO accounts_faultreport_search (fault_id, document) "
+                "SELECT id, "
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+                "setweight(to_tsvector('english', coalesce(location, '')), 'A') "
+                "FROM accounts_faultreport ON CONFLICT (fault_id) DO NOTHING"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("DROP TABLE IF EXISTS accounts_faultreport_fts")
+        elif connection.vendor == "postgresql":
+            cursor.execute("DROP TABLE IF EXISTS accounts_faultreport_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
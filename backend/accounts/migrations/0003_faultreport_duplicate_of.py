@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_faultreport_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faultreport',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='accounts.faultreport'),
+        ),
+        migrations.AddField(
+            model_name='faultreport',
+            name='minhash',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_domain_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='roomrequest',
+            name='recurrence',
+            field=models.CharField(blank=True, choices=[('', 'None'), ('weekly', 'Weekly'), ('biweekly', 'Biweekly')], default='', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='roomrequest',
+            name='recurrence_exceptions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='roomrequest',
+            name='recurrence_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='roomrequest',
+            index=models.Index(fields=['status', 'room_type', 'requested_date'], name='roomrequest_booking_idx'),
+        ),
+    ]
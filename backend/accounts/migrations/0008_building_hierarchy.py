@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_buildings(apps, schema_editor):
+    Campus = apps.get_model('accounts', 'Campus')
+    Building = apps.get_model('accounts', 'Building')
+    campus, _ = Campus.objects.get_or_create(name='Main campus')
+    totals = {}
+    for model_name in ('LibraryStatus', 'LabStatus', 'ClassroomStatus'):
+        model = apps.get_model('accounts', model_name)
+        for room in model.objects.all():
+            building = None
+            if room.building.strip():
+                building, _ = Building.objects.get_or_create(campus=campus, name=room.building.strip())
+                room.building_ref = building
+                room.save(update_fields=['building_ref'])
+            for key in (('campus', campus.id), ('building', building.id if building else None)):
+                if key[1] is None:
+                    continue
+                rooms, capacity, occupancy = totals.get(key, (0, 0, 0))
+                totals[key] = (rooms + 1, capacity + room.max_capacity, occupancy + room.current_occupancy)
+    for (kind, pk), (rooms, capacity, occupancy) in totals.items():
+        model = Campus if kind == 'campus' else Building
+        model.objects.filter(pk=pk).update(rooms=rooms, max_capacity=capacity, current_occupancy=occupancy)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_roomrequest_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Building',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('rooms', models.IntegerField(default=0)),
+                ('max_capacity', models.IntegerField(default=0)),
+                ('current_occupancy', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Campus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('rooms', models.IntegerField(default=0)),
+                ('max_capacity', models.IntegerField(default=0)),
+                ('current_occupancy', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='librarystatus',
+            name='building',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='classroomstatus',
+            name='building_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='classrooms', to='accounts.building'),
+        ),
+        migrations.AddField(
+            model_name='labstatus',
+            name='building_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='labs', to='accounts.building'),
+        ),
+        migrations.AddField(
+            model_name='librarystatus',
+            name='building_ref',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='libraries', to='accounts.building'),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='campus',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buildings', to='accounts.campus'),
+        ),
+        migrations.AddConstraint(
+            model_name='building',
+            constraint=models.UniqueConstraint(fields=('campus', 'name'), name='building_campus_name_uniq'),
+        ),
+        migrations.RunPython(backfill_buildings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_main_campus(apps, schema_editor):
+    # Everything that exists so far belongs to the one campus there was
+    Campus = apps.get_model('accounts', 'Campus')
+    campus, _ = Campus.objects.get_or_create(name='Main campus')
+    for model_name in ('Profile', 'LibraryStatus', 'LabStatus', 'ClassroomStatus', 'RoomRequest', 'FaultReport'):
+        apps.get_model('accounts', model_name).objects.filter(campus__isnull=True).update(campus=campus)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_building_hierarchy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classroomstatus',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus'),
+        ),
+        migrations.AddField(
+            model_name='faultreport',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus'),
+        ),
+        migrations.AddField(
+            model_name='labstatus',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus'),
+        ),
+        migrations.AddField(
+            model_name='librarystatus',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='members', to='accounts.campus'),
+        ),
+        migrations.AddField(
+            model_name='roomrequest',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus'),
+        ),
+        migrations.AddIndex(
+            model_name='classroomstatus',
+            index=models.Index(fields=['campus', 'building', 'name'], name='classroom_campus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faultreport',
+            index=models.Index(fields=['campus', 'status', 'created_at'], name='fault_campus_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='labstatus',
+            index=models.Index(fields=['campus', 'building', 'name'], name='lab_campus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='librarystatus',
+            index=models.Index(fields=['campus', 'name'], name='library_campus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['campus', 'role'], name='profile_campus_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='roomrequest',
+            index=models.Index(fields=['campus', 'status', 'requested_date'], name='roomrequest_campus_idx'),
+        ),
+        migrations.RunPython(assign_main_campus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:25
+
+import accounts.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_campus_partitioning'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('record_id', models.BigIntegerField()),
+                ('month', models.DateField()),
+                ('created_at', models.DateTimeField()),
+                ('data', models.JSONField(encoder=accounts.models.ArchiveEncoder)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('campus', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'month'], name='archive_month_idx'), models.Index(fields=['kind', 'campus', 'created_at'], name='archive_campus_idx'), models.Index(fields=['kind', 'owner', 'created_at'], name='archive_owner_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'record_id'), name='archive_record_uniq')],
+            },
+        ),
+    ]
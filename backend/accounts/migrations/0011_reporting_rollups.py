@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_resolved_at(apps, schema_editor):
+    # Best guess for faults settled before resolved_at existed; run
+    # `manage.py rebuild_reports` afterwards to fill the rollup tables
+    FaultReport = apps.get_model('accounts', 'FaultReport')
+    FaultReport.objects.filter(status__in=['resolved', 'closed']).update(resolved_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_settled_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faultreport',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='BookingDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('room_type', models.CharField(max_length=20)),
+                ('bookings', models.IntegerField(default=0)),
+                ('booked_minutes', models.IntegerField(default=0)),
+                ('campus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.campus')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='bookingdaily_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('campus', 'day', 'room_type'), name='bookingdaily_bucket_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FaultDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=20)),
+                ('severity', models.CharField(max_length=20)),
+                ('reported', models.IntegerField(default=0)),
+                ('resolved', models.IntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+                ('campus', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='accounts.campus')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='faultdaily_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('campus', 'day', 'category', 'severity'), name='faultdaily_bucket_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_resolved_at, migrations.RunPython.noop),
+    ]
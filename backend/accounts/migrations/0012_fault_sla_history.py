@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:35
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_history(apps, schema_editor):
+    # Existing faults get an "open" row from when they were reported and,
+    # if they have moved on since, a row for their current status from
+    # their last update. Unsettled ones get their SLA deadline.
+    FaultReport = apps.get_model('accounts', 'FaultReport')
+    FaultStatusChange = apps.get_model('accounts', 'FaultStatusChange')
+    rows = []
+    for fault_id, status, created_at, updated_at in FaultReport.objects.values_list('id', 'status', 'created_at', 'updated_at').iterator():
+        moved = status != 'open'
+        rows.append(FaultStatusChange(fault_id=fault_id, status='open', entered_at=created_at, left_at=updated_at if moved else None))
+        if moved:
+            rows.append(FaultStatusChange(fault_id=fault_id, status=status, entered_at=updated_at))
+    FaultStatusChange.objects.bulk_create(rows, batch_size=1000)
+    targets = getattr(settings, 'FAULT_SLA_HOURS', {'critical': 4, 'high': 24, 'medium': 72, 'low': 168})
+    for severity, hours in targets.items():
+        FaultReport.objects.filter(severity=severity).exclude(status__in=['resolved', 'closed']).update(
+            sla_due_at=F('created_at') + timedelta(hours=hours)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_reporting_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaultStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('in_progress', 'In Progress'), ('done', 'Done'), ('resolved', 'Resolved'), ('closed', 'Closed')], max_length=20)),
+                ('entered_at', models.DateTimeField()),
+                ('left_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='faultreport',
+            name='sla_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='faultreport',
+            index=models.Index(condition=models.Q(('sla_due_at__isnull', False)), fields=['campus', 'sla_due_at'], name='fault_sla_due_idx'),
+        ),
+        migrations.AddField(
+            model_name='faultstatuschange',
+            name='changed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='faultstatuschange',
+            name='fault',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='accounts.faultreport'),
+        ),
+        migrations.AddIndex(
+            model_name='faultstatuschange',
+            index=models.Index(fields=['fault', 'entered_at'], name='faultstatus_fault_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='faultstatuschange',
+            index=models.Index(fields=['left_at'], name='faultstatus_left_idx'),
+        ),
+        migrations.RunPython(backfill_history, migrations.RunPython.noop),
+    ]
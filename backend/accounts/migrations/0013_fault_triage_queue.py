@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:38
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_triage_at(apps, schema_editor):
+    # Queue every open, non-duplicate fault, one UPDATE per severity and category
+    FaultReport = apps.get_model('accounts', 'FaultReport')
+    weights = getattr(settings, 'FAULT_TRIAGE_WEIGHTS', {
+        'severity': {'critical': 72, 'high': 24, 'medium': 8, 'low': 0},
+        'category': {'electrical': 6, 'plumbing': 6, 'hvac': 4, 'equipment': 2, 'furniture': 0, 'other': 0},
+    })
+    for severity, severity_hours in weights['severity'].items():
+        for category, category_hours in weights['category'].items():
+            FaultReport.objects.filter(
+                status='open', duplicate_of__isnull=True, severity=severity, category=category,
+            ).update(triage_at=F('created_at') - timedelta(hours=severity_hours + category_hours))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_fault_sla_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faultreport',
+            name='triage_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='faultreport',
+            index=models.Index(condition=models.Q(('triage_at__isnull', False)), fields=['campus', 'triage_at'], name='fault_triage_idx'),
+        ),
+        migrations.RunPython(backfill_triage_at, migrations.RunPython.noop),
+    ]
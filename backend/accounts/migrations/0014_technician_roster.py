@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_fault_triage_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Technician',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('skills', models.JSONField(blank=True, default=list)),
+                ('on_shift', models.BooleanField(default=True)),
+                ('open_faults', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('campus', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='faultreport',
+            name='technician',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='faults', to='accounts.technician'),
+        ),
+        migrations.AddIndex(
+            model_name='technician',
+            index=models.Index(fields=['updated_at'], name='technician_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_technician_roster'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='labupdaterequest',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='libraryupdaterequest',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='rolerequest',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='roomrequest',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
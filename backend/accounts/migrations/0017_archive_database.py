@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_database(apps, schema_editor):
+    # Rows archived from a campus database so far came from its alias
+    ArchivedRecord = apps.get_model('accounts', 'ArchivedRecord')
+    Campus = apps.get_model('accounts', 'Campus')
+    partitioned = ['faultreport', 'roomrequest', 'libraryupdaterequest', 'labupdaterequest']
+    for name, alias in getattr(settings, 'CAMPUS_DATABASES', {}).items():
+        ArchivedRecord.objects.filter(kind__in=partitioned, campus__in=Campus.objects.filter(name=name)).update(database=alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_idempotency_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='archivedrecord',
+            name='archive_record_uniq',
+        ),
+        migrations.AddField(
+            model_name='archivedrecord',
+            name='database',
+            field=models.CharField(default='default', max_length=100),
+        ),
+        migrations.RunPython(backfill_database, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='archivedrecord',
+            constraint=models.UniqueConstraint(fields=('database', 'kind', 'record_id'), name='archive_record_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_campus(apps, schema_editor):
+    FaultReport = apps.get_model('accounts', 'FaultReport')
+    FaultStatusChange = apps.get_model('accounts', 'FaultStatusChange')
+    FaultStatusChange.objects.update(
+        campus_id=Subquery(FaultReport.objects.filter(id=OuterRef('fault_id')).values('campus_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_archive_database'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='faultstatuschange',
+            name='campus',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.campus'),
+        ),
+        migrations.AlterField(
+            model_name='faultstatuschange',
+            name='fault',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='status_changes', to='accounts.faultreport'),
+        ),
+        migrations.RunPython(backfill_campus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:09
+
+from django.db import migrations
+
+
+def clear_signatures(apps, schema_editor):
+    # Signatures from the per-permutation scheme cannot be compared with new
+    # ones; the duplicate index signs these faults again when it loads them.
+    FaultReport = apps.get_model('accounts', 'FaultReport')
+    FaultReport._base_manager.using(schema_editor.connection.alias).exclude(minhash=None).update(minhash=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_keep_fault_history'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_signatures, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
+import datetime
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from . import campuses
 
 class Profile(models.Model):
     ROLE_CHOICES = [
@@ -13,6 +16,12 @@ class Profile(models.Model):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='student')
     department = models.CharField(max_length=100, blank=True, null=True)
     manager_type = models.CharField(max_length=50, blank=True, null=True)
+    campus = models.ForeignKey('Campus', on_delete=models.SET_NULL, null=True, blank=True, related_name='members')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['campus', 'role'], name='profile_campus_role_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.email} - {self.role}"
@@ -26,25 +35,86 @@ class RoleRequest(models.Model):
         ('approved', 'Approved'),
         ('rejected', 'Rejected'),
     ])
+    # Bumped by every status change; see approvals.py
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.user.email} - {self.requested_role}"
 
-class LibraryStatus(models.Model):
+class Campus(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    # Rollups over every space on the campus, kept current by rollups.py
+    rooms = models.IntegerField(default=0)
+    max_capacity = models.IntegerField(default=0)
+    current_occupancy = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return self.name
+
+class Building(models.Model):
+    campus = models.ForeignKey(Campus, on_delete=models.CASCADE, related_name='buildings')
+    name = models.CharField(max_length=100)
+    # Rollups over the building's spaces, kept current by rollups.py
+    rooms = models.IntegerField(default=0)
+    max_capacity = models.IntegerField(default=0)
+    current_occupancy = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campus', 'name'], name='building_campus_name_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.campus.name})"
+
+class CampusManager(models.Manager):
+    # Only the active campus's rows, see campuses.py
+    def get_queryset(self):
+        qs = super().get_queryset()
+        campus = campuses.current()
+        if campus is not None:
+            qs = qs.filter(campus_id=campus.id)
+        return qs
+
+class CampusScoped(models.Model):
+    campus = models.ForeignKey(Campus, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    objects = CampusManager()
+    all_campuses = models.Manager()
+    
+    class Meta:
+        abstract = True
+    
+    def save(self, *args, **kwargs):
+        if self.campus_id is None:
+            self.campus = campuses.current() or Campus.objects.get_or_create(name=campuses.DEFAULT_CAMPUS)[0]
+        super().save(*args, **kwargs)
+
+class LibraryStatus(CampusScoped):
     name = models.CharField(max_length=200)
+    building = models.CharField(max_length=100, blank=True)
+    building_ref = models.ForeignKey(Building, on_delete=models.SET_NULL, null=True, blank=True, related_name='libraries')
     max_capacity = models.IntegerField(default=100)
     current_occupancy = models.IntegerField(default=0)
     is_open = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['campus', 'name'], name='library_campus_idx'),
+        ]
+    
     def __str__(self):
         return self.name
 
-class LabStatus(models.Model):
+class LabStatus(CampusScoped):
     name = models.CharField(max_length=200)
     building = models.CharField(max_length=100, blank=True)
+    building_ref = models.ForeignKey(Building, on_delete=models.SET_NULL, null=True, blank=True, related_name='labs')
     room_number = models.CharField(max_length=50, blank=True)
     max_capacity = models.IntegerField(default=30)
     current_occupancy = models.IntegerField(default=0)
@@ -53,12 +123,18 @@ class LabStatus(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['campus', 'building', 'name'], name='lab_campus_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.building}"
 
-class ClassroomStatus(models.Model):
+class ClassroomStatus(CampusScoped):
     name = models.CharField(max_length=200)
     building = models.CharField(max_length=100, blank=True)
+    building_ref = models.ForeignKey(Building, on_delete=models.SET_NULL, null=True, blank=True, related_name='classrooms')
     room_number = models.CharField(max_length=50, blank=True)
     max_capacity = models.IntegerField(default=50)
     current_occupancy = models.IntegerField(default=0)
@@ -66,6 +142,11 @@ class ClassroomStatus(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['campus', 'building', 'name'], name='classroom_campus_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.name} - {self.building}"
 
@@ -85,6 +166,7 @@ class LibraryUpdateRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_library_updates')
     rejection_reason = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -105,13 +187,14 @@ class LabUpdateRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_lab_updates')
     rejection_reason = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Lab update request by {self.requested_by.email}"
 
-class RoomRequest(models.Model):
+class RoomRequest(CampusScoped):
     ROOM_TYPE_CHOICES = [
         ('classroom', 'Classroom'),
         ('lab', 'Lab'),
@@ -123,6 +206,12 @@ class RoomRequest(models.Model):
         ('rejected', 'Rejected'),
     ]
     
+    RECURRENCE_CHOICES = [
+        ('', 'None'),
+        ('weekly', 'Weekly'),
+        ('biweekly', 'Biweekly'),
+    ]
+    
     requested_by = models.ForeignKey(User, on_delete=models.CASCADE)
     room_type = models.CharField(max_length=20, choices=ROOM_TYPE_CHOICES)
     classroom = models.ForeignKey(ClassroomStatus, on_delete=models.SET_NULL, null=True, blank=True)
@@ -132,17 +221,58 @@ class RoomRequest(models.Model):
     requested_date = models.DateField()
     start_time = models.TimeField()
     end_time = models.TimeField()
+    # Recurring bookings store only the rule; see recurrence.py
+    recurrence = models.CharField(max_length=20, choices=RECURRENCE_CHOICES, default='', blank=True)
+    recurrence_until = models.DateField(null=True, blank=True)
+    recurrence_exceptions = models.JSONField(default=list, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     approved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='approved_room_requests')
     approved_at = models.DateTimeField(null=True, blank=True)
     rejection_reason = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'room_type', 'requested_date'], name='roomrequest_booking_idx'),
+            models.Index(fields=['campus', 'status', 'requested_date'], name='roomrequest_campus_idx'),
+        ]
+    
     def __str__(self):
         return f"Room request by {self.requested_by.email}"
 
-class FaultReport(models.Model):
+class ImageBlob(models.Model):
+    # Uploaded image stored on disk under its SHA-256, see storage.py
+    sha256 = models.CharField(max_length=64, unique=True)
+    content_type = models.CharField(max_length=50)
+    extension = models.CharField(max_length=10)
+    size = models.BigIntegerField()
+    thumbnail_ready = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.sha256
+
+class Technician(CampusScoped):
+    # Maintenance staff that faults are assigned to, see assignment.py
+    name = models.CharField(max_length=200)
+    email = models.EmailField(blank=True)
+    skills = models.JSONField(default=list, blank=True)  # Fault categories they can work on
+    on_shift = models.BooleanField(default=True)
+    open_faults = models.IntegerField(default=0)  # Assigned faults still open or in progress
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='technician_updated_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+class FaultReport(CampusScoped):
     SEVERITY_CHOICES = [
         ('low', 'Low'),
         ('medium', 'Medium'),
@@ -175,9 +305,233 @@ class FaultReport(models.Model):
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default='other')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
     assigned_to = models.CharField(max_length=200, blank=True)
+    technician = models.ForeignKey(Technician, on_delete=models.SET_NULL, null=True, blank=True, related_name='faults')
     image = models.CharField(max_length=500, blank=True, null=True)  # Store image URL instead
+    image_blob = models.ForeignKey(ImageBlob, on_delete=models.SET_NULL, null=True, blank=True)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
+    minhash = models.BinaryField(null=True, blank=True, editable=False)  # Similarity signature, see dedup.py
+    resolved_at = models.DateTimeField(null=True, blank=True)  # When it became resolved/closed
+    sla_due_at = models.DateTimeField(null=True, blank=True)  # Resolution deadline while unsettled, see sla.py
+    triage_at = models.DateTimeField(null=True, blank=True)  # Queue position while open, see triage.py
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['campus', 'status', 'created_at'], name='fault_campus_status_idx'),
+            # Only unsettled faults have a deadline, so this stays small
+            models.Index(fields=['campus', 'sla_due_at'], name='fault_sla_due_idx', condition=models.Q(sla_due_at__isnull=False)),
+            models.Index(fields=['campus', 'triage_at'], name='fault_triage_idx', condition=models.Q(triage_at__isnull=False)),
+        ]
+    
     def __str__(self):
         return f"{self.title} - {self.reported_by.email}"
+
+class FaultStatusChange(models.Model):
+    # One row per status a fault has been in; the current one has no left_at.
+    # Kept when the fault is archived, so no database-level constraint
+    fault = models.ForeignKey(FaultReport, on_delete=models.DO_NOTHING, db_constraint=False, related_name='status_changes')
+    campus = models.ForeignKey(Campus, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=FaultReport.STATUS_CHOICES)
+    entered_at = models.DateTimeField()
+    left_at = models.DateTimeField(null=True, blank=True)
+    changed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['fault', 'entered_at'], name='faultstatus_fault_idx'),
+            models.Index(fields=['left_at'], name='faultstatus_left_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Fault #{self.fault_id} {self.status} from {self.entered_at}"
+
+class Job(models.Model):
+    # Background work queued by views and run by `manage.py run_jobs`, see jobs.py
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    # Lower runs first
+    PRIORITY_CHOICES = [
+        (0, 'High'),
+        (1, 'Default'),
+        (2, 'Low'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(choices=PRIORITY_CHOICES, default=1)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField()
+    claim_token = models.CharField(max_length=32, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_at'], name='job_claim_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+class IdempotencyKey(models.Model):
+    # The first response to a POST sent with an Idempotency-Key header,
+    # replayed to retries until expires_at; see idempotency.py
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    # Null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    body = models.BinaryField(blank=True, default=b'')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='idempotency_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.endpoint} {self.key} ({self.status_code or 'running'})"
+
+class DomainEvent(models.Model):
+    # Append-only history of state changes, written by events.py. Never updated.
+    aggregate_type = models.CharField(max_length=50)
+    aggregate_id = models.BigIntegerField()
+    event_type = models.CharField(max_length=50)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    data = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['aggregate_type', 'aggregate_id'], name='event_aggregate_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.aggregate_type}#{self.aggregate_id} {self.event_type}"
+
+class ProjectionCheckpoint(models.Model):
+    # Last DomainEvent id applied by each projector
+    name = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+class BuildingActivity(models.Model):
+    # Read model maintained by the building projector
+    building = models.CharField(max_length=100, unique=True)
+    room_requests = models.IntegerField(default=0)
+    bookings_approved = models.IntegerField(default=0)
+    bookings_rejected = models.IntegerField(default=0)
+    space_updates = models.IntegerField(default=0)
+    
+    def __str__(self):
+        return self.building
+
+class UserActivity(models.Model):
+    # Read model maintained by the user activity projector
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='activity')
+    faults_reported = models.IntegerField(default=0)
+    room_requests = models.IntegerField(default=0)
+    role_requests = models.IntegerField(default=0)
+    update_requests = models.IntegerField(default=0)
+    decisions_made = models.IntegerField(default=0)
+    last_active_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Activity of {self.user.email}"
+
+class ArchiveEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder cuts datetimes to milliseconds; archived rows must
+    # come back exactly as they were
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+class ArchivedRecord(models.Model):
+    # Settled fault reports and requests moved out of the hot tables by
+    # archive.py; `data` holds the row's fields as serialized by Django
+    kind = models.CharField(max_length=50)
+    # The database the row was archived from; campus databases number
+    # their rows independently
+    database = models.CharField(max_length=100, default='default')
+    record_id = models.BigIntegerField()
+    month = models.DateField()
+    campus = models.ForeignKey(Campus, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+    data = models.JSONField(encoder=ArchiveEncoder)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['database', 'kind', 'record_id'], name='archive_record_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'month'], name='archive_month_idx'),
+            models.Index(fields=['kind', 'campus', 'created_at'], name='archive_campus_idx'),
+            models.Index(fields=['kind', 'owner', 'created_at'], name='archive_owner_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind}#{self.record_id} ({self.month:%Y-%m})"
+
+class FaultDaily(models.Model):
+    # Faults reported and resolved per campus, day, category and severity,
+    # maintained by reports.py
+    campus = models.ForeignKey(Campus, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    category = models.CharField(max_length=20)
+    severity = models.CharField(max_length=20)
+    reported = models.IntegerField(default=0)
+    resolved = models.IntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)  # Summed over the faults resolved that day
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campus', 'day', 'category', 'severity'], name='faultdaily_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='faultdaily_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.category}/{self.severity}"
+
+class BookingDaily(models.Model):
+    # Approved booking occurrences per campus, day and room type,
+    # maintained by reports.py
+    campus = models.ForeignKey(Campus, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()
+    room_type = models.CharField(max_length=20)
+    bookings = models.IntegerField(default=0)
+    booked_minutes = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['campus', 'day', 'room_type'], name='bookingdaily_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='bookingdaily_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.day} {self.room_type}"
@@ -0,0 +1,186 @@
+"""
+Propose rooms for all pending room requests in a date range.
+
+Best-fit decreasing: requests are taken largest class first, and each one
+gets the smallest room of its type that holds expected_attendees and is
+free at every occurrence. Rooms are kept sorted by capacity so the search
+starts at the first room that is big enough (bisect). Approved bookings
+in the range are loaded up front as busy time; nothing is written until a
+proposal is applied; check() repeats the conflict test in memory for the
+batch being applied.
+"""
+import bisect
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import ClassroomStatus, LabStatus, RoomRequest
+from .recurrence import occurrences, last_date
+
+ROOM_MODELS = {"classroom": ClassroomStatus, "lab": LabStatus}
+
+
+def _minutes(t):
+    return t.hour * 60 + t.minute + (1 if t.second or t.microsecond else 0)
+
+
+class _Room:
+    __slots__ = ("room_type", "id", "name", "capacity", "busy", "reach")
+
+    def __init__(self, room_type, room_id, name, capacity):
+        self.room_type = room_type
+        self.id = room_id
+        self.name = name
+        self.capacity = capacity
+        # date -> sorted list of (start minute, end minute, request id)
+        self.busy = defaultdict(list)
+        # date -> (latest end, its request id) over busy[date][:i + 1]; approved
+        # bookings may overlap each other, so the neighbour alone is not enough
+        self.reach = defaultdict(list)
+
+    def clash(self, slots):
+        """(request id, date) of a booking overlapping slots, or None."""
+        for day, start, end in slots:
+            intervals = self.busy.get(day)
+            if not intervals:
+                continue
+            # Bookings before i start before `end`; one of them clashes if
+            # the latest end among them is after `start`
+            i = bisect.bisect_left(intervals, (end,))
+            if i > 0 and self.reach[day][i - 1][0] > start:
+                return self.reach[day][i - 1][1], day
+        return None
+
+    def is_free(self, slots):
+        return self.clash(slots) is None
+
+    def book(self, slots, request_id):
+        for day, start, end in slots:
+            intervals = self.busy[day]
+            i = bisect.bisect_right(intervals, (start, end, request_id))
+            intervals.insert(i, (start, end, request_id))
+            reach = self.reach[day]
+            reach.insert(i, None)
+            for j in range(i, len(intervals)):
+                reach[j] = max(reach[j - 1], intervals[j][1:]) if j else intervals[j][1:]
+
+
+def _slots(req, start, end):
+    return [(day, _minutes(s), _minutes(e)) for day, s, e in occurrences(req, start, end)]
+
+
+def _room_id(req):
+    return req.classroom_id if req.room_type == "classroom" else req.lab_id
+
+
+def _approved(start, end, rooms, exclude=()):
+    """Book every approved request in [start, end] into the matching rooms."""
+    qs = RoomRequest.objects.filter(status="approved", requested_date__lte=end).filter(
+        Q(recurrence="", requested_date__gte=start) | Q(recurrence_until__gte=start)
+    ).exclude(id__in=exclude)
+    qs = qs.filter(
+        Q(room_type="classroom", classroom_id__in=[room_id for kind, room_id in rooms if kind == "classroom"])
+        | Q(room_type="lab", lab_id__in=[room_id for kind, room_id in rooms if kind == "lab"])
+    )
+    found = {}
+    for req in qs:
+        room = rooms.get((req.room_type, _room_id(req)))
+        if room is not None:
+            room.book(_slots(req, start, end), req.id)
+            found[req.id] = req
+    return found
+
+
+def propose(start, end):
+    pending = list(
+        RoomRequest.objects.filter(status="pending", requested_date__gte=start, requested_date__lte=end)
+        .select_related("requested_by")
+    )
+    # Recurring requests may run past `end`; check them over their whole span
+    horizon = max([end] + [last_date(req) for req in pending])
+
+    rooms = {}
+    by_type = {}
+    for room_type, model in ROOM_MODELS.items():
+        rows = model.objects.order_by("max_capacity", "id").values_list("id", "name", "max_capacity")
+        by_type[room_type] = [_Room(room_type, room_id, name, capacity) for room_id, name, capacity in rows]
+        for room in by_type[room_type]:
+            rooms[(room_type, room.id)] = room
+    capacities = {room_type: [room.capacity for room in room_list] for room_type, room_list in by_type.items()}
+
+    _approved(start, horizon, rooms)
+
+    # Largest classes first, then earliest
+    pending.sort(key=lambda r: (-r.expected_attendees, r.requested_date, r.start_time, r.id))
+    assignments, unassigned = [], []
+    for req in pending:
+        room_list = by_type.get(req.room_type)
+        if not room_list:
+            unassigned.append((req, "Unknown room type"))
+            continue
+        slots = _slots(req, start, horizon)
+        needed = max(req.expected_attendees, 1)
+        chosen = None
+        # Honour a room the lecturer asked for if it fits and is free
+        preferred = rooms.get((req.room_type, _room_id(req)))
+        if preferred is not None and preferred.capacity >= needed and preferred.is_free(slots):
+            chosen = preferred
+        else:
+            first = bisect.bisect_left(capacities[req.room_type], needed)
+            for room in room_list[first:]:
+                if room.is_free(slots):
+                    chosen = room
+                    break
+        if chosen is None:
+            big_enough = bisect.bisect_left(capacities[req.room_type], needed) < len(room_list)
+            unassigned.append((req, "All rooms that fit are booked" if big_enough else "No room is big enough"))
+            continue
+        chosen.book(slots, req.id)
+        assignments.append((req, chosen))
+
+    return {
+        "assignments": [{
+            "request_id": req.id,
+            "requested_by": req.requested_by.email,
+            "requested_date": req.requested_date.isoformat(),
+            "start_time": req.start_time.isoformat(),
+            "end_time": req.end_time.isoformat(),
+            "expected_attendees": req.expected_attendees,
+            "room_type": room.room_type,
+            "room_id": room.id,
+            "room_name": room.name,
+            "max_capacity": room.capacity,
+            "wasted_seats": room.capacity - req.expected_attendees,
+        } for req, room in sorted(assignments, key=lambda a: a[0].id)],
+        "unassigned": [{
+            "request_id": req.id,
+            "expected_attendees": req.expected_attendees,
+            "reason": reason,
+        } for req, reason in unassigned],
+        "wasted_seats": sum(room.capacity - req.expected_attendees for req, room in assignments),
+    }
+
+
+def check(assignments):
+    """Conflicts for a batch of (request, room_type, room_id) about to be approved.
+
+    Each request is checked against the approved bookings of its room and
+    against the requests before it in the batch. Returns [(other, date)]
+    for the first request that clashes, or [] if the batch is clean.
+    """
+    if not assignments:
+        return []
+    start = min(req.requested_date for req, _, _ in assignments)
+    end = max(last_date(req) for req, _, _ in assignments)
+    rooms = {(room_type, room_id): _Room(room_type, room_id, "", 0) for _, room_type, room_id in assignments}
+    known = _approved(start, end, rooms, exclude=[req.id for req, _, _ in assignments])
+    for req, room_type, room_id in assignments:
+        room = rooms[(room_type, room_id)]
+        slots = _slots(req, start, end)
+        clash = room.clash(slots)
+        if clash is not None:
+            other_id, day = clash
+            return [(known[other_id], day)]
+        room.book(slots, req.id)
+        known[req.id] = req
+    return []
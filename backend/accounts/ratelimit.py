@@ -0,0 +1,187 @@
+"""
+Token-bucket rate limiting for the endpoints that are cheap to call and
+expensive to serve (login hashes a password, fault reports and library
+updates create rows and notifications).
+
+RATE_LIMITS in settings maps a limit name to buckets by scope:
+
+    "create_fault": {"user": "10/min", "ip": "30/min", "endpoint": "300/min"}
+
+"user" is per authenticated user (for login, per submitted email), "ip" per
+client address and "endpoint" is one bucket shared by every caller. "N/min"
+allows bursts of N and refills N tokens per minute. A request is refused
+with 429 and Retry-After as soon as one of its buckets is empty, and then
+takes nothing from the others, so a throttled client cannot drain the
+shared endpoint bucket.
+
+Buckets live in a fixed-size table in a memory-mapped file in RUNTIME_DIR,
+so every worker process of a deployment shares them. A bucket is found by
+hashing its key into a group of WAYS slots; a new key takes the
+least recently used slot of its group. Each check locks only the groups
+of its buckets (fcntl byte-range locks, taken in order), so a check is a
+few hashes, locks and struct reads and writes. Without fcntl (Windows)
+the lock is per process only.
+"""
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SLOT = struct.Struct("<Qdd")  # key hash, tokens, last refill time
+SLOTS = 1 << 16
+WAYS = 4
+GROUP_BYTES = SLOT.size * WAYS
+PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60,
+           "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+RATE_RE = re.compile(r"^(\d+)/(\d*)(%s)$" % "|".join(sorted(PERIODS, key=len, reverse=True)))
+
+_lock = threading.Lock()
+_table = None
+_rules = {}
+
+
+def parse_rate(rate):
+    """"10/min" or "100/15min" -> (burst capacity, tokens refilled per second)."""
+    match = RATE_RE.match(rate.strip())
+    if not match:
+        raise ValueError(f"Invalid rate: {rate!r}")
+    count, multiple, unit = match.groups()
+    seconds = int(multiple or 1) * PERIODS[unit]
+    return int(count), int(count) / seconds
+
+
+def _rules_for(name):
+    config = getattr(settings, "RATE_LIMITS", {}).get(name, {})
+    cached = _rules.get(name)
+    if cached is None or cached[0] is not config:
+        cached = _rules[name] = (config, [(scope, *parse_rate(rate)) for scope, rate in config.items()])
+    return cached[1]
+
+
+def _open_table():
+    global _table
+    if _table is None:
+        os.makedirs(str(settings.RUNTIME_DIR), exist_ok=True)
+        path = os.path.join(str(settings.RUNTIME_DIR), "ratelimit.buckets")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < SLOTS * SLOT.size:
+            os.ftruncate(fd, SLOTS * SLOT.size)
+        _table = (fd, mmap.mmap(fd, SLOTS * SLOT.size))
+    return _table
+
+
+def _key_hash(key):
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def _group_of(key_hash):
+    return (key_hash % (SLOTS // WAYS)) * GROUP_BYTES
+
+
+def _find(table, key_hash, capacity, refill, now, taken):
+    # (slot, current tokens) of a bucket; a new key gets the least recently
+    # used slot of its group that `taken` does not already hold
+    offset = _group_of(key_hash)
+    oldest, oldest_at = None, math.inf
+    for at in range(offset, offset + GROUP_BYTES, SLOT.size):
+        stored, stored_tokens, stamp = SLOT.unpack_from(table, at)
+        if stored == key_hash:
+            return at, min(capacity, stored_tokens + (now - stamp) * refill)
+        if stamp < oldest_at and at not in taken:
+            oldest, oldest_at = at, stamp
+    return oldest, float(capacity)
+
+
+def take_all(buckets, now=None):
+    """Take one token from each of `buckets`, (key, capacity, refill), or from none.
+
+    Returns 0 if every bucket had a token, otherwise the seconds until the
+    emptiest one has one; a refused request is not charged anywhere. All
+    the groups involved stay locked from the check to the deduction.
+    """
+    now = time.time() if now is None else now
+    hashed = [(_key_hash(key), capacity, refill) for key, capacity, refill in buckets]
+    # Lock in offset order so two checks never wait on each other
+    offsets = sorted({_group_of(key_hash) for key_hash, _, _ in hashed})
+    with _lock:
+        fd, table = _open_table()
+        locked = []
+        try:
+            for offset in offsets:
+                if fcntl:
+                    fcntl.lockf(fd, fcntl.LOCK_EX, GROUP_BYTES, offset)
+                locked.append(offset)
+            found, taken, wait = [], set(), 0
+            for key_hash, capacity, refill in hashed:
+                slot, tokens = _find(table, key_hash, capacity, refill, now, taken)
+                taken.add(slot)
+                found.append((slot, key_hash, tokens))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / refill)
+            if wait:
+                return wait
+            for slot, key_hash, tokens in found:
+                SLOT.pack_into(table, slot, key_hash, tokens - 1, now)
+            return 0
+        finally:
+            if fcntl:
+                for offset in reversed(locked):
+                    fcntl.lockf(fd, fcntl.LOCK_UN, GROUP_BYTES, offset)
+
+
+def take(key, capacity, refill, now=None):
+    """Take one token from a bucket; returns 0 or the seconds until one is free."""
+    return take_all([(key, capacity, refill)], now)
+
+
+def check(name, request, user_key=None):
+    """Charge every bucket of a limit if all allow the call; returns the wait, 0 if allowed."""
+    identities = {"endpoint": "", "ip": request.META.get("REMOTE_ADDR", "")}
+    if user_key is not None:
+        identities["user"] = user_key
+    elif getattr(request, "user_obj", None) is not None:
+        identities["user"] = str(request.user_obj.id)
+    return take_all([
+        (f"{name}:{scope}:{identities[scope]}", capacity, refill)
+        for scope, capacity, refill in _rules_for(name)
+        if scope in identities
+    ])
+
+
+def rate_limit(name, user_key=None):
+    """Refuse calls over the RATE_LIMITS[name] buckets with 429.
+
+    Goes below @require_auth so the user is known; `user_key(request)` can
+    name the caller instead, for endpoints without a token.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method == "OPTIONS":
+                return view_func(request, *args, **kwargs)
+            wait = check(name, request, user_key(request) if user_key else None)
+            if wait:
+                retry_after = max(1, math.ceil(wait))
+                response = JsonResponse(
+                    {"message": "Too many requests, please try again later", "retry_after": retry_after},
+                    status=429,
+                )
+                response["Retry-After"] = str(retry_after)
+                return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,126 @@
+"""
+Recurring room bookings.
+
+A RoomRequest with a recurrence stores only the rule: frequency (weekly or
+biweekly), an end date and a list of skipped dates. Occurrences are never
+stored as rows; they are generated on demand for whatever window a caller
+asks about, starting directly at the first occurrence inside the window.
+"""
+from datetime import date, datetime, timedelta
+
+from django.db.models import Q
+
+from .models import RoomRequest
+
+STEP_DAYS = {"weekly": 7, "biweekly": 14}
+# Longest series we accept, a generous academic year
+MAX_OCCURRENCES = 60
+
+
+class RecurrenceError(ValueError):
+    pass
+
+
+def parse_rule(rule, first_date):
+    """Validate a request's "recurrence" object.
+
+    Returns (frequency, until, exceptions) ready to store on a RoomRequest.
+    """
+    if not rule:
+        return "", None, []
+    if not isinstance(rule, dict):
+        raise RecurrenceError("recurrence must be an object")
+    frequency = rule.get("frequency")
+    if frequency not in STEP_DAYS:
+        raise RecurrenceError(f"recurrence.frequency must be one of: {', '.join(STEP_DAYS)}")
+    step = STEP_DAYS[frequency]
+    if rule.get("until"):
+        until = date.fromisoformat(rule["until"][:10])
+    elif rule.get("count"):
+        until = first_date + timedelta(days=step * (int(rule["count"]) - 1))
+    else:
+        raise RecurrenceError("recurrence needs either until or count")
+    if until < first_date:
+        raise RecurrenceError("recurrence.until is before the first date")
+    if (until - first_date).days // step + 1 > MAX_OCCURRENCES:
+        raise RecurrenceError(f"A recurring booking can have at most {MAX_OCCURRENCES} occurrences")
+    exceptions = sorted({date.fromisoformat(d[:10]).isoformat() for d in rule.get("exceptions", [])})
+    return frequency, until, exceptions
+
+
+def last_date(req):
+    return req.recurrence_until if req.recurrence else req.requested_date
+
+
+def occurs_on(req, day):
+    if day < req.requested_date or day > last_date(req):
+        return False
+    if not req.recurrence:
+        return True
+    if (day - req.requested_date).days % STEP_DAYS[req.recurrence]:
+        return False
+    return day.isoformat() not in req.recurrence_exceptions
+
+
+def occurrences(req, start, end):
+    """Yield (date, start_time, end_time) for every occurrence in [start, end]."""
+    first, last = req.requested_date, min(last_date(req), end)
+    if not req.recurrence:
+        if start <= first <= last:
+            yield first, req.start_time, req.end_time
+        return
+    step = STEP_DAYS[req.recurrence]
+    # Jump straight to the first occurrence on or after `start`
+    skip = max(0, -(-(start - first).days // step))
+    day = first + timedelta(days=skip * step)
+    exceptions = set(req.recurrence_exceptions)
+    while day <= last:
+        if day.isoformat() not in exceptions:
+            yield day, req.start_time, req.end_time
+        day += timedelta(days=step)
+
+
+def _times_overlap(a, b):
+    return a.start_time < b.end_time and b.start_time < a.end_time
+
+
+def find_conflicts(req, room_type, room_id, limit=10):
+    """Approved bookings of the given room that overlap any occurrence of req.
+
+    Returns a list of (other request, date). Candidates come from one range
+    query on the booking's date span; each of req's occurrences is then
+    checked against them arithmetically, without expanding the others.
+    """
+    start, end = req.requested_date, last_date(req)
+    room_filter = {"classroom_id": room_id} if room_type == "classroom" else {"lab_id": room_id}
+    candidates = (
+        RoomRequest.objects.filter(status="approved", room_type=room_type, requested_date__lte=end, **room_filter)
+        .filter(Q(recurrence="", requested_date__gte=start) | Q(recurrence_until__gte=start))
+        .exclude(id=req.id)
+    )
+    candidates = [other for other in candidates if _times_overlap(req, other)]
+    conflicts = []
+    if not candidates:
+        return conflicts
+    for day, _, _ in occurrences(req, start, end):
+        for other in candidates:
+            if occurs_on(other, day):
+                conflicts.append((other, day))
+                if len(conflicts) >= limit:
+                    return conflicts
+    return conflicts
+
+
+def expand(requests, start, end):
+    """Flatten bookings into occurrence dicts for the window [start, end]."""
+    result = []
+    for req in requests:
+        for day, start_time, end_time in occurrences(req, start, end):
+            result.append({
+                "request_id": req.id,
+                "date": day.isoformat(),
+                "start": datetime.combine(day, start_time).isoformat(),
+                "end": datetime.combine(day, end_time).isoformat(),
+            })
+    result.sort(key=lambda o: o["start"])
+    return result
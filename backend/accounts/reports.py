@@ -0,0 +1,225 @@
+"""
+Daily reporting rollups for faults and room usage.
+
+FaultDaily holds, per campus, day, category and severity, how many faults
+were reported and resolved that day and their summed time to resolution.
+BookingDaily holds, per campus, day and room type, the approved booking
+occurrences and their booked minutes. The /api/reports/* views group these
+by week in the database, so a report over a year reads at most a few
+thousand small rows and never the FaultReport or RoomRequest tables.
+
+The rollups are maintained like the occupancy rollups (rollups.py): a view
+takes fault_contribution()/booking_contribution() before changing a row,
+and apply(before, after) afterwards writes only the difference, as F()
+updates on the few day buckets involved. Archiving a row does not touch
+them. rebuild() recomputes everything from the live and archived rows, for
+`manage.py rebuild_reports` after edits made outside the views.
+"""
+from datetime import datetime, timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+
+from . import archive, recurrence
+from .models import (
+    ArchivedRecord, BookingDaily, ClassroomStatus, FaultDaily, FaultReport,
+    LabStatus, RoomRequest,
+)
+from .rollups import default_campus
+
+SETTLED_STATUSES = ("resolved", "closed")
+
+# model -> (bucket fields after campus and day, counter fields)
+TABLES = {
+    FaultDaily: (("category", "severity"), ("reported", "resolved", "resolution_seconds")),
+    BookingDaily: (("room_type",), ("bookings", "booked_minutes")),
+}
+
+
+def _add(totals, key, values):
+    current = totals.get(key)
+    totals[key] = values if current is None else tuple(a + b for a, b in zip(current, values))
+
+
+def combine(contributions):
+    """Sum several contributions into one."""
+    totals = {}
+    for contribution in contributions:
+        for key, values in contribution.items():
+            _add(totals, key, values)
+    return totals
+
+
+def fault_contribution(fault):
+    """{bucket: counters} a fault adds to FaultDaily."""
+    if fault.pk is None:
+        return {}
+    campus_id = fault.campus_id or default_campus().id
+    totals = {}
+    _add(totals, (FaultDaily, campus_id, timezone.localdate(fault.created_at), fault.category, fault.severity), (1, 0, 0))
+    if fault.status in SETTLED_STATUSES and fault.resolved_at:
+        seconds = max(int((fault.resolved_at - fault.created_at).total_seconds()), 0)
+        _add(totals, (FaultDaily, campus_id, timezone.localdate(fault.resolved_at), fault.category, fault.severity), (0, 1, seconds))
+    return totals
+
+
+def booking_contribution(req):
+    """{bucket: counters} an approved booking adds to BookingDaily."""
+    if req.pk is None or req.status != "approved":
+        return {}
+    campus_id = req.campus_id or default_campus().id
+    start = datetime.combine(req.requested_date, req.start_time)
+    minutes = max(int((datetime.combine(req.requested_date, req.end_time) - start).total_seconds() // 60), 0)
+    totals = {}
+    for day, _, _ in recurrence.occurrences(req, req.requested_date, recurrence.last_date(req)):
+        _add(totals, (BookingDaily, campus_id, day, req.room_type), (1, minutes))
+    return totals
+
+
+def apply(before, after):
+    """Move the rollups from contribution `before` to `after` (dicts, may be empty)."""
+    diff = dict(after)
+    for key, values in before.items():
+        _add(diff, key, tuple(-v for v in values))
+    diff = {key: values for key, values in diff.items() if any(values)}
+    for model, (bucket_fields, counters) in TABLES.items():
+        keys = [key for key in diff if key[0] is model]
+        if not keys:
+            continue
+        # Make sure every bucket exists, then bump the counters in place
+        model.objects.bulk_create([
+            model(campus_id=key[1], day=key[2], **dict(zip(bucket_fields, key[3:]))) for key in keys
+        ], ignore_conflicts=True)
+        for key in keys:
+            model.objects.filter(campus_id=key[1], day=key[2], **dict(zip(bucket_fields, key[3:]))).update(
+                **{name: F(name) + value for name, value in zip(counters, diff[key]) if value}
+            )
+
+
+def rebuild(campus_ids=None):
+    """Recompute FaultDaily and BookingDaily from live and archived rows.
+
+    Covers the rows visible in the current context, like rollups.rebuild().
+    """
+    faults = FaultReport.objects.only(
+        "campus_id", "category", "severity", "status", "created_at", "resolved_at"
+    )
+    bookings = RoomRequest.objects.filter(status="approved").only(
+        "campus_id", "room_type", "status", "requested_date", "start_time", "end_time",
+        "recurrence", "recurrence_until", "recurrence_exceptions",
+    )
+    archived = ArchivedRecord.objects.filter(kind__in=["faultreport", "roomrequest"])
+    if campus_ids is not None:
+        archived = archived.filter(campus_id__in=campus_ids)
+    rows = chain(
+        faults.iterator(),
+        bookings.iterator(),
+        (archive.restore(record) for record in archived.iterator()),
+    )
+    totals = combine(
+        fault_contribution(row) if isinstance(row, FaultReport) else booking_contribution(row)
+        for row in rows
+    )
+    for model, (bucket_fields, counters) in TABLES.items():
+        stale = model.objects.all()
+        if campus_ids is not None:
+            stale = stale.filter(campus_id__in=campus_ids)
+        stale.delete()
+        model.objects.bulk_create([
+            model(
+                campus_id=key[1], day=key[2],
+                **dict(zip(bucket_fields, key[3:])), **dict(zip(counters, values)),
+            )
+            for key, values in totals.items() if key[0] is model
+        ], batch_size=1000)
+
+
+def _scoped(model, campus, start, end):
+    qs = model.objects.filter(day__gte=start, day__lte=end)
+    return qs.filter(campus=campus) if campus is not None else qs
+
+
+def _hours(seconds, count):
+    return round(seconds / count / 3600, 2) if count else None
+
+
+def fault_weekly(campus, start, end, group=("category", "severity")):
+    """Faults reported and resolved per week (and per `group` fields)."""
+    rows = (
+        _scoped(FaultDaily, campus, start, end)
+        .annotate(week=TruncWeek("day"))
+        .values("week", *group)
+        .annotate(reported=Sum("reported"), resolved=Sum("resolved"), resolution_seconds=Sum("resolution_seconds"))
+        .order_by("week", *group)
+    )
+    return [{
+        "week": row["week"].isoformat(),
+        **{field: row[field] for field in group},
+        "reported": row["reported"],
+        "resolved": row["resolved"],
+        "mean_resolution_hours": _hours(row["resolution_seconds"], row["resolved"]),
+    } for row in rows]
+
+
+def fault_resolution(campus, start, end, group=None):
+    """Mean time to resolution over the whole range, overall or per `group`."""
+    qs = _scoped(FaultDaily, campus, start, end)
+    sums = {"resolved_count": Sum("resolved"), "seconds": Sum("resolution_seconds")}
+    rows = qs.values(group).order_by(group).annotate(**sums) if group else [qs.aggregate(**sums)]
+    return [{
+        **({group: row[group]} if group else {}),
+        "resolved": row["resolved_count"] or 0,
+        "mean_resolution_hours": _hours(row["seconds"] or 0, row["resolved_count"] or 0),
+    } for row in rows]
+
+
+def _open_minutes(start, end):
+    """Bookable minutes per room between start and end, split by week."""
+    open_weekdays = getattr(settings, "REPORT_OPEN_WEEKDAYS", [0, 1, 2, 3, 4])
+    minutes = getattr(settings, "REPORT_OPEN_MINUTES_PER_DAY", 12 * 60)
+    weeks = {}
+    day = start
+    while day <= end:
+        if day.weekday() in open_weekdays:
+            week = day - timedelta(days=day.weekday())
+            weeks[week] = weeks.get(week, 0) + minutes
+        day += timedelta(days=1)
+    return weeks
+
+
+def room_utilization(campus, start, end):
+    """Booked versus bookable hours per week and room type.
+
+    Bookable time is every room that exists now, open for
+    REPORT_OPEN_MINUTES_PER_DAY on REPORT_OPEN_WEEKDAYS.
+    """
+    rooms = {"classroom": ClassroomStatus.objects, "lab": LabStatus.objects}
+    room_counts = {
+        room_type: (manager.filter(campus=campus) if campus is not None else manager.all()).count()
+        for room_type, manager in rooms.items()
+    }
+    booked = {
+        (row["week"], row["room_type"]): row
+        for row in _scoped(BookingDaily, campus, start, end)
+        .annotate(week=TruncWeek("day"))
+        .values("week", "room_type")
+        .annotate(bookings=Sum("bookings"), booked_minutes=Sum("booked_minutes"))
+    }
+    result = []
+    for week, open_minutes in sorted(_open_minutes(start, end).items()):
+        for room_type, count in room_counts.items():
+            row = booked.get((week, room_type), {"bookings": 0, "booked_minutes": 0})
+            available = count * open_minutes
+            result.append({
+                "week": week.isoformat(),
+                "room_type": room_type,
+                "rooms": count,
+                "bookings": row["bookings"],
+                "booked_hours": round(row["booked_minutes"] / 60, 2),
+                "available_hours": round(available / 60, 2),
+                "utilization": round(row["booked_minutes"] / available, 4) if available else None,
+            })
+    return result
@@ -0,0 +1,97 @@
+"""
+Cached list responses for list_faults and list_room_requests.
+
+A cached response is keyed by endpoint, campus and scope: "all" for the
+managers and admins, who all see the same list, or "user:<id>" for
+everyone else, who see only their own rows. The body is stored as the
+encoded JSON, so a hit costs two cache reads and no queries.
+
+The backend is the "results" entry of CACHES (local memory, a directory in
+RUNTIME_DIR or a shared Redis, see settings.py). Local memory is only
+correct with a single worker process.
+
+Writes never delete cached bodies. Each key carries two generation tokens,
+one per campus and one per (campus, scope), and the write views replace the
+tokens of exactly the lists a change shows up in once the transaction
+commits: the owner's personal list, the campus-wide list and the
+all-campuses list. A reader that raced the write stored its body under the
+old tokens, which nobody looks up again, and rebuilds read the primary, so
+a write is never hidden behind a lagging replica.
+"""
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .routing import pinned
+
+ALL_CAMPUSES = "*"
+TIMEOUT = 300
+
+
+def _cache():
+    return caches[getattr(settings, "RESULT_CACHE_ALIAS", "results")]
+
+
+def scope_for(user, role):
+    return "all" if role in ["manager", "admin"] else f"user:{user.id}"
+
+
+def _campus_key(campus_id):
+    return ALL_CAMPUSES if campus_id is None else str(campus_id)
+
+
+def _generation_keys(endpoint, campus, scope):
+    return f"gen:{endpoint}:{campus}", f"gen:{endpoint}:{campus}:{scope}"
+
+
+def _new_token():
+    return time.time_ns()
+
+
+def respond(endpoint, request, scope, build):
+    """Serve `build()` (a JSON-ready dict) from the cache when it is current."""
+    cache = _cache()
+    campus = _campus_key(request.campus.id if request.campus else None)
+    keys = _generation_keys(endpoint, campus, scope)
+    tokens = cache.get_many(keys)
+    for key in keys:
+        if key not in tokens:
+            # A missing token must never match a body cached before it expired
+            cache.add(key, _new_token(), None)
+            tokens[key] = cache.get(key)
+    body_key = f"body:{endpoint}:{campus}:{scope}:{tokens[keys[0]]}:{tokens[keys[1]]}"
+    body = cache.get(body_key)
+    if body is None:
+        with pinned():
+            body = json.dumps(build()).encode()
+        cache.set(body_key, body, TIMEOUT)
+    return HttpResponse(body, content_type="application/json")
+
+
+def _bump(keys):
+    def bump():
+        token = _new_token()
+        _cache().set_many({key: token for key in keys}, None)
+    transaction.on_commit(bump)
+
+
+def invalidate(endpoint, campus_id, owner_id):
+    """A row owned by `owner_id` in `campus_id` changed."""
+    campus = _campus_key(campus_id)
+    _bump([
+        _generation_keys(endpoint, campus, f"user:{owner_id}")[1],
+        _generation_keys(endpoint, campus, "all")[1],
+        _generation_keys(endpoint, ALL_CAMPUSES, "all")[1],
+    ])
+
+
+def invalidate_campus(endpoint, campus_id):
+    """Something every list of a campus shows changed (a room name, a thumbnail)."""
+    _bump([
+        _generation_keys(endpoint, _campus_key(campus_id), "all")[0],
+        _generation_keys(endpoint, ALL_CAMPUSES, "all")[0],
+    ])
@@ -0,0 +1,148 @@
+"""
+Campus -> building -> room occupancy rollups.
+
+Every library, lab and classroom points at a Building (resolved from its
+free-text building name), and every Building belongs to a Campus. Campus
+and Building rows carry rooms / max_capacity / current_occupancy totals, so
+reading them is a single-row lookup.
+
+The totals are never recomputed on write. Views take contribution(room)
+before changing a room and call save(room, before) instead of room.save();
+only the difference is applied, as F() updates on at most two buildings and
+two campuses. rebuild() recomputes everything from the rooms, for
+`manage.py rebuild_rollups` after bulk edits made outside the views.
+"""
+from django.db.models import Count, F, Sum
+
+from . import campuses
+from .models import Campus, Building, LibraryStatus, LabStatus, ClassroomStatus
+
+ROOM_MODELS = {"library": LibraryStatus, "lab": LabStatus, "classroom": ClassroomStatus}
+
+
+def default_campus():
+    campus, _ = Campus.objects.get_or_create(name=campuses.DEFAULT_CAMPUS)
+    return campus
+
+
+def resolve_building(name, campus=None):
+    name = (name or "").strip()
+    if not name:
+        return None
+    building, _ = Building.objects.get_or_create(campus=campus or default_campus(), name=name)
+    return building
+
+
+def contribution(room):
+    """(campus id, building id, capacity, occupancy) a room adds to the totals."""
+    campus_id = room.campus_id or default_campus().id
+    # int() in case a caller assigned the raw value from a request body
+    return campus_id, room.building_ref_id, int(room.max_capacity or 0), int(room.current_occupancy or 0)
+
+
+def _add(model, pk, rooms, capacity, occupancy):
+    if pk is None or not (rooms or capacity or occupancy):
+        return
+    model.objects.filter(pk=pk).update(
+        rooms=F("rooms") + rooms,
+        max_capacity=F("max_capacity") + capacity,
+        current_occupancy=F("current_occupancy") + occupancy,
+    )
+
+
+def apply(before, after):
+    """Move a room's contribution from `before` to `after` (either may be None)."""
+    for index, model in ((0, Campus), (1, Building)):
+        old = before[index] if before else None
+        new = after[index] if after else None
+        if before and after and old == new:
+            _add(model, new, 0, after[2] - before[2], after[3] - before[3])
+            continue
+        if before:
+            _add(model, old, -1, -before[2], -before[3])
+        if after:
+            _add(model, new, 1, after[2], after[3])
+
+
+def save(room, before=None):
+    """Save a room and fold the change into the rollups.
+
+    `before` is contribution(room) taken before the room was modified, or
+    None for a new room.
+    """
+    if room.campus_id is None:
+        room.campus = campuses.current() or default_campus()
+    building = resolve_building(room.building, room.campus)
+    if building is None or building.id != room.building_ref_id:
+        room.building_ref = building
+    room.save()
+    apply(before, contribution(room))
+
+
+def rebuild(campus_ids=None):
+    """Recompute Campus and Building totals from the rooms.
+
+    Covers the rooms visible in the current context: every campus on the
+    shared database, or one campus while it is active.
+    """
+    default_id = default_campus().id
+    buildings, totals_by_campus = {}, {}
+    for model in ROOM_MODELS.values():
+        rows = model.objects.values("campus", "building_ref").annotate(
+            rooms=Count("id"), capacity=Sum("max_capacity"), occupancy=Sum("current_occupancy")
+        )
+        for row in rows:
+            totals = (row["rooms"], row["capacity"] or 0, row["occupancy"] or 0)
+            targets = [(totals_by_campus, row["campus"] or default_id)]
+            if row["building_ref"] is not None:
+                targets.append((buildings, row["building_ref"]))
+            for bucket, pk in targets:
+                current = bucket.get(pk, (0, 0, 0))
+                bucket[pk] = tuple(a + b for a, b in zip(current, totals))
+    for model, bucket, scope in (
+        (Building, buildings, "campus_id__in"),
+        (Campus, totals_by_campus, "id__in"),
+    ):
+        stale = model.objects.all()
+        if campus_ids is not None:
+            stale = stale.filter(**{scope: campus_ids})
+        stale.update(rooms=0, max_capacity=0, current_occupancy=0)
+        for pk, (rooms, capacity, occupancy) in bucket.items():
+            model.objects.filter(pk=pk).update(rooms=rooms, max_capacity=capacity, current_occupancy=occupancy)
+
+
+def _totals(row):
+    return {
+        "id": row.id,
+        "name": row.name,
+        "rooms": row.rooms,
+        "max_capacity": row.max_capacity,
+        "current_occupancy": row.current_occupancy,
+        "free_seats": max(row.max_capacity - row.current_occupancy, 0),
+    }
+
+
+def campus_totals(campus, drill_down=False):
+    result = _totals(campus)
+    if drill_down:
+        result["buildings"] = [_totals(b) for b in campus.buildings.order_by("name")]
+    return result
+
+
+def building_totals(building, drill_down=False):
+    result = _totals(building)
+    result["campus"] = building.campus.name
+    if drill_down:
+        rooms = []
+        for room_type, model in ROOM_MODELS.items():
+            for room in model.objects.filter(building_ref=building).order_by("name"):
+                rooms.append({
+                    "type": room_type,
+                    "id": room.id,
+                    "name": room.name,
+                    "room_number": getattr(room, "room_number", ""),
+                    "max_capacity": room.max_capacity,
+                    "current_occupancy": room.current_occupancy,
+                })
+        result["rooms_detail"] = rooms
+    return result
@@ -0,0 +1,157 @@
+"""
+Read-replica routing.
+
+ReplicaMiddleware marks GET/HEAD/OPTIONS requests as safe to read from a
+replica; everything else, and all code running outside a request (job
+worker, scheduler, management commands), uses the primary. Within a safe
+request the router still goes to the primary when
+
+- the request has already written something (any INSERT/UPDATE/DELETE on
+  the primary connection pins the rest of the request),
+- the code is inside a transaction on the primary, or
+- the user wrote something less than REPLICA_STICKY_SECONDS ago, so they
+  read their own writes even while the replicas lag.
+
+The last-write time per user is the mtime of a file in RUNTIME_DIR, which
+every worker process of a deployment can see.
+
+Replicas are the aliases listed in DATABASE_REPLICAS. Locally they can be
+plain SQLite copies of the primary (DB_REPLICAS env var in settings.py),
+refreshed with `manage.py sync_replicas`.
+
+Campus-partitioned tables go to the active campus's own database when it
+has one (CAMPUS_DATABASES, see campuses.py); those are read and written
+there directly, without replicas.
+"""
+import contextlib
+import os
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from . import campuses
+from .jwt import decode_token
+
+PRIMARY = "default"
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLAC")
+
+_state = threading.local()
+
+
+def replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def _sticky_path(user_id):
+    return os.path.join(str(settings.RUNTIME_DIR), "sticky", str(user_id))
+
+
+def mark_sticky(user_id):
+    path = _sticky_path(user_id)
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "a").close()
+
+
+def is_sticky(user_id):
+    try:
+        age = time.time() - os.stat(_sticky_path(user_id)).st_mtime
+    except FileNotFoundError:
+        return False
+    return age < getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+
+@contextlib.contextmanager
+def pinned():
+    """Send every read in the block to the primary."""
+    previous = getattr(_state, "pinned", False)
+    _state.pinned = True
+    try:
+        yield
+    finally:
+        _state.pinned = previous
+
+
+def _read_from_replica():
+    if not getattr(_state, "replica_ok", False):
+        return False
+    if getattr(_state, "pinned", False) or getattr(_state, "wrote", False):
+        return False
+    return not connections[PRIMARY].in_atomic_block
+
+
+def _campus_database(model):
+    if model._meta.model_name not in campuses.PARTITIONED_MODELS:
+        return None
+    return campuses.current_database()
+
+
+def write_databases():
+    """Every database a write in the current context can touch."""
+    alias = campuses.current_database()
+    return [PRIMARY, alias] if alias else [PRIMARY]
+
+
+class DatabaseRouter:
+    def db_for_read(self, model, **hints):
+        alias = _campus_database(model)
+        if alias:
+            return alias
+        names = replicas()
+        if names and _read_from_replica():
+            return random.choice(names)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        return _campus_database(model) or PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary, and campus databases
+        # hold copies of the rows they point at on the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in replicas()
+
+
+def _user_id(request):
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if not auth.startswith("Bearer "):
+        return None
+    try:
+        payload = decode_token(auth[len("Bearer "):].strip())
+    except ValueError:
+        return None
+    return payload.get("sub") or payload.get("user_id")
+
+
+class ReplicaMiddleware:
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+        user_id = _user_id(request)
+        _state.replica_ok = request.method in self.SAFE_METHODS and not (user_id and is_sticky(user_id))
+        _state.wrote = False
+        try:
+            with connections[PRIMARY].execute_wrapper(self._watch_writes):
+                response = self.get_response(request)
+        finally:
+            _state.replica_ok = False
+        if _state.wrote and user_id:
+            mark_sticky(user_id)
+        return response
+
+    def _watch_writes(self, execute, sql, params, many, context):
+        if sql.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            _state.wrote = True
+        return execute(sql, params, many, context)
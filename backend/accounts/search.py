@@ -0,0 +1,137 @@
+"""
+Full-text index over FaultReport title, description and location.
+
+SQLite uses an FTS5 virtual table keyed by the fault id, PostgreSQL a side
+table holding a weighted tsvector with a GIN index. Both are created by
+migration 0002. The index is updated row by row from create_fault and
+update_fault; other backends fall back to a plain icontains scan.
+
+The index sits next to the faults it covers, so it is read and written on
+whichever database FaultReport is routed to (a campus can have its own),
+and searches only return faults of the active campus.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from . import campuses
+from .models import FaultReport
+
+FTS_TABLE = "accounts_faultreport_fts"
+PG_TABLE = "accounts_faultreport_search"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _connection():
+    return connections[router.db_for_write(FaultReport)]
+
+
+def _vendor():
+    return _connection().vendor
+
+
+def _fts5_query(q):
+    # Quote every term so user input can't inject FTS5 syntax, and let the
+    # last one match as a prefix so results show up while typing.
+    words = _WORD_RE.findall(q)
+    if not words:
+        return ""
+    terms = ['"%s"' % w for w in words[:-1]]
+    terms.append('"%s"*' % words[-1])
+    return " ".join(terms)
+
+
+def index_fault(fault):
+    vendor = _vendor()
+    with _connection().cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [fault.id])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description, location) VALUES (%s, %s, %s, %s)",
+                [fault.id, fault.title, fault.description, fault.location],
+            )
+        elif vendor == "postgresql":
+            cursor.execute(
+                f"""
+                INSERT INTO {PG_TABLE} (fault_id, document)
+                VALUES (%s,
+                        setweight(to_tsvector('english', coalesce(%s, '')), 'A') ||
+                        setweight(to_tsvector('english', coalesce(%s, '')), 'B') ||
+                        setweight(to_tsvector('english', coalesce(%s, '')), 'A'))
+                ON CONFLICT (fault_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                [fault.id, fault.title, fault.description, fault.location],
+            )
+
+
+def remove_fault(fault_id):
+    vendor = _vendor()
+    with _connection().cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [fault_id])
+        elif vendor == "postgresql":
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE fault_id = %s", [fault_id])
+
+
+def search_faults(q, reported_by=None, limit=20, offset=0):
+    """Return (total, [fault ids in rank order]) for the given query.
+
+    reported_by restricts the results to one user's own reports.
+    """
+    vendor = _vendor()
+    owner_sql = " AND f.reported_by_id = %s" if reported_by is not None else ""
+    owner_args = [reported_by.id] if reported_by is not None else []
+    campus = campuses.current()
+    if campus is not None:
+        owner_sql += " AND f.campus_id = %s"
+        owner_args.append(campus.id)
+
+    if vendor == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return 0, []
+        base = (
+            f"FROM {FTS_TABLE} JOIN accounts_faultreport f ON f.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s{owner_sql}"
+        )
+        args = [match] + owner_args
+        # bm25 column weights: title, description, location
+        rank = f"bm25({FTS_TABLE}, 10.0, 1.0, 5.0)"
+    elif vendor == "postgresql":
+        if not _WORD_RE.search(q):
+            return 0, []
+        base = (
+            f"FROM {PG_TABLE} s JOIN accounts_faultreport f ON f.id = s.fault_id, "
+            f"websearch_to_tsquery('english', %s) query "
+            f"WHERE s.document @@ query{owner_sql}"
+        )
+        args = [q] + owner_args
+        # ts_rank_cd is "higher is better"; negate so both branches sort ascending
+        rank = "-ts_rank_cd(s.document, query)"
+    else:
+        return _search_fallback(q, reported_by, limit, offset)
+
+    with _connection().cursor() as cursor:
+        cursor.execute(f"SELECT count(*) {base}", args)
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT f.id {base} ORDER BY {rank}, f.created_at DESC LIMIT %s OFFSET %s",
+            args + [limit, offset],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    return total, ids
+
+
+def _search_fallback(q, reported_by, limit, offset):
+    words = _WORD_RE.findall(q)
+    if not words:
+        return 0, []
+    qs = FaultReport.objects.all()
+    if reported_by is not None:
+        qs = qs.filter(reported_by=reported_by)
+    for word in words:
+        qs = qs.filter(Q(title__icontains=word) | Q(description__icontains=word) | Q(location__icontains=word))
+    qs = qs.order_by("-created_at")
+    return qs.count(), list(qs.values_list("id", flat=True)[offset:offset + limit])
@@ -0,0 +1,93 @@
+"""
+SLA deadlines and status history for fault reports.
+
+Each severity has a resolution target in hours (FAULT_SLA_HOURS). While a
+fault is unsettled its deadline is stored on the row, in
+FaultReport.sla_due_at: it is set when the fault is reported, recomputed
+only when its severity or status changes, and cleared once it is resolved
+or closed. The partial index on (campus, sla_due_at) therefore holds just
+the unsettled faults in deadline order, and breaches() is a range scan
+over it instead of a check of every open fault on each request.
+
+Every status a fault passes through is one FaultStatusChange row with the
+time it was entered and left, written by record_status(). Time in a state
+is left_at - entered_at, which time_in_state() averages in the database.
+History rows carry the fault's campus and stay when the fault is archived,
+so the reports keep counting archived faults.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max
+from django.utils import timezone
+
+from .models import FaultReport, FaultStatusChange
+from .reports import SETTLED_STATUSES
+
+DEFAULT_TARGET_HOURS = {"critical": 4, "high": 24, "medium": 72, "low": 168}
+
+
+def target(severity):
+    """Hours a fault of this severity may stay unsettled."""
+    targets = getattr(settings, "FAULT_SLA_HOURS", DEFAULT_TARGET_HOURS)
+    return targets.get(severity, DEFAULT_TARGET_HOURS["medium"])
+
+
+def deadline(fault):
+    return fault.created_at + timedelta(hours=target(fault.severity))
+
+
+def due_at(fault):
+    """What FaultReport.sla_due_at should hold for the fault as it is now."""
+    return None if fault.status in SETTLED_STATUSES else deadline(fault)
+
+
+def breached(fault, now=None):
+    """Whether the fault missed (or, while unsettled, has already missed) its target."""
+    end = fault.resolved_at if fault.status in SETTLED_STATUSES and fault.resolved_at else (now or timezone.now())
+    return end > deadline(fault)
+
+
+def record_status(fault, user, now=None):
+    """Close the fault's current history row and open one for fault.status."""
+    now = now or timezone.now()
+    FaultStatusChange.objects.filter(fault=fault, left_at__isnull=True).update(left_at=now)
+    FaultStatusChange.objects.create(
+        fault=fault, campus_id=fault.campus_id, status=fault.status, entered_at=now, changed_by=user
+    )
+
+
+def breaches(campus, within, now=None):
+    """Unsettled faults whose deadline is before now + `within`, soonest first."""
+    now = now or timezone.now()
+    qs = FaultReport.objects.filter(sla_due_at__isnull=False, sla_due_at__lte=now + within)
+    if campus is not None:
+        qs = qs.filter(campus=campus)
+    return qs.select_related("reported_by").order_by("sla_due_at")
+
+
+def history(fault, now=None):
+    """The fault's status history, oldest first, with the hours spent in each."""
+    now = now or timezone.now()
+    return [{
+        "status": change.status,
+        "entered_at": change.entered_at.isoformat(),
+        "left_at": change.left_at.isoformat() if change.left_at else None,
+        "hours": round(((change.left_at or now) - change.entered_at).total_seconds() / 3600, 2),
+        "changed_by": change.changed_by.email if change.changed_by else None,
+    } for change in fault.status_changes.select_related("changed_by").order_by("entered_at", "id")]
+
+
+def time_in_state(campus, start, end):
+    """Per status: how many stints ended between start and end, and their mean and longest hours."""
+    qs = FaultStatusChange.objects.filter(left_at__date__gte=start, left_at__date__lte=end)
+    if campus is not None:
+        qs = qs.filter(campus=campus)
+    spent = ExpressionWrapper(F("left_at") - F("entered_at"), output_field=DurationField())
+    rows = qs.values("status").order_by("status").annotate(stints=Count("id"), mean=Avg(spent), longest=Max(spent))
+    return [{
+        "status": row["status"],
+        "stints": row["stints"],
+        "mean_hours": round(row["mean"].total_seconds() / 3600, 2),
+        "max_hours": round(row["longest"].total_seconds() / 3600, 2),
+    } for row in rows]
@@ -0,0 +1,175 @@
+"""
+Prebuilt campus snapshot: every library, lab and classroom with occupancy.
+
+The payload is built once, serialized to compact JSON and gzipped, and kept
+in process memory. Views that change a space call ``invalidate()`` and the
+snapshot is rebuilt after the write commits, so serving it never touches
+the database.
+
+Other processes (more web workers, the availability scheduler) learn about
+an invalidation through the mtime of a stamp file in RUNTIME_DIR, which
+costs one stat() per request. Writes that bypass the views (the admin site,
+scripts) touch no stamp, so every process also rebuilds a snapshot older
+than MAX_AGE; a rebuild that finds nothing changed keeps the version and
+ETag, so clients do not download it again.
+
+There is one snapshot per campus, read from the database that campus
+lives in, and users get their own campus's. The snapshot for admins
+reading ?campus=all (campus None) merges the shared database with every
+campus database in CAMPUS_DATABASES. Each row carries its campus id.
+Snapshots are built lazily on first use, and one stamp covers them all.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Campus, LibraryStatus, LabStatus, ClassroomStatus
+from . import campuses
+from .routing import pinned
+
+LIBRARY_FIELDS = ("id", "campus", "name", "building", "max_capacity", "current_occupancy", "is_open")
+LAB_FIELDS = (
+    "id", "campus", "name", "building", "room_number", "max_capacity",
+    "current_occupancy", "is_available", "equipment_status",
+)
+CLASSROOM_FIELDS = (
+    "id", "campus", "name", "building", "room_number", "max_capacity",
+    "current_occupancy", "is_available",
+)
+
+MAX_AGE = 60  # seconds
+
+
+class Snapshot:
+    __slots__ = ("version", "etag", "body", "gzip_body", "content", "stamp", "built_at")
+
+    def __init__(self, version, body, content):
+        self.version = version
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = '"%s"' % hashlib.sha1(body).hexdigest()[:20]
+        # Digest of the spaces alone, to tell whether a rebuild changed anything
+        self.content = content
+        self.stamp = None
+        self.built_at = None
+
+
+_lock = threading.Lock()
+# campus id, or None for every campus -> Snapshot
+_snapshots = {}
+_version = 0
+
+
+def _stamp_path():
+    return os.path.join(str(settings.RUNTIME_DIR), "snapshot.stamp")
+
+
+def _read_stamp():
+    try:
+        return os.stat(_stamp_path()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def _touch_stamp():
+    path = _stamp_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a"):
+        pass
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+def _totals(rows):
+    return {
+        "count": len(rows),
+        "max_capacity": sum(r["max_capacity"] or 0 for r in rows),
+        "current_occupancy": sum(r["current_occupancy"] or 0 for r in rows),
+    }
+
+
+def _spaces(campus):
+    with campuses.activated(campus):
+        return (
+            list(LibraryStatus.objects.order_by("name").values(*LIBRARY_FIELDS)),
+            list(LabStatus.objects.order_by("building", "name").values(*LAB_FIELDS)),
+            list(ClassroomStatus.objects.order_by("building", "name").values(*CLASSROOM_FIELDS)),
+        )
+
+
+def build_payload(campus=None):
+    if campus is not None:
+        libraries, labs, classrooms = _spaces(campus)
+    else:
+        # The shared database, then each campus database
+        parts = [_spaces(None)] + [
+            _spaces(other) for other in Campus.objects.filter(name__in=getattr(settings, "CAMPUS_DATABASES", {}))
+        ]
+        libraries = sorted((r for part in parts for r in part[0]), key=lambda r: r["name"])
+        labs = sorted((r for part in parts for r in part[1]), key=lambda r: (r["building"], r["name"]))
+        classrooms = sorted((r for part in parts for r in part[2]), key=lambda r: (r["building"], r["name"]))
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "libraries": libraries,
+        "labs": labs,
+        "classrooms": classrooms,
+        "totals": {
+            "libraries": _totals(libraries),
+            "labs": _totals(labs),
+            "classrooms": _totals(classrooms),
+        },
+    }
+
+
+def rebuild(campus=None):
+    global _version
+    key = campus.id if campus is not None else None
+    with _lock:
+        # Read the stamp first: a write that lands while we build bumps it
+        # again and the next get() rebuilds.
+        stamp = _read_stamp()
+        # Never cache what a lagging replica returns
+        with pinned():
+            payload = build_payload(campus)
+        content = hashlib.sha1(json.dumps(
+            [payload["libraries"], payload["labs"], payload["classrooms"]], separators=(",", ":"),
+        ).encode("utf-8")).digest()
+        snap = _snapshots.get(key)
+        if snap is None or snap.content != content:
+            _version += 1
+            payload["version"] = _version
+            snap = Snapshot(_version, json.dumps(payload, separators=(",", ":")).encode("utf-8"), content)
+            _snapshots[key] = snap
+        snap.stamp = stamp
+        snap.built_at = time.monotonic()
+    return snap
+
+
+def get(campus=None):
+    """The snapshot of one campus, or of every campus when `campus` is None."""
+    # Hot path: a dict read, a clock read and a stat(). A snapshot is only
+    # built here on first use in a process, after any process wrote, or
+    # once it is MAX_AGE old.
+    snap = _snapshots.get(campus.id if campus is not None else None)
+    if snap is None or _read_stamp() != snap.stamp or time.monotonic() - snap.built_at > MAX_AGE:
+        snap = rebuild(campus)
+    return snap
+
+
+def invalidate():
+    # Rebuild after the surrounding transaction commits so the snapshot
+    # never reflects a write that was rolled back. The writer's campus is
+    # rebuilt right away, the others when they are next asked for.
+    campus = campuses.current()
+
+    def apply():
+        _touch_stamp()
+        rebuild(campus)
+    transaction.on_commit(apply)
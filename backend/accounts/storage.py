@@ -0,0 +1,151 @@
+"""
+Content-addressed storage for uploaded fault images.
+
+Uploads are streamed to a temp file in fixed-size chunks while being
+hashed, then moved to MEDIA_ROOT/images/<aa>/<sha256>.<ext>. A file whose
+hash is already stored is dropped and the existing blob is reused.
+The upload is a single POST whose raw body is the image. Thumbnails are
+rendered by the run_jobs worker from a render_thumbnail job, so an upload
+whose thumbnail was not rendered yet still gets one after a restart.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+
+from . import campuses, jobs, resultcache
+from .models import ImageBlob
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_JOB = "render_thumbnail"
+
+# Magic numbers of the image formats we accept
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif"),
+]
+
+
+class UploadError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def _sniff(head):
+    for magic, content_type, ext in _SIGNATURES:
+        if head.startswith(magic):
+            return content_type, ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    return None, None
+
+
+def _media_root():
+    return str(settings.MEDIA_ROOT)
+
+
+def image_path(sha256, ext):
+    return os.path.join(_media_root(), "images", sha256[:2], f"{sha256}.{ext}")
+
+
+def thumbnail_path(sha256):
+    return os.path.join(_media_root(), "thumbs", sha256[:2], f"{sha256}.jpg")
+
+
+def image_url(blob):
+    return f"{settings.MEDIA_URL}images/{blob.sha256[:2]}/{blob.sha256}.{blob.extension}"
+
+
+def thumbnail_url(blob):
+    if not blob.thumbnail_ready:
+        return None
+    return f"{settings.MEDIA_URL}thumbs/{blob.sha256[:2]}/{blob.sha256}.jpg"
+
+
+def store_stream(stream, max_bytes=None):
+    """Stream an image body to disk and return (ImageBlob, created).
+
+    Only one CHUNK_SIZE buffer is held in memory at a time.
+    """
+    max_bytes = max_bytes or settings.FAULT_IMAGE_MAX_BYTES
+    tmp_dir = os.path.join(_media_root(), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    content_type = ext = None
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if content_type is None:
+                    content_type, ext = _sniff(chunk)
+                    if content_type is None:
+                        raise UploadError("Unsupported image format", 415)
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f"Image is larger than {max_bytes} bytes", 413)
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise UploadError("Empty upload", 400)
+
+        sha256 = digest.hexdigest()
+        final_path = image_path(sha256, ext)
+        if os.path.exists(final_path):
+            os.unlink(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    blob, created = ImageBlob.objects.get_or_create(
+        sha256=sha256,
+        defaults={"content_type": content_type, "extension": ext, "size": size},
+    )
+    if not blob.thumbnail_ready:
+        schedule_thumbnail(blob.sha256)
+    return blob, created
+
+
+def schedule_thumbnail(sha256):
+    # The blob row is in the uploading campus's database
+    campus = campuses.current()
+    jobs.enqueue(THUMBNAIL_JOB, {"sha256": sha256, "campus_id": campus.id if campus else None})
+
+
+def render_thumbnail(sha256, campus=None):
+    """Render the thumbnail of a stored image; errors propagate so the job is retried."""
+    try:
+        from PIL import Image
+    except ImportError:
+        print(f"WARNING: Pillow is not installed, skipping thumbnail for {sha256}")
+        return
+    with campuses.activated(campus):
+        blob = ImageBlob.objects.filter(sha256=sha256).first()
+        if blob is None or blob.thumbnail_ready:
+            return
+        target = thumbnail_path(sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with Image.open(image_path(sha256, blob.extension)) as img:
+            img.thumbnail(THUMBNAIL_SIZE)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            tmp_target = f"{target}.tmp"
+            img.save(tmp_target, "JPEG", quality=80, optimize=True)
+        os.replace(tmp_target, target)
+        ImageBlob.objects.filter(sha256=sha256).update(thumbnail_ready=True)
+    if campus is not None:
+        # Every fault list of the campus may show this image
+        resultcache.invalidate_campus("faults", campus.id)
@@ -0,0 +1,252 @@
+"""
+Prefix autocomplete over spaces and fault locations.
+
+Libraries, labs and classrooms are indexed by the words of their name,
+building and room number, and every location a fault has been reported at
+is indexed by its words. The index is a sorted array of (word, entry) kept
+in process memory, one array per campus, next to a sorted array of the
+normalized names. An entry matches when every word of the query is a
+prefix of one of its words. Results come straight off the arrays in order:
+first the names that start with the whole query (a bisect range), then the
+range of the most selective query word, so a lookup costs O(log n) plus
+the `limit` results and never touches the database or sorts matches.
+
+The process that writes a space or reports a fault updates its own index
+directly once the transaction commits, and touches a stamp file in
+RUNTIME_DIR. Other processes notice the new mtime with one stat() per
+query, like the campus snapshot, and then read only the spaces whose
+updated_at moved and the faults newer than the last one they saw. They
+also catch up every CATCH_UP_EVERY for changes made outside the views
+(the admin site, scripts). There is one index per database, since
+campuses with their own database number their rows independently.
+"""
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import ClassroomStatus, FaultReport, LabStatus, LibraryStatus
+
+SPACE_MODELS = {"library": LibraryStatus, "lab": LabStatus, "classroom": ClassroomStatus}
+SPACE_FIELDS = ("id", "campus_id", "name", "building", "room_number", "updated_at")
+# Spaces first, then free-text fault locations
+KIND_RANK = {"library": 0, "lab": 0, "classroom": 0, "location": 1}
+
+# Rows updated this close to the last catch-up are read again, since they
+# may have been committed late
+SETTLE = timedelta(seconds=2)
+CATCH_UP_EVERY = 30
+
+_WORD = re.compile(r"\w+")
+
+
+def words(text):
+    return _WORD.findall((text or "").casefold())
+
+
+def _upper(prefix):
+    # The smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _stamp_path():
+    return os.path.join(str(settings.RUNTIME_DIR), "suggest.stamp")
+
+
+def _read_stamp():
+    try:
+        return os.stat(_stamp_path()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def _touch_stamp():
+    path = _stamp_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a"):
+        pass
+    now = time.time_ns()
+    os.utime(path, ns=(now, now))
+
+
+class SpaceIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # campus id -> sorted [(word, entry key)]
+        self._words = {}
+        # campus id -> sorted [(kind rank, normalized name, entry key)]
+        self._names = {}
+        # entry key -> (result dict, words, normalized name)
+        self._entries = {}
+        self._loaded = False
+        self._stamp = None
+        self._checked_at = 0.0
+        self._synced_at = None
+        self._fault_high_water = 0
+
+    def _put(self, key, result):
+        current = self._entries.get(key)
+        if current is not None and current[0] == result:
+            return
+        self._drop(key)
+        entry_words = frozenset(w for field in ("name", "building", "room_number") for w in words(result.get(field)))
+        name = " ".join(words(result["name"]))
+        self._entries[key] = (result, entry_words, name)
+        campus = result["campus_id"]
+        for word in entry_words:
+            bisect.insort(self._words.setdefault(campus, []), (word, key))
+        bisect.insort(self._names.setdefault(campus, []), (KIND_RANK[result["kind"]], name, key))
+
+    def _drop(self, key):
+        current = self._entries.pop(key, None)
+        if current is None:
+            return
+        result, entry_words, name = current
+        campus = result["campus_id"]
+        for array, item in [(self._words[campus], (word, key)) for word in entry_words] + [
+            (self._names[campus], (KIND_RANK[result["kind"]], name, key))
+        ]:
+            i = bisect.bisect_left(array, item)
+            if i < len(array) and array[i] == item:
+                del array[i]
+
+    def _put_space(self, kind, row):
+        self._put((kind, row["id"]), {
+            "kind": kind,
+            "id": row["id"],
+            "campus_id": row["campus_id"],
+            "name": row["name"],
+            "building": row["building"],
+            "room_number": row.get("room_number", ""),
+        })
+
+    def _put_location(self, campus_id, location):
+        location = (location or "").strip()
+        key = ("location", campus_id or 0, location.casefold())
+        if words(location) and key not in self._entries:
+            self._put(key, {"kind": "location", "campus_id": campus_id, "name": location})
+
+    def _catch_up(self):
+        now = timezone.now()
+        for kind, model in SPACE_MODELS.items():
+            qs = model.all_campuses.all()
+            if self._synced_at is not None:
+                qs = qs.filter(updated_at__gte=self._synced_at - SETTLE)
+            fields = [f for f in SPACE_FIELDS if f != "room_number" or kind != "library"]
+            for row in qs.values(*fields).iterator():
+                self._put_space(kind, row)
+        faults = FaultReport.all_campuses.exclude(location="").filter(id__gt=self._fault_high_water)
+        for fault_id, campus_id, location in faults.order_by("id").values_list("id", "campus_id", "location").iterator():
+            self._put_location(campus_id, location)
+            self._fault_high_water = fault_id
+        self._synced_at = now
+        self._loaded = True
+
+    def _fresh(self):
+        # Hot path: a clock read and a stat()
+        stamp = _read_stamp()
+        if not self._loaded or stamp != self._stamp or time.monotonic() - self._checked_at > CATCH_UP_EVERY:
+            self._catch_up()
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _range(arrays, low, high):
+        # Items between low and high of every array, in order
+        slices = []
+        for array in arrays:
+            start = bisect.bisect_left(array, low)
+            end = bisect.bisect_left(array, high, start)
+            slices.append(array[i] for i in range(start, end))
+        return slices[0] if len(slices) == 1 else heapq.merge(*slices)
+
+    def search(self, query, campus_id=None, limit=10):
+        """Up to `limit` entries whose words start with the words of `query`.
+
+        Entries whose whole name starts with the query come first, spaces
+        before fault locations, then the rest in word order.
+        """
+        query_words = words(query)
+        if not query_words:
+            return []
+        with self._lock:
+            self._fresh()
+            if campus_id is None:
+                names, word_arrays = list(self._names.values()), list(self._words.values())
+            else:
+                names, word_arrays = [self._names.get(campus_id, [])], [self._words.get(campus_id, [])]
+            found = {}
+            phrase = " ".join(query_words)
+            for rank in sorted(set(KIND_RANK.values())):
+                for _, _, key in self._range(names, (rank, phrase), (rank, _upper(phrase))):
+                    found.setdefault(key)
+                    if len(found) == limit:
+                        return [self._entries[key][0] for key in found]
+            # Walk the smallest range among the query words, check the others
+            anchor = min(query_words, key=lambda w: sum(
+                bisect.bisect_left(a, (_upper(w),)) - bisect.bisect_left(a, (w,)) for a in word_arrays
+            ))
+            for _, key in self._range(word_arrays, (anchor,), (_upper(anchor),)):
+                if key in found:
+                    continue
+                entry_words = self._entries[key][1]
+                if all(any(w.startswith(q) for w in entry_words) for q in query_words):
+                    found[key] = None
+                    if len(found) == limit:
+                        break
+            return [self._entries[key][0] for key in found]
+
+    def update_space(self, kind, row):
+        with self._lock:
+            if self._loaded:
+                self._put_space(kind, row)
+
+    def add_location(self, campus_id, location):
+        with self._lock:
+            if self._loaded:
+                self._put_location(campus_id, location)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index():
+    """The index for the database spaces are stored in right now."""
+    alias = router.db_for_write(LabStatus)
+    with _indexes_lock:
+        if alias not in _indexes:
+            _indexes[alias] = SpaceIndex()
+        return _indexes[alias]
+
+
+def _kind_of(space):
+    return next(kind for kind, model in SPACE_MODELS.items() if isinstance(space, model))
+
+
+def space_saved(space):
+    """Index a created or renamed space once the transaction commits."""
+    index = get_index()
+    row = {field: getattr(space, field, "") for field in SPACE_FIELDS}
+
+    def apply():
+        index.update_space(_kind_of(space), row)
+        _touch_stamp()
+    transaction.on_commit(apply)
+
+
+def fault_reported(fault):
+    """Index a new fault's location once the transaction commits."""
+    index = get_index()
+
+    def apply():
+        index.add_location(fault.campus_id, fault.location)
+        _touch_stamp()
+    transaction.on_commit(apply)
@@ -0,0 +1,49 @@
+"""
+Handlers for background jobs. Imported by the run_jobs worker.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage, get_connection
+
+from . import events, idempotency, storage
+from .jobs import enqueue, register
+from .models import Campus
+
+
+@register("notify", batch=True)
+def notify(payloads):
+    # One mail connection for the whole batch
+    users = User.objects.in_bulk([p["user_id"] for p in payloads])
+    messages = [
+        EmailMessage(
+            subject=p["subject"],
+            body=p["message"],
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[users[p["user_id"]].email],
+        )
+        for p in payloads
+        if p["user_id"] in users and users[p["user_id"]].email
+    ]
+    if messages:
+        get_connection().send_messages(messages)
+
+
+@register(idempotency.PURGE_JOB)
+def purge_idempotency_keys(payload):
+    # A bounded batch per run, so the write lock is never held for long
+    if idempotency.purge() == idempotency.PURGE_BATCH:
+        enqueue(idempotency.PURGE_JOB, lane="low")
+
+
+@register(events.PROJECT_JOB)
+def project_events(payload):
+    events.run_projections()
+    # Events still settling on PostgreSQL were left for a later run
+    if events.has_backlog():
+        enqueue(events.PROJECT_JOB, lane="low", delay=events.SETTLE.total_seconds())
+
+
+@register(storage.THUMBNAIL_JOB)
+def render_thumbnail(payload):
+    campus = Campus.objects.filter(id=payload["campus_id"]).first() if payload.get("campus_id") else None
+    storage.render_thumbnail(payload["sha256"], campus)
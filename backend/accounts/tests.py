@@ -1,3 +1,113 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from accounts import ratelimit, recurrence, rollups
+from accounts.models import BookingDaily, ClassroomStatus, DomainEvent, LibraryStatus, Profile, RoomRequest
+from accounts.optimizer import _Room
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        self.runtime_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.runtime_dir.cleanup)
+        self.settings_override = override_settings(
+            RUNTIME_DIR=self.runtime_dir.name,
+            RATE_LIMITS={"test": {"user": "2/min", "endpoint": "5/min"}},
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        # The bucket table is opened once per process
+        ratelimit._table = None
+        self.addCleanup(setattr, ratelimit, "_table", None)
+
+    def call(self, user_id):
+        request = RequestFactory().post("/")
+        request.user_obj = SimpleNamespace(id=user_id)
+        return ratelimit.check("test", request)
+
+    def test_throttled_user_does_not_drain_endpoint_bucket(self):
+        results = [self.call(1) == 0 for _ in range(6)]
+        self.assertEqual(results, [True, True, False, False, False, False])
+        # Only the two allowed calls were charged to the shared bucket
+        self.assertEqual([self.call(2) == 0, self.call(2) == 0, self.call(3) == 0], [True, True, True])
+        self.assertGreater(self.call(4), 0)
+
+
+class RoomClashTests(SimpleTestCase):
+    def test_clash_behind_a_shorter_booking(self):
+        room = _Room("classroom", 1, "A101", 30)
+        room.book([("2026-01-05", 9 * 60, 12 * 60)], 1)
+        room.book([("2026-01-05", 10 * 60, 10 * 60 + 30)], 2)
+        # 11:00-11:30 is inside booking 1 even though booking 2 ends before it
+        self.assertEqual(room.clash([("2026-01-05", 11 * 60, 11 * 60 + 30)]), (1, "2026-01-05"))
+        self.assertIsNone(room.clash([("2026-01-05", 12 * 60, 13 * 60)]))
+
+
+class ApplyRoomAssignmentsTests(TestCase):
+    def test_request_assigned_twice_is_refused(self):
+        manager = User.objects.create_user(username="m@x.com", email="m@x.com", password="x")
+        Profile.objects.update_or_create(user=manager, defaults={"role": "manager"})
+        lecturer = User.objects.create_user(username="l@x.com", email="l@x.com", password="x")
+        c1 = ClassroomStatus.objects.create(name="C1", max_capacity=30)
+        c2 = ClassroomStatus.objects.create(name="C2", max_capacity=30)
+        req = RoomRequest.objects.create(
+            requested_by=lecturer, room_type="classroom", requested_date=date(2026, 9, 7),
+            start_time=time(10, 0), end_time=time(12, 0),
+        )
+        # Discovery puts accounts/ on sys.path, where jwt.py shadows PyJWT
+        with mock.patch("accounts.auth.decode_token", return_value={"sub": manager.id}):
+            response = self.client.post(
+                "/api/room-requests/assignments/apply",
+                json.dumps({"assignments": [
+                    {"request_id": req.id, "room_type": "classroom", "room_id": c1.id},
+                    {"request_id": req.id, "room_type": "classroom", "room_id": c2.id},
+                ]}),
+                content_type="application/json",
+                HTTP_AUTHORIZATION="Bearer token",
+            )
+        self.assertEqual(response.status_code, 400)
+        req.refresh_from_db()
+        self.assertEqual(req.status, "pending")
+        self.assertFalse(BookingDaily.objects.exists())
+        self.assertFalse(DomainEvent.objects.filter(event_type="approved").exists())
+
+
+class RecurrenceRuleTests(SimpleTestCase):
+    def test_rule_must_be_an_object(self):
+        for rule in ("weekly", ["weekly"], 7):
+            with self.assertRaises(recurrence.RecurrenceError):
+                recurrence.parse_rule(rule, date(2026, 9, 7))
+
+
+class SpaceCountTests(TestCase):
+    def setUp(self):
+        self.manager = User.objects.create_user(username="m@x.com", email="m@x.com", password="x")
+        Profile.objects.update_or_create(user=self.manager, defaults={"role": "manager"})
+
+    def post(self, url, data):
+        # Discovery puts accounts/ on sys.path, where jwt.py shadows PyJWT
+        with mock.patch("accounts.auth.decode_token", return_value={"sub": self.manager.id}):
+            return self.client.post(url, json.dumps(data), content_type="application/json", HTTP_AUTHORIZATION="Bearer token")
+
+    def test_numeric_strings_are_stored_as_ints(self):
+        response = self.post("/api/classrooms/create", {"name": "C1", "building": "North", "max_capacity": "40"})
+        self.assertEqual(response.status_code, 200, response.content)
+        classroom = response.json()["classroom"]
+        self.assertEqual(classroom["max_capacity"], 40)
+        response = self.post(f"/api/classrooms/{classroom['id']}/update", {"current_occupancy": "5"})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["classroom"]["current_occupancy"], 5)
+        campus = rollups.default_campus()
+        self.assertEqual((campus.max_capacity, campus.current_occupancy), (40, 5))
+
+    def test_bad_counts_are_refused(self):
+        self.assertEqual(self.post("/api/labs/create", {"name": "L1", "max_capacity": "lots"}).status_code, 400)
+        library = LibraryStatus.objects.create(name="Main", max_capacity=100)
+        response = self.post("/api/library/update", {"library_id": library.id, "current_occupancy": -3})
+        self.assertEqual(response.status_code, 400)
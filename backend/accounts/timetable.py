@@ -0,0 +1,139 @@
+"""
+Rooms x 15-minute-slot grid of approved bookings for one building.
+
+Each room's occupancy over the whole window is a single Python int used as
+a bitmap (bit n = slot n, counted from `start` 00:00), so marking a booking
+is one shift-and-or no matter how long it is. The grid is returned either
+as one hex bitmap per room or as run-length [slot, length, request_id]
+triples.
+"""
+import json
+from collections import namedtuple
+from datetime import date, time, timedelta
+
+from django.db.models import CharField, Q
+from django.db.models.functions import Cast
+
+from .models import ClassroomStatus, LabStatus, RoomRequest
+from .recurrence import occurrences
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+MAX_DAYS = 31
+
+_BOOKING_FIELDS = (
+    "id", "room_type", "classroom_id", "lab_id", "requested_date", "start_time", "end_time",
+    "recurrence", "recurrence_until", "recurrence_exceptions",
+)
+# Plain tuples instead of model instances; recurrence.occurrences() only
+# needs the attributes.
+_Booking = namedtuple("_Booking", _BOOKING_FIELDS)
+
+
+def _slot(t, ceil=False):
+    if isinstance(t, str):
+        minutes = int(t[0:2]) * 60 + int(t[3:5])
+        partial = t[6:8] not in ("", "00") or "." in t
+    else:
+        minutes = t.hour * 60 + t.minute
+        partial = bool(t.second or t.microsecond)
+    if ceil:
+        return -(-(minutes + partial) // SLOT_MINUTES)
+    return minutes // SLOT_MINUTES
+
+
+def build(building, start, end):
+    days = (end - start).days + 1
+    rooms = [
+        ("classroom", r["id"], r["name"], r["room_number"])
+        for r in ClassroomStatus.objects.filter(building=building).order_by("name").values("id", "name", "room_number")
+    ] + [
+        ("lab", r["id"], r["name"], r["room_number"])
+        for r in LabStatus.objects.filter(building=building).order_by("name").values("id", "name", "room_number")
+    ]
+    masks = {(room_type, room_id): 0 for room_type, room_id, _, _ in rooms}
+    runs = {key: [] for key in masks}
+
+    # One range query for every approved booking in the building and window
+    bookings = (
+        RoomRequest.objects.filter(status="approved", requested_date__lte=end)
+        .filter(Q(recurrence="", requested_date__gte=start) | Q(recurrence_until__gte=start))
+        .filter(
+            Q(room_type="classroom", classroom__building=building)
+            | Q(room_type="lab", lab__building=building)
+        )
+        # Dates and times come back as ISO text: parsing a few characters
+        # is much cheaper than the backend's per-value converters.
+        .annotate(
+            day_text=Cast("requested_date", CharField()),
+            start_text=Cast("start_time", CharField()),
+            end_text=Cast("end_time", CharField()),
+            until_text=Cast("recurrence_until", CharField()),
+            exceptions_text=Cast("recurrence_exceptions", CharField()),
+        )
+        .values_list(
+            "id", "room_type", "classroom_id", "lab_id", "day_text", "start_text", "end_text",
+            "recurrence", "until_text", "exceptions_text",
+        )
+    )
+    for row in bookings:
+        req = _Booking._make(row)
+        key = (req.room_type, req.classroom_id if req.room_type == "classroom" else req.lab_id)
+        if key not in masks:
+            continue
+        if req.recurrence:
+            req = req._replace(
+                requested_date=date.fromisoformat(req.requested_date),
+                start_time=time.fromisoformat(req.start_time),
+                end_time=time.fromisoformat(req.end_time),
+                recurrence_until=date.fromisoformat(req.recurrence_until),
+                recurrence_exceptions=json.loads(req.recurrence_exceptions),
+            )
+            found = occurrences(req, start, end)
+        else:
+            found = [(date.fromisoformat(req.requested_date), req.start_time, req.end_time)]
+        for day, start_time, end_time in found:
+            base = (day - start).days * SLOTS_PER_DAY
+            first = base + _slot(start_time)
+            last = base + min(_slot(end_time, ceil=True), SLOTS_PER_DAY)
+            if last <= first:
+                continue
+            masks[key] |= ((1 << (last - first)) - 1) << first
+            runs[key].append([first, last - first, req.id])
+
+    return {
+        "building": building,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "days": [(start + timedelta(days=i)).isoformat() for i in range(days)],
+        "slot_minutes": SLOT_MINUTES,
+        "slots_per_day": SLOTS_PER_DAY,
+        "rooms": rooms,
+        "masks": masks,
+        "runs": runs,
+        "total_slots": days * SLOTS_PER_DAY,
+    }
+
+
+def encode(grid, encoding="rle"):
+    hex_width = grid["total_slots"] // 4
+    rooms = []
+    for room_type, room_id, name, room_number in grid["rooms"]:
+        key = (room_type, room_id)
+        room = {"type": room_type, "id": room_id, "name": name, "room_number": room_number}
+        if encoding == "bitmap":
+            # Little-endian bit order: slot 0 is the lowest bit of the last hex digit
+            room["bitmap"] = format(grid["masks"][key], f"0{hex_width}x")
+        else:
+            room["runs"] = sorted(grid["runs"][key])
+        rooms.append(room)
+    return {
+        "building": grid["building"],
+        "from": grid["from"],
+        "to": grid["to"],
+        "days": grid["days"],
+        "slot_minutes": grid["slot_minutes"],
+        "slots_per_day": grid["slots_per_day"],
+        "encoding": encoding,
+        "rooms": rooms,
+    }
@@ -0,0 +1,57 @@
+"""
+Aging-weighted triage queue for open fault reports.
+
+A fault's triage score is its age in hours plus a head start for its
+severity and category (FAULT_TRIAGE_WEIGHTS), so an old medium fault
+eventually outranks a new high one instead of starving behind it.
+
+Every fault ages at the same rate, so the order never changes between
+writes: ranking by score is ranking by created_at minus the head start.
+That instant is stored as FaultReport.triage_at when a fault is reported
+or its severity, category or status changes, and cleared once it is no
+longer open. The partial index on (campus, triage_at) holds just the open
+faults in queue order, so next_faults() reads the top N off the index instead of
+scoring and sorting every open fault per request.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FaultReport
+
+QUEUE_STATUS = "open"
+
+DEFAULT_WEIGHTS = {
+    "severity": {"critical": 72, "high": 24, "medium": 8, "low": 0},
+    "category": {"electrical": 6, "plumbing": 6, "hvac": 4, "equipment": 2, "furniture": 0, "other": 0},
+}
+
+
+def head_start(fault):
+    """Hours of age the fault's severity and category are worth."""
+    weights = getattr(settings, "FAULT_TRIAGE_WEIGHTS", DEFAULT_WEIGHTS)
+    return weights["severity"].get(fault.severity, 0) + weights["category"].get(fault.category, 0)
+
+
+def triage_at(fault):
+    """What FaultReport.triage_at should hold for the fault as it is now.
+
+    Duplicates stay out of the queue; their canonical fault is in it.
+    """
+    if fault.status != QUEUE_STATUS or fault.duplicate_of_id:
+        return None
+    return fault.created_at - timedelta(hours=head_start(fault))
+
+
+def score(fault, now=None):
+    """Age in hours plus head start; higher is more urgent."""
+    return round(((now or timezone.now()) - fault.triage_at).total_seconds() / 3600, 2)
+
+
+def next_faults(campus, limit):
+    """The `limit` most urgent open faults."""
+    qs = FaultReport.objects.filter(triage_at__isnull=False)
+    if campus is not None:
+        qs = qs.filter(campus=campus)
+    return qs.select_related("reported_by", "image_blob").order_by("triage_at", "id")[:limit]
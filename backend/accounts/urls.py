@@ -14,6 +14,9 @@ urlpatterns = [
     path("library/create", views.create_library, name="create_library"),
     path("library/update", views.library_update, name="library_update"),
     
+    # Snapshot of all spaces
+    path("snapshot", views.campus_snapshot, name="campus_snapshot"),
+    
     # Lab endpoints
     path("labs/list", views.list_labs, name="list_labs"),
     path("labs/create", views.create_lab, name="create_lab"),
@@ -34,17 +37,50 @@ urlpatterns = [
     # Room request endpoints
     path("room-requests/create", views.create_room_request, name="create_room_request"),
     path("room-requests/list", views.list_room_requests, name="list_room_requests"),
+    path("room-requests/occurrences", views.room_request_occurrences, name="room_request_occurrences"),
+    path("room-requests/assignments", views.propose_room_assignments, name="propose_room_assignments"),
+    path("room-requests/assignments/apply", views.apply_room_assignments, name="apply_room_assignments"),
     path("room-requests/<int:request_id>/approve", views.approve_room_request, name="approve_room_request"),
     path("room-requests/<int:request_id>/reject", views.reject_room_request, name="reject_room_request"),
     
+    # Occupancy rollups
+    path("occupancy", views.occupancy, name="occupancy"),
+    
+    # Building timetable
+    path("schedule", views.building_schedule, name="building_schedule"),
+    
+    # Space autocomplete
+    path("spaces/suggest", views.suggest_spaces, name="suggest_spaces"),
+    
     # Fault report endpoints
     path("faults/create", views.create_fault, name="create_fault"),
     path("faults/list", views.list_faults, name="list_faults"),
+    path("faults/search", views.search_faults, name="search_faults"),
+    path("faults/sla", views.fault_sla_breaches, name="fault_sla_breaches"),
+    path("faults/next", views.next_faults, name="next_faults"),
     path("faults/<int:fault_id>/update", views.update_fault, name="update_fault"),
+    path("faults/<int:fault_id>/image", views.upload_fault_image, name="upload_fault_image"),
+    path("faults/<int:fault_id>/history", views.fault_history, name="fault_history"),
+    
+    # Technician endpoints
+    path("technicians/list", views.list_technicians, name="list_technicians"),
+    path("technicians/create", views.create_technician, name="create_technician"),
+    path("technicians/<int:technician_id>/update", views.update_technician, name="update_technician"),
+    
+    # Export endpoints
+    path("export/faults", views.export_faults, name="export_faults"),
+    path("export/room-requests", views.export_room_requests, name="export_room_requests"),
+    
+    # Report endpoints
+    path("reports/faults", views.report_faults, name="report_faults"),
+    path("reports/faults/resolution", views.report_fault_resolution, name="report_fault_resolution"),
+    path("reports/faults/time-in-state", views.report_fault_time_in_state, name="report_fault_time_in_state"),
+    path("reports/rooms", views.report_room_utilization, name="report_room_utilization"),
     
     # Admin endpoints
     path("admin/users", views.admin_users, name="admin_users"),
     path("admin/stats", views.admin_stats, name="admin_stats"),
+    path("admin/activity", views.admin_activity, name="admin_activity"),
     path("admin/role-requests", views.admin_role_requests, name="admin_role_requests"),
     path("admin/role-requests/<int:request_id>/approve", views.admin_approve_role, name="admin_approve_role"),
     path("admin/role-requests/<int:request_id>/reject", views.admin_reject_role, name="admin_reject_role"),
@@ -1,16 +1,24 @@
 import json
-from datetime import datetime, date, time
-from django.http import JsonResponse
+from datetime import datetime, date, time, timedelta
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
+from django.db.models import F, Q
+from django.conf import settings
+from django.utils import timezone
 from .models import (
     Profile, RoleRequest, LibraryStatus, LabStatus, ClassroomStatus,
-    LibraryUpdateRequest, LabUpdateRequest, RoomRequest, FaultReport
+    LibraryUpdateRequest, LabUpdateRequest, RoomRequest, FaultReport,
+    BuildingActivity, UserActivity, Campus, Building, ArchivedRecord, Technician
 )
 from .jwt import encode_token, decode_token
 from .auth import get_user_from_request, require_auth
+from . import snapshot, search, dedup, storage, jobs, events, recurrence, timetable, availability, optimizer, rollups, resultcache, archive, export, reports, sla, triage, assignment, suggest, approvals
+from .events import transactional
+from .ratelimit import rate_limit
+from .idempotency import idempotent
 
 def _user_to_dict(user):
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -23,8 +31,103 @@ def _user_to_dict(user):
         "role": role,
         "department": prof.department if prof.department is not None else "",
         "manager_type": prof.manager_type,
+        "campus": prof.campus.name if prof.campus_id else None,
     }
 
+def _fault_to_dict(fault):
+    return {
+        "id": fault.id,
+        "title": fault.title,
+        "description": fault.description,
+        "location": fault.location,
+        "severity": fault.severity,
+        "category": fault.category,
+        "status": fault.status,
+        "assigned_to": fault.assigned_to,
+        "reported_by": fault.reported_by.email,
+        "duplicate_of": fault.duplicate_of_id,
+        "image": fault.image,
+        "thumbnail_url": storage.thumbnail_url(fault.image_blob) if fault.image_blob_id else None,
+        "sla_due_at": fault.sla_due_at.isoformat() if fault.sla_due_at else None,
+        "created_at": fault.created_at.isoformat(),
+    }
+
+def _technician_to_dict(tech):
+    return {
+        "id": tech.id,
+        "name": tech.name,
+        "email": tech.email,
+        "skills": tech.skills,
+        "on_shift": tech.on_shift,
+        "open_faults": tech.open_faults,
+    }
+
+def _room_request_to_dict(req):
+    return {
+        "id": req.id,
+        "requested_by": req.requested_by.email,
+        "room_type": req.room_type,
+        "classroom_id": req.classroom.id if req.classroom else None,
+        "classroom_name": req.classroom.name if req.classroom else None,
+        "lab_id": req.lab.id if req.lab else None,
+        "lab_name": req.lab.name if req.lab else None,
+        "purpose": req.purpose,
+        "expected_attendees": req.expected_attendees,
+        "requested_date": req.requested_date.isoformat(),
+        "start_time": req.start_time.isoformat(),
+        "end_time": req.end_time.isoformat(),
+        "recurrence": {
+            "frequency": req.recurrence,
+            "until": req.recurrence_until.isoformat(),
+            "exceptions": req.recurrence_exceptions,
+        } if req.recurrence else None,
+        "status": req.status,
+        "version": req.version,
+        "approved_by": req.approved_by.email if req.approved_by else None,
+        "created_at": req.created_at.isoformat(),
+    }
+
+def _changes(data, fields):
+    # The subset of a request body that a view actually applied
+    return {field: data[field] for field in fields if field in data}
+
+def _space_counts(data):
+    """max_capacity and current_occupancy from a request body, as ints.
+
+    Raises ValueError if either is not a non-negative whole number.
+    """
+    counts = {}
+    for field in ("max_capacity", "current_occupancy"):
+        if field in data:
+            value = data[field]
+            if isinstance(value, bool) or not str(value).strip().isdigit():
+                raise ValueError(f"{field} must be a non-negative integer")
+            counts[field] = int(value)
+    return counts
+
+def _room_building(room_req):
+    room = room_req.classroom if room_req.room_type == "classroom" else room_req.lab
+    return room.building if room else ""
+
+def _conflicts_response(conflicts):
+    return JsonResponse({
+        "message": "The room is already booked at that time",
+        "conflicts": [{
+            "request_id": other.id,
+            "date": day.isoformat(),
+            "start_time": other.start_time.isoformat(),
+            "end_time": other.end_time.isoformat(),
+        } for other, day in conflicts],
+    }, status=409)
+
+def _notify(user, subject, message):
+    # Mail is sent by the job worker, not while the request waits
+    jobs.enqueue("notify", {"user_id": user.id, "subject": subject, "message": message})
+
+def _spaces_changed():
+    # Called by every view that creates or modifies a library, lab or classroom
+    snapshot.invalidate()
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def test_endpoint(request):
@@ -74,7 +177,11 @@ def register(request):
         # to be accessible for students who want to request lecturer/manager roles
         if not profile.role:
             profile.role = 'student'  # Default to student, but they can still access role selection
-            profile.save()
+        campus_name = data.get("campus", "").strip()
+        profile.campus = Campus.objects.filter(name=campus_name).first() if campus_name else None
+        if profile.campus is None:
+            profile.campus = rollups.default_campus()
+        profile.save()
         
         # CRITICAL: Verify user exists in database before generating token
         user_check = User.objects.filter(id=user.id).first()
@@ -137,8 +244,15 @@ def register(request):
         print(traceback.format_exc())
         return JsonResponse({"message": f"Server error: {str(e)}"}, status=500)
 
+def _login_email(request):
+    try:
+        return str(json.loads(request.body).get("email", "")).strip().lower()
+    except (ValueError, AttributeError):
+        return ""
+
 @csrf_exempt
 @require_http_methods(["POST"])
+@rate_limit("login", user_key=_login_email)
 def login(request):
     try:
         data = json.loads(request.body)
@@ -180,6 +294,7 @@ def me(request):
 @csrf_exempt
 @require_http_methods(["POST", "OPTIONS"])
 @require_auth
+@transactional
 def set_role(request):
     # Handle OPTIONS preflight request
     if request.method == "OPTIONS":
@@ -253,12 +368,13 @@ def set_role(request):
         # Handle role assignment
         if role in ["lecturer", "manager"]:
             # Create role request but keep user as student until approved
-            RoleRequest.objects.create(
+            role_req = RoleRequest.objects.create(
                 user=user,
                 requested_role=role,
                 reason=reason,
                 status="pending"
             )
+            events.record("role_request", role_req.id, "created", actor=user, requested_role=role)
             # Keep role as student, but return user with pending request info
             return JsonResponse({
                 "user": _user_to_dict(user),
@@ -278,12 +394,13 @@ def set_role(request):
                 })
             else:
                 # Regular users cannot set admin role directly - create request
-                RoleRequest.objects.create(
+                role_req = RoleRequest.objects.create(
                     user=user,
                     requested_role=role,
                     reason=reason or "Admin role request",
                     status="pending"
                 )
+                events.record("role_request", role_req.id, "created", actor=user, requested_role=role)
                 return JsonResponse({
                     "user": _user_to_dict(user),
                     "message": "Admin role request submitted for approval. You can use the system as a student for now.",
@@ -317,6 +434,7 @@ def list_libraries(request):
         "libraries": [{
             "id": lib.id,
             "name": lib.name,
+            "building": lib.building,
             "max_capacity": lib.max_capacity,
             "current_occupancy": lib.current_occupancy,
             "is_open": lib.is_open,
@@ -333,6 +451,7 @@ def library_status(request):
     return JsonResponse({
         "id": lib.id,
         "name": lib.name,
+        "building": lib.building,
         "max_capacity": lib.max_capacity,
         "current_occupancy": lib.current_occupancy,
         "is_open": lib.is_open,
@@ -341,6 +460,7 @@ def library_status(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def create_library(request):
     user = request.user_obj
     if not user:
@@ -361,18 +481,28 @@ def create_library(request):
         name = data.get("name", "").strip()
         if not name:
             return JsonResponse({"message": "Library name is required"}, status=400)
+        try:
+            counts = _space_counts(data)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
         
-        lib = LibraryStatus.objects.create(
+        lib = LibraryStatus(
             name=name,
-            max_capacity=data.get("max_capacity", 100),
-            current_occupancy=data.get("current_occupancy", 0),
+            building=data.get("building", ""),
+            max_capacity=counts.get("max_capacity", 100),
+            current_occupancy=counts.get("current_occupancy", 0),
             is_open=data.get("is_open", True),
         )
+        rollups.save(lib)
+        suggest.space_saved(lib)
+        _spaces_changed()
+        events.record("library", lib.id, "created", actor=user, name=lib.name)
         print(f"DEBUG: Library created successfully: {lib.name}")
         return JsonResponse({
             "library": {
                 "id": lib.id,
                 "name": lib.name,
+                "building": lib.building,
                 "max_capacity": lib.max_capacity,
                 "current_occupancy": lib.current_occupancy,
                 "is_open": lib.is_open,
@@ -388,6 +518,9 @@ def create_library(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@idempotent("library_update")
+@rate_limit("library_update")
+@transactional
 def library_update(request):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -398,27 +531,39 @@ def library_update(request):
         
         if not library_id:
             return JsonResponse({"message": "library_id is required"}, status=400)
+        try:
+            counts = _space_counts(data)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
         
         try:
-            lib = LibraryStatus.objects.get(id=library_id)
+            lib = LibraryStatus.objects.select_for_update().get(id=library_id)
         except LibraryStatus.DoesNotExist:
             return JsonResponse({"message": "Library not found"}, status=404)
         
         # Managers and admins can update directly
         if prof.role in ["manager", "admin"]:
+            before = rollups.contribution(lib)
             if "name" in data:
                 lib.name = data["name"]
-            if "max_capacity" in data:
-                lib.max_capacity = data["max_capacity"]
-            if "current_occupancy" in data:
-                lib.current_occupancy = data["current_occupancy"]
+            if "building" in data:
+                lib.building = data["building"]
+            if "max_capacity" in counts:
+                lib.max_capacity = counts["max_capacity"]
+            if "current_occupancy" in counts:
+                lib.current_occupancy = counts["current_occupancy"]
             if "is_open" in data:
                 lib.is_open = data["is_open"]
-            lib.save()
+            rollups.save(lib, before)
+            if "name" in data or "building" in data:
+                suggest.space_saved(lib)
+            _spaces_changed()
+            events.record("library", lib.id, "updated", actor=user, changes=_changes({**data, **counts}, ["name", "building", "max_capacity", "current_occupancy", "is_open"]))
             return JsonResponse({
                 "library": {
                     "id": lib.id,
                     "name": lib.name,
+                    "building": lib.building,
                     "max_capacity": lib.max_capacity,
                     "current_occupancy": lib.current_occupancy,
                     "is_open": lib.is_open,
@@ -428,14 +573,15 @@ def library_update(request):
             })
         else:
             # Students/lecturers create update requests
-            LibraryUpdateRequest.objects.create(
+            update_req = LibraryUpdateRequest.objects.create(
                 library=lib,
                 requested_by=user,
-                requested_current_occupancy=data.get("current_occupancy", lib.current_occupancy),
+                requested_current_occupancy=counts.get("current_occupancy", lib.current_occupancy),
                 requested_is_open=data.get("is_open", lib.is_open),
                 requested_name=data.get("name", lib.name),
-                requested_max_capacity=data.get("max_capacity", lib.max_capacity),
+                requested_max_capacity=counts.get("max_capacity", lib.max_capacity),
             )
+            events.record("library_update_request", update_req.id, "created", actor=user, library_id=lib.id)
             return JsonResponse({
                 "status": "pending",
                 "message": "Update request submitted. Waiting for manager approval."
@@ -443,6 +589,49 @@ def library_update(request):
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+# Snapshot endpoint
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+@require_auth
+def campus_snapshot(request):
+    """The libraries, labs and classrooms of the user's campus with occupancy, served from memory."""
+    if request.method == "OPTIONS":
+        return JsonResponse({"message": "OK"})
+    snap = snapshot.get(request.campus)
+    if request.META.get("HTTP_IF_NONE_MATCH") == snap.etag:
+        response = HttpResponse(status=304)
+    elif "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+        response = HttpResponse(snap.gzip_body, content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(snap.body, content_type="application/json")
+    response["ETag"] = snap.etag
+    response["Vary"] = "Accept-Encoding"
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def occupancy(request):
+    """Campus or building occupancy totals, with ?drill=1 for the level below."""
+    drill_down = request.GET.get("drill") in ("1", "true")
+    campus_name = request.GET.get("campus", "").strip()
+    if campus_name:
+        campus = Campus.objects.filter(name=campus_name).first()
+        if campus is None:
+            return JsonResponse({"message": "Campus not found"}, status=404)
+    else:
+        campus = request.campus or rollups.default_campus()
+    
+    building_name = request.GET.get("building", "").strip()
+    if not building_name:
+        return JsonResponse({"campus": rollups.campus_totals(campus, drill_down)})
+    building = Building.objects.filter(campus=campus, name=building_name).select_related("campus").first()
+    if building is None:
+        return JsonResponse({"message": "Building not found"}, status=404)
+    return JsonResponse({"building": rollups.building_totals(building, drill_down)})
+
 # Lab endpoints
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -465,6 +654,7 @@ def list_labs(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def create_lab(request):
     user = request.user_obj
     if not user:
@@ -485,16 +675,24 @@ def create_lab(request):
         name = data.get("name", "").strip()
         if not name:
             return JsonResponse({"message": "Lab name is required"}, status=400)
+        try:
+            counts = _space_counts(data)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
         
-        lab = LabStatus.objects.create(
+        lab = LabStatus(
             name=name,
             building=data.get("building", ""),
             room_number=data.get("room_number", ""),
-            max_capacity=data.get("max_capacity", 30),
-            current_occupancy=data.get("current_occupancy", 0),
+            max_capacity=counts.get("max_capacity", 30),
+            current_occupancy=counts.get("current_occupancy", 0),
             is_available=data.get("is_available", True),
             equipment_status=data.get("equipment_status", ""),
         )
+        rollups.save(lab)
+        suggest.space_saved(lab)
+        _spaces_changed()
+        events.record("lab", lab.id, "created", actor=user, name=lab.name, building=lab.building)
         print(f"DEBUG: Lab created successfully: {lab.name}")
         return JsonResponse({
             "lab": {
@@ -518,35 +716,48 @@ def create_lab(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def update_lab(request, lab_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
     
     try:
         try:
-            lab = LabStatus.objects.get(id=lab_id)
+            lab = LabStatus.objects.select_for_update().get(id=lab_id)
         except LabStatus.DoesNotExist:
             return JsonResponse({"message": "Lab not found"}, status=404)
         
         data = json.loads(request.body)
+        try:
+            counts = _space_counts(data)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
         
         # Managers and admins can update directly
         if prof.role in ["manager", "admin"]:
+            before = rollups.contribution(lab)
             if "name" in data:
                 lab.name = data["name"]
             if "building" in data:
                 lab.building = data["building"]
             if "room_number" in data:
                 lab.room_number = data["room_number"]
-            if "max_capacity" in data:
-                lab.max_capacity = data["max_capacity"]
-            if "current_occupancy" in data:
-                lab.current_occupancy = data["current_occupancy"]
+            if "max_capacity" in counts:
+                lab.max_capacity = counts["max_capacity"]
+            if "current_occupancy" in counts:
+                lab.current_occupancy = counts["current_occupancy"]
             if "is_available" in data:
                 lab.is_available = data["is_available"]
             if "equipment_status" in data:
                 lab.equipment_status = data["equipment_status"]
-            lab.save()
+            rollups.save(lab, before)
+            if "name" in data:
+                # Room names show up in every room request list of the campus
+                resultcache.invalidate_campus("room_requests", lab.campus_id)
+            if "name" in data or "building" in data or "room_number" in data:
+                suggest.space_saved(lab)
+            _spaces_changed()
+            events.record("lab", lab.id, "updated", actor=user, building=lab.building, changes=_changes({**data, **counts}, ["name", "building", "room_number", "max_capacity", "current_occupancy", "is_available", "equipment_status"]))
             return JsonResponse({
                 "lab": {
                     "id": lab.id,
@@ -563,12 +774,13 @@ def update_lab(request, lab_id):
             })
         else:
             # Students/lecturers create update requests
-            LabUpdateRequest.objects.create(
+            update_req = LabUpdateRequest.objects.create(
                 lab=lab,
                 requested_by=user,
-                requested_current_occupancy=data.get("current_occupancy", lab.current_occupancy),
+                requested_current_occupancy=counts.get("current_occupancy", lab.current_occupancy),
                 requested_is_available=data.get("is_available", lab.is_available),
             )
+            events.record("lab_update_request", update_req.id, "created", actor=user, lab_id=lab.id, building=lab.building)
             return JsonResponse({
                 "status": "pending",
                 "message": "Update request submitted. Waiting for manager approval."
@@ -597,6 +809,7 @@ def list_classrooms(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def create_classroom(request):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -605,14 +818,22 @@ def create_classroom(request):
     
     try:
         data = json.loads(request.body)
-        cls = ClassroomStatus.objects.create(
+        try:
+            counts = _space_counts(data)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
+        cls = ClassroomStatus(
             name=data.get("name"),
             building=data.get("building", ""),
             room_number=data.get("room_number", ""),
-            max_capacity=data.get("max_capacity", 50),
-            current_occupancy=data.get("current_occupancy", 0),
+            max_capacity=counts.get("max_capacity", 50),
+            current_occupancy=counts.get("current_occupancy", 0),
             is_available=data.get("is_available", True),
         )
+        rollups.save(cls)
+        suggest.space_saved(cls)
+        _spaces_changed()
+        events.record("classroom", cls.id, "created", actor=user, name=cls.name, building=cls.building)
         return JsonResponse({
             "classroom": {
                 "id": cls.id,
@@ -631,6 +852,7 @@ def create_classroom(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def update_classroom(request, classroom_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -639,24 +861,36 @@ def update_classroom(request, classroom_id):
     
     try:
         try:
-            cls = ClassroomStatus.objects.get(id=classroom_id)
+            cls = ClassroomStatus.objects.select_for_update().get(id=classroom_id)
         except ClassroomStatus.DoesNotExist:
             return JsonResponse({"message": "Classroom not found"}, status=404)
         
         data = json.loads(request.body)
+        try:
+            counts = _space_counts(data)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
+        before = rollups.contribution(cls)
         if "name" in data:
             cls.name = data["name"]
         if "building" in data:
             cls.building = data["building"]
         if "room_number" in data:
             cls.room_number = data["room_number"]
-        if "max_capacity" in data:
-            cls.max_capacity = data["max_capacity"]
-        if "current_occupancy" in data:
-            cls.current_occupancy = data["current_occupancy"]
+        if "max_capacity" in counts:
+            cls.max_capacity = counts["max_capacity"]
+        if "current_occupancy" in counts:
+            cls.current_occupancy = counts["current_occupancy"]
         if "is_available" in data:
             cls.is_available = data["is_available"]
-        cls.save()
+        rollups.save(cls, before)
+        if "name" in data:
+            # Room names show up in every room request list of the campus
+            resultcache.invalidate_campus("room_requests", cls.campus_id)
+        if "name" in data or "building" in data or "room_number" in data:
+            suggest.space_saved(cls)
+        _spaces_changed()
+        events.record("classroom", cls.id, "updated", actor=user, building=cls.building, changes=_changes({**data, **counts}, ["name", "building", "room_number", "max_capacity", "current_occupancy", "is_available"]))
         
         return JsonResponse({
             "classroom": {
@@ -685,6 +919,9 @@ def list_pending_updates(request):
     
     library_requests = LibraryUpdateRequest.objects.filter(status="pending").order_by("-created_at")
     lab_requests = LabUpdateRequest.objects.filter(status="pending").order_by("-created_at")
+    if request.campus is not None:
+        library_requests = library_requests.filter(Q(library__campus=request.campus) | Q(library__isnull=True))
+        lab_requests = lab_requests.filter(lab__campus=request.campus)
     
     return JsonResponse({
         "library_requests": [{
@@ -696,6 +933,7 @@ def list_pending_updates(request):
             "requested_is_open": req.requested_is_open,
             "requested_name": req.requested_name,
             "requested_max_capacity": req.requested_max_capacity,
+            "version": req.version,
             "created_at": req.created_at.isoformat(),
         } for req in library_requests],
         "lab_requests": [{
@@ -705,6 +943,7 @@ def list_pending_updates(request):
             "requested_by": req.requested_by.email,
             "requested_current_occupancy": req.requested_current_occupancy,
             "requested_is_available": req.requested_is_available,
+            "version": req.version,
             "created_at": req.created_at.isoformat(),
         } for req in lab_requests],
     })
@@ -712,6 +951,7 @@ def list_pending_updates(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def approve_library_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -719,28 +959,39 @@ def approve_library_update(request, request_id):
         return JsonResponse({"message": "Only managers and admins can approve updates"}, status=403)
     
     try:
-        req = LibraryUpdateRequest.objects.get(id=request_id, status="pending")
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = LibraryUpdateRequest.objects.get(id=request_id)
+        # Claim the request before touching the library
+        if not approvals.transition(req, "approved", version, approved_by=user):
+            return approvals.conflict(req)
         if req.library:
-            lib = req.library
+            lib = LibraryStatus.objects.select_for_update().get(pk=req.library_id)
+            before = rollups.contribution(lib)
             lib.current_occupancy = req.requested_current_occupancy
             lib.is_open = req.requested_is_open
             if req.requested_name:
                 lib.name = req.requested_name
             if req.requested_max_capacity:
                 lib.max_capacity = req.requested_max_capacity
-            lib.save()
+            rollups.save(lib, before)
         else:
             # Create new library
-            lib = LibraryStatus.objects.create(
+            lib = LibraryStatus(
                 name=req.requested_name or "New Library",
                 max_capacity=req.requested_max_capacity or 100,
                 current_occupancy=req.requested_current_occupancy,
                 is_open=req.requested_is_open,
             )
+            rollups.save(lib)
+        suggest.space_saved(lib)
+        _spaces_changed()
         
-        req.status = "approved"
-        req.approved_by = user
-        req.save()
+        events.record("library_update_request", req.id, "approved", actor=user, library_id=lib.id)
+        _notify(req.requested_by, "Library update approved", f"Your update request for {lib.name} was approved.")
         
         return JsonResponse({"message": "Library update approved"})
     except LibraryUpdateRequest.DoesNotExist:
@@ -751,6 +1002,7 @@ def approve_library_update(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def reject_library_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -759,11 +1011,16 @@ def reject_library_update(request, request_id):
     
     try:
         data = json.loads(request.body)
-        req = LibraryUpdateRequest.objects.get(id=request_id, status="pending")
-        req.status = "rejected"
-        req.approved_by = user
-        req.rejection_reason = data.get("rejection_reason", "")
-        req.save()
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = LibraryUpdateRequest.objects.get(id=request_id)
+        if not approvals.transition(req, "rejected", version, approved_by=user, rejection_reason=data.get("rejection_reason", "")):
+            return approvals.conflict(req)
+        events.record("library_update_request", req.id, "rejected", actor=user, reason=req.rejection_reason)
+        _notify(req.requested_by, "Library update rejected", f"Your library update request was rejected. {req.rejection_reason}".strip())
         return JsonResponse({"message": "Library update rejected"})
     except LibraryUpdateRequest.DoesNotExist:
         return JsonResponse({"message": "Update request not found"}, status=404)
@@ -773,6 +1030,7 @@ def reject_library_update(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def approve_lab_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -780,15 +1038,24 @@ def approve_lab_update(request, request_id):
         return JsonResponse({"message": "Only managers and admins can approve updates"}, status=403)
     
     try:
-        req = LabUpdateRequest.objects.get(id=request_id, status="pending")
-        lab = req.lab
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = LabUpdateRequest.objects.get(id=request_id)
+        # Claim the request before touching the lab
+        if not approvals.transition(req, "approved", version, approved_by=user):
+            return approvals.conflict(req)
+        lab = LabStatus.objects.select_for_update().get(pk=req.lab_id)
+        before = rollups.contribution(lab)
         lab.current_occupancy = req.requested_current_occupancy
         lab.is_available = req.requested_is_available
-        lab.save()
+        rollups.save(lab, before)
+        _spaces_changed()
         
-        req.status = "approved"
-        req.approved_by = user
-        req.save()
+        events.record("lab_update_request", req.id, "approved", actor=user, lab_id=lab.id, building=lab.building)
+        _notify(req.requested_by, "Lab update approved", f"Your update request for {lab.name} was approved.")
         
         return JsonResponse({"message": "Lab update approved"})
     except LabUpdateRequest.DoesNotExist:
@@ -799,6 +1066,7 @@ def approve_lab_update(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def reject_lab_update(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -807,11 +1075,16 @@ def reject_lab_update(request, request_id):
     
     try:
         data = json.loads(request.body)
-        req = LabUpdateRequest.objects.get(id=request_id, status="pending")
-        req.status = "rejected"
-        req.approved_by = user
-        req.rejection_reason = data.get("rejection_reason", "")
-        req.save()
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = LabUpdateRequest.objects.get(id=request_id)
+        if not approvals.transition(req, "rejected", version, approved_by=user, rejection_reason=data.get("rejection_reason", "")):
+            return approvals.conflict(req)
+        events.record("lab_update_request", req.id, "rejected", actor=user, reason=req.rejection_reason)
+        _notify(req.requested_by, "Lab update rejected", f"Your lab update request was rejected. {req.rejection_reason}".strip())
         return JsonResponse({"message": "Lab update rejected"})
     except LabUpdateRequest.DoesNotExist:
         return JsonResponse({"message": "Update request not found"}, status=404)
@@ -822,6 +1095,8 @@ def reject_lab_update(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@idempotent("create_room_request")
+@transactional
 def create_room_request(request):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -837,7 +1112,12 @@ def create_room_request(request):
         start_time = time.fromisoformat(data["start_time"]) if "start_time" in data else time(9, 0)
         end_time = time.fromisoformat(data["end_time"]) if "end_time" in data else time(10, 0)
         
-        room_req = RoomRequest.objects.create(
+        try:
+            frequency, until, exceptions = recurrence.parse_rule(data.get("recurrence"), requested_date)
+        except (recurrence.RecurrenceError, ValueError, TypeError) as e:
+            return JsonResponse({"message": f"Invalid recurrence: {str(e)}"}, status=400)
+        
+        room_req = RoomRequest(
             requested_by=user,
             room_type=room_type,
             classroom_id=room_id if room_type == "classroom" and room_id else None,
@@ -847,7 +1127,20 @@ def create_room_request(request):
             requested_date=requested_date,
             start_time=start_time,
             end_time=end_time,
+            recurrence=frequency,
+            recurrence_until=until,
+            recurrence_exceptions=exceptions,
         )
+        if room_id and room_type in ["classroom", "lab"]:
+            room_model = ClassroomStatus if room_type == "classroom" else LabStatus
+            if not room_model.objects.filter(id=room_id).exists():
+                return JsonResponse({"message": "Room not found"}, status=404)
+            conflicts = recurrence.find_conflicts(room_req, room_type, room_id)
+            if conflicts:
+                return _conflicts_response(conflicts)
+        room_req.save()
+        resultcache.invalidate("room_requests", room_req.campus_id, user.id)
+        events.record("room_request", room_req.id, "created", actor=user, room_type=room_type, building=_room_building(room_req), recurrence=frequency)
         
         return JsonResponse({
             "request": {
@@ -855,6 +1148,7 @@ def create_room_request(request):
                 "room_type": room_req.room_type,
                 "purpose": room_req.purpose,
                 "status": room_req.status,
+                "version": room_req.version,
             },
             "message": "Room request created successfully"
         })
@@ -872,30 +1166,77 @@ def list_room_requests(request):
         requests = RoomRequest.objects.all().order_by("-created_at")
     else:
         requests = RoomRequest.objects.filter(requested_by=user).order_by("-created_at")
+    requests = requests.select_related("requested_by", "classroom", "lab", "approved_by")
     
-    return JsonResponse({
-        "requests": [{
-            "id": req.id,
-            "requested_by": req.requested_by.email,
-            "room_type": req.room_type,
-            "classroom_id": req.classroom.id if req.classroom else None,
-            "classroom_name": req.classroom.name if req.classroom else None,
-            "lab_id": req.lab.id if req.lab else None,
-            "lab_name": req.lab.name if req.lab else None,
-            "purpose": req.purpose,
-            "expected_attendees": req.expected_attendees,
-            "requested_date": req.requested_date.isoformat(),
-            "start_time": req.start_time.isoformat(),
-            "end_time": req.end_time.isoformat(),
-            "status": req.status,
-            "approved_by": req.approved_by.email if req.approved_by else None,
-            "created_at": req.created_at.isoformat(),
-        } for req in requests]
+    if archive.include_archived(request):
+        owner = None if prof.role in ["manager", "admin"] else user
+        requests = archive.with_archived(list(requests), "roomrequest", campus=request.campus, owner=owner, related=["requested_by", "classroom", "lab", "approved_by"])
+        return JsonResponse({"requests": [_room_request_to_dict(req) for req in requests]})
+    
+    return resultcache.respond("room_requests", request, resultcache.scope_for(user, prof.role), lambda: {
+        "requests": [_room_request_to_dict(req) for req in requests]
     })
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def room_request_occurrences(request):
+    """Approved bookings expanded into single occurrences for a date window."""
+    try:
+        start = date.fromisoformat(request.GET["from"])
+        end = date.fromisoformat(request.GET.get("to") or request.GET["from"])
+    except (KeyError, ValueError):
+        return JsonResponse({"message": "from (and optionally to) must be ISO dates"}, status=400)
+    if end < start or (end - start).days > 366:
+        return JsonResponse({"message": "The window must be between 1 and 366 days"}, status=400)
+    
+    bookings = RoomRequest.objects.filter(status="approved", requested_date__lte=end).filter(
+        Q(recurrence="", requested_date__gte=start) | Q(recurrence_until__gte=start)
+    ).select_related("classroom", "lab")
+    room_type = request.GET.get("room_type")
+    room_id = request.GET.get("room_id")
+    if room_type:
+        bookings = bookings.filter(room_type=room_type)
+    if room_type and room_id:
+        bookings = bookings.filter(**{"classroom_id" if room_type == "classroom" else "lab_id": room_id})
+    
+    bookings = list(bookings)
+    by_id = {req.id: req for req in bookings}
+    occurrences = recurrence.expand(bookings, start, end)
+    for occ in occurrences:
+        req = by_id[occ["request_id"]]
+        room = req.classroom if req.room_type == "classroom" else req.lab
+        occ["room_type"] = req.room_type
+        occ["room_id"] = room.id if room else None
+        occ["room_name"] = room.name if room else None
+    return JsonResponse({"from": start.isoformat(), "to": end.isoformat(), "occurrences": occurrences})
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def building_schedule(request):
+    """Rooms x 15-minute slots of approved bookings for one building."""
+    building = request.GET.get("building", "").strip()
+    if not building:
+        return JsonResponse({"message": "building is required"}, status=400)
+    try:
+        start = date.fromisoformat(request.GET["from"])
+        end = date.fromisoformat(request.GET.get("to") or request.GET["from"])
+    except (KeyError, ValueError):
+        return JsonResponse({"message": "from (and optionally to) must be ISO dates"}, status=400)
+    if end < start or (end - start).days >= timetable.MAX_DAYS:
+        return JsonResponse({"message": f"The window must be between 1 and {timetable.MAX_DAYS} days"}, status=400)
+    encoding = request.GET.get("encoding", "rle")
+    if encoding not in ["rle", "bitmap"]:
+        return JsonResponse({"message": "encoding must be rle or bitmap"}, status=400)
+    
+    grid = timetable.build(building, start, end)
+    return JsonResponse(timetable.encode(grid, encoding), json_dumps_params={"separators": (",", ":")})
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def approve_room_request(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -905,23 +1246,42 @@ def approve_room_request(request, request_id):
     try:
         data = json.loads(request.body)
         room_id = data.get("room_id")
-        
-        req = RoomRequest.objects.get(id=request_id, status="pending")
-        
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = RoomRequest.objects.get(id=request_id)
+        room = {}
         if room_id:
             if req.room_type == "classroom":
-                req.classroom = ClassroomStatus.objects.get(id=room_id)
-                req.classroom.is_available = False
-                req.classroom.save()
+                room = {"classroom": ClassroomStatus.objects.get(id=room_id)}
             elif req.room_type == "lab":
-                req.lab = LabStatus.objects.get(id=room_id)
-                req.lab.is_available = False
-                req.lab.save()
+                room = {"lab": LabStatus.objects.get(id=room_id)}
+        
+        # Claim the request first, so a second approver gets a 409 instead
+        # of waiting for this transaction
+        if not approvals.transition(req, "approved", version, approved_by=user, approved_at=datetime.now(), **room):
+            return approvals.conflict(req)
+        
+        # Check every occurrence of the booking against approved ones
+        target_room_id = room_id or (req.classroom_id if req.room_type == "classroom" else req.lab_id)
+        if target_room_id:
+            conflicts = recurrence.find_conflicts(req, req.room_type, target_room_id)
+            if conflicts:
+                approvals.rollback()
+                return _conflicts_response(conflicts)
         
-        req.status = "approved"
-        req.approved_by = user
-        req.approved_at = datetime.now()
-        req.save()
+        reports.apply({}, reports.booking_contribution(req))
+        resultcache.invalidate("room_requests", req.campus_id, req.requested_by_id)
+        
+        # The room is only unavailable while the booking runs; the scheduler
+        # (manage.py run_scheduler) flips it at start and end. Apply it now
+        # in case the booking is already in progress.
+        if target_room_id and availability.apply([(req.room_type, int(target_room_id))], availability.local_now()):
+            _spaces_changed()
+        events.record("room_request", req.id, "approved", actor=user, room_id=room_id, building=_room_building(req))
+        _notify(req.requested_by, "Room request approved", f"Your room request for {req.requested_date.isoformat()} {req.start_time.isoformat()}-{req.end_time.isoformat()} was approved.")
         
         return JsonResponse({"message": "Room request approved"})
     except RoomRequest.DoesNotExist:
@@ -929,9 +1289,107 @@ def approve_room_request(request, request_id):
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def propose_room_assignments(request):
+    """Suggested rooms for every pending request between from and to."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can assign rooms"}, status=403)
+    try:
+        start = date.fromisoformat(request.GET["from"])
+        end = date.fromisoformat(request.GET.get("to") or request.GET["from"])
+    except (KeyError, ValueError):
+        return JsonResponse({"message": "from (and optionally to) must be ISO dates"}, status=400)
+    if end < start or (end - start).days > 366:
+        return JsonResponse({"message": "The window must be between 1 and 366 days"}, status=400)
+    
+    proposal = optimizer.propose(start, end)
+    proposal["from"] = start.isoformat()
+    proposal["to"] = end.isoformat()
+    return JsonResponse(proposal)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transactional
+def apply_room_assignments(request):
+    """Approve a batch of pending requests with the given rooms, all or nothing."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can assign rooms"}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        assignments = [(int(a["request_id"]), a["room_type"], int(a["room_id"])) for a in data.get("assignments") or []]
+    except (KeyError, TypeError, ValueError):
+        return JsonResponse({"message": "Each assignment needs request_id, room_type and room_id"}, status=400)
+    if not assignments:
+        return JsonResponse({"message": "assignments is required"}, status=400)
+    if len({a[0] for a in assignments}) != len(assignments):
+        return JsonResponse({"message": "Each request can only be assigned one room"}, status=400)
+    
+    try:
+        reqs = RoomRequest.objects.select_for_update().select_related("requested_by").in_bulk([a[0] for a in assignments])
+        rooms = {
+            "classroom": ClassroomStatus.objects.in_bulk([a[2] for a in assignments if a[1] == "classroom"]),
+            "lab": LabStatus.objects.in_bulk([a[2] for a in assignments if a[1] == "lab"]),
+        }
+        batch = []
+        for request_id, room_type, room_id in assignments:
+            req = reqs.get(request_id)
+            if req is None or req.status != "pending":
+                return JsonResponse({"message": f"Request {request_id} is not pending"}, status=409)
+            room = rooms.get(room_type, {}).get(room_id)
+            if room_type != req.room_type or room is None:
+                return JsonResponse({"message": f"Room {room_id} is not a {req.room_type}"}, status=400)
+            if room.max_capacity < req.expected_attendees:
+                return JsonResponse({"message": f"{room.name} is too small for request {req.id}"}, status=400)
+            batch.append((req, room_type, room_id))
+        
+        # Against approved bookings and against each other, in one pass
+        conflicts = optimizer.check(batch)
+        if conflicts:
+            return _conflicts_response(conflicts)
+        
+        # One UPDATE per room rather than one per request
+        by_room = {}
+        for req, room_type, room_id in batch:
+            by_room.setdefault((room_type, room_id), []).append(req.id)
+        now = datetime.now()
+        for (room_type, room_id), ids in by_room.items():
+            RoomRequest.objects.filter(id__in=ids, status="pending").update(
+                status="approved", approved_by=user, approved_at=now, updated_at=now, version=F("version") + 1,
+                **{"classroom_id" if room_type == "classroom" else "lab_id": room_id},
+            )
+        approved = [req for req, _, _ in batch]
+        for req in approved:
+            req.status = "approved"
+            resultcache.invalidate("room_requests", req.campus_id, req.requested_by_id)
+        reports.apply({}, reports.combine(reports.booking_contribution(req) for req in approved))
+        
+        if availability.apply([(room_type, room_id) for _, room_type, room_id in batch], availability.local_now()):
+            _spaces_changed()
+        for req, room_type, room_id in batch:
+            room = rooms[room_type][room_id]
+            events.record("room_request", req.id, "approved", actor=user, room_id=room_id, building=room.building)
+        jobs.enqueue_many("notify", [{
+            "user_id": req.requested_by_id,
+            "subject": "Room request approved",
+            "message": f"Your room request for {req.requested_date.isoformat()} {req.start_time.isoformat()}-{req.end_time.isoformat()} was approved.",
+        } for req in approved])
+        
+        return JsonResponse({"message": f"{len(approved)} room requests approved", "approved": [req.id for req in approved]})
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def reject_room_request(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -940,43 +1398,92 @@ def reject_room_request(request, request_id):
     
     try:
         data = json.loads(request.body)
-        req = RoomRequest.objects.get(id=request_id, status="pending")
-        req.status = "rejected"
-        req.approved_by = user
-        req.rejection_reason = data.get("rejection_reason", "")
-        req.save()
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = RoomRequest.objects.get(id=request_id)
+        if not approvals.transition(req, "rejected", version, approved_by=user, rejection_reason=data.get("rejection_reason", "")):
+            return approvals.conflict(req)
+        resultcache.invalidate("room_requests", req.campus_id, req.requested_by_id)
+        events.record("room_request", req.id, "rejected", actor=user, reason=req.rejection_reason, building=_room_building(req))
+        _notify(req.requested_by, "Room request rejected", f"Your room request for {req.requested_date.isoformat()} was rejected. {req.rejection_reason}".strip())
         return JsonResponse({"message": "Room request rejected"})
     except RoomRequest.DoesNotExist:
         return JsonResponse({"message": "Request not found"}, status=404)
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def suggest_spaces(request):
+    """Libraries, labs, classrooms and fault locations whose words start with those of ?q."""
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({"message": "limit must be an integer"}, status=400)
+    campus_id = request.campus.id if request.campus else None
+    return JsonResponse({"suggestions": suggest.get_index().search(request.GET.get("q", ""), campus_id, limit)})
+
 # Fault report endpoints
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@idempotent("create_fault")
+@rate_limit("create_fault")
+@transactional
 def create_fault(request):
     try:
         user = request.user_obj
         data = json.loads(request.body)
+        title = data.get("title", "")
+        description = data.get("description", "")
+        location = data.get("location", "")
+        
+        # Link reports of an already-open fault at the same location to it
+        canonical, minhash = dedup.find_canonical(location, title, description)
         
         fault = FaultReport.objects.create(
             reported_by=user,
-            title=data.get("title", ""),
-            description=data.get("description", ""),
-            location=data.get("location", ""),
+            title=title,
+            description=description,
+            location=location,
             severity=data.get("severity", "medium"),
             category=data.get("category", "other"),
             status="open",
+            duplicate_of=canonical,
+            minhash=minhash,
         )
+        # Duplicates are worked on through their canonical fault
+        if canonical is None:
+            assignment.assign(fault)
+        fault.sla_due_at = sla.due_at(fault)
+        fault.triage_at = triage.triage_at(fault)
+        fault.save(update_fields=["sla_due_at", "triage_at", "technician", "assigned_to"])
+        sla.record_status(fault, user, now=fault.created_at)
+        search.index_fault(fault)
+        dedup.get_index().add(fault)
+        suggest.fault_reported(fault)
+        reports.apply({}, reports.fault_contribution(fault))
+        resultcache.invalidate("faults", fault.campus_id, user.id)
+        events.record("fault", fault.id, "created", actor=user, location=location, severity=fault.severity, category=fault.category, duplicate_of=fault.duplicate_of_id)
         
         return JsonResponse({
             "fault": {
                 "id": fault.id,
                 "title": fault.title,
                 "status": fault.status,
+                "assigned_to": fault.assigned_to,
             },
-            "message": "Fault report created successfully"
+            "duplicate_of": {
+                "id": canonical.id,
+                "title": canonical.title,
+                "status": canonical.status,
+                "created_at": canonical.created_at.isoformat(),
+            } if canonical else None,
+            "message": "This looks like an already reported fault; your report was linked to it" if canonical else "Fault report created successfully"
         })
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
@@ -988,29 +1495,97 @@ def list_faults(request):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
     
+    faults = FaultReport.objects.select_related("reported_by", "image_blob")
     if prof.role in ["manager", "admin"]:
-        faults = FaultReport.objects.all().order_by("-created_at")
+        faults = faults.all().order_by("-created_at")
     else:
-        faults = FaultReport.objects.filter(reported_by=user).order_by("-created_at")
+        faults = faults.filter(reported_by=user).order_by("-created_at")
+    
+    if archive.include_archived(request):
+        owner = None if prof.role in ["manager", "admin"] else user
+        faults = archive.with_archived(list(faults), "faultreport", campus=request.campus, owner=owner, related=["reported_by", "image_blob"])
+        return JsonResponse({"faults": [_fault_to_dict(fault) for fault in faults]})
+    
+    return resultcache.respond("faults", request, resultcache.scope_for(user, prof.role), lambda: {
+        "faults": [_fault_to_dict(fault) for fault in faults]
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def search_faults(request):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    q = request.GET.get("q", "").strip()
+    try:
+        page = max(int(request.GET.get("page", 1)), 1)
+        page_size = min(max(int(request.GET.get("page_size", 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({"message": "page and page_size must be integers"}, status=400)
+    
+    # Managers and admins search every report, everyone else only their own
+    reported_by = None if prof.role in ["manager", "admin"] else user
+    total, ids = search.search_faults(q, reported_by=reported_by, limit=page_size, offset=(page - 1) * page_size)
+    faults = FaultReport.objects.select_related("reported_by", "image_blob").in_bulk(ids)
+    
+    return JsonResponse({
+        "faults": [_fault_to_dict(faults[fault_id]) for fault_id in ids if fault_id in faults],
+        "query": q,
+        "page": page,
+        "page_size": page_size,
+        "total": total,
+    })
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+def upload_fault_image(request, fault_id):
+    """Attach an image to a fault. The raw image bytes are the request body."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    try:
+        fault = FaultReport.objects.get(id=fault_id)
+    except FaultReport.DoesNotExist:
+        return JsonResponse({"message": "Fault not found"}, status=404)
+    if fault.reported_by_id != user.id and prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only the reporter, managers and admins can add images"}, status=403)
+    
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        content_length = 0
+    if content_length > settings.FAULT_IMAGE_MAX_BYTES:
+        return JsonResponse({"message": f"Image is larger than {settings.FAULT_IMAGE_MAX_BYTES} bytes"}, status=413)
+    
+    try:
+        # Read the body straight from the stream; never touch request.body
+        blob, created = storage.store_stream(request)
+    except storage.UploadError as e:
+        return JsonResponse({"message": str(e)}, status=e.status)
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+    
+    fault.image_blob = blob
+    fault.image = storage.image_url(blob)
+    fault.save(update_fields=["image_blob", "image", "updated_at"])
+    resultcache.invalidate("faults", fault.campus_id, fault.reported_by_id)
     
     return JsonResponse({
-        "faults": [{
+        "fault": {
             "id": fault.id,
-            "title": fault.title,
-            "description": fault.description,
-            "location": fault.location,
-            "severity": fault.severity,
-            "category": fault.category,
-            "status": fault.status,
-            "assigned_to": fault.assigned_to,
-            "reported_by": fault.reported_by.email,
-            "created_at": fault.created_at.isoformat(),
-        } for fault in faults]
+            "image": fault.image,
+            "thumbnail_url": storage.thumbnail_url(blob),
+        },
+        "deduplicated": not created,
+        "message": "Image uploaded successfully"
     })
 
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def update_fault(request, fault_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -1020,17 +1595,51 @@ def update_fault(request, fault_id):
     try:
         fault = FaultReport.objects.get(id=fault_id)
         data = json.loads(request.body)
+        before = reports.fault_contribution(fault)
+        previous_status = fault.status
+        previous_technician = assignment.workload_of(fault)
+        now = timezone.now()
+        
+        technician = None
+        if data.get("technician_id"):
+            try:
+                technician = Technician.objects.filter(id=int(data["technician_id"])).first()
+            except (TypeError, ValueError):
+                return JsonResponse({"message": "technician_id must be an integer"}, status=400)
+            if technician is None:
+                return JsonResponse({"message": "Technician not found"}, status=404)
+            if technician.campus_id != fault.campus_id:
+                return JsonResponse({"message": "The technician works on a different campus than the fault"}, status=400)
         
         if "status" in data:
             fault.status = data["status"]
-        if "assigned_to" in data:
+            if fault.status not in reports.SETTLED_STATUSES:
+                fault.resolved_at = None
+            elif previous_status not in reports.SETTLED_STATUSES:
+                fault.resolved_at = now
+        if "technician_id" in data:
+            fault.technician = technician
+            fault.assigned_to = technician.name if technician else ""
+        elif "assigned_to" in data:
+            # Someone outside the roster
+            fault.technician = None
             fault.assigned_to = data["assigned_to"]
         if "severity" in data:
             fault.severity = data["severity"]
         if "category" in data:
             fault.category = data["category"]
         
+        fault.sla_due_at = sla.due_at(fault)
+        fault.triage_at = triage.triage_at(fault)
         fault.save()
+        if fault.status != previous_status:
+            sla.record_status(fault, user, now=now)
+        assignment.track(previous_technician, assignment.workload_of(fault))
+        reports.apply(before, reports.fault_contribution(fault))
+        search.index_fault(fault)
+        dedup.get_index().sync(fault)
+        resultcache.invalidate("faults", fault.campus_id, fault.reported_by_id)
+        events.record("fault", fault.id, "updated", actor=user, changes=_changes(data, ["status", "assigned_to", "technician_id", "severity", "category"]))
         
         return JsonResponse({
             "fault": {
@@ -1045,6 +1654,305 @@ def update_fault(request, fault_id):
     except Exception as e:
         return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def next_faults(request):
+    """The ?limit (default 10) open faults to pick up next, by age weighted by severity and category."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can triage faults"}, status=403)
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 100)
+    except ValueError:
+        return JsonResponse({"message": "limit must be an integer"}, status=400)
+    
+    now = timezone.now()
+    return JsonResponse({
+        "faults": [
+            {**_fault_to_dict(f), "triage_score": triage.score(f, now)}
+            for f in triage.next_faults(request.campus, limit)
+        ],
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def fault_history(request, fault_id):
+    """A fault's status history with the time spent in each status, and its SLA."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    
+    # Archived faults keep their history
+    fault = FaultReport.objects.filter(id=fault_id).first() or archive.get("faultreport", fault_id)
+    if fault is None or (request.campus is not None and fault.campus_id != request.campus.id):
+        return JsonResponse({"message": "Fault not found"}, status=404)
+    if prof.role not in ["manager", "admin"] and fault.reported_by_id != user.id:
+        return JsonResponse({"message": "Fault not found"}, status=404)
+    
+    now = timezone.now()
+    return JsonResponse({
+        "fault_id": fault.id,
+        "status": fault.status,
+        "history": sla.history(fault, now),
+        "sla": {
+            "target_hours": sla.target(fault.severity),
+            "due_at": sla.deadline(fault).isoformat(),
+            "breached": sla.breached(fault, now),
+        },
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def fault_sla_breaches(request):
+    """Unsettled faults past their SLA deadline, and those due within ?within_hours (default 24)."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view SLA breaches"}, status=403)
+    try:
+        within = float(request.GET.get("within_hours", 24))
+        limit = min(max(int(request.GET.get("limit", 200)), 1), 1000)
+    except ValueError:
+        return JsonResponse({"message": "within_hours and limit must be numbers"}, status=400)
+    if within < 0:
+        return JsonResponse({"message": "within_hours cannot be negative"}, status=400)
+    
+    now = timezone.now()
+    faults = list(sla.breaches(request.campus, timedelta(hours=within), now).select_related("image_blob")[:limit])
+    return JsonResponse({
+        "now": now.isoformat(),
+        "within_hours": within,
+        "breached": [_fault_to_dict(f) for f in faults if f.sla_due_at <= now],
+        "due_soon": [_fault_to_dict(f) for f in faults if f.sla_due_at > now],
+    })
+
+# Technician endpoints
+FAULT_CATEGORIES = [choice[0] for choice in FaultReport.CATEGORY_CHOICES]
+
+def _skills(data):
+    skills = data.get("skills") or []
+    if not isinstance(skills, list) or any(skill not in FAULT_CATEGORIES for skill in skills):
+        raise ValueError(f"skills must be a list of: {', '.join(FAULT_CATEGORIES)}")
+    return sorted(set(skills))
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def list_technicians(request):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view technicians"}, status=403)
+    
+    technicians = Technician.objects.order_by("name")
+    return JsonResponse({"technicians": [_technician_to_dict(t) for t in technicians]})
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transactional
+def create_technician(request):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can add technicians"}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        if not data.get("name"):
+            return JsonResponse({"message": "name is required"}, status=400)
+        try:
+            skills = _skills(data)
+        except ValueError as e:
+            return JsonResponse({"message": str(e)}, status=400)
+        tech = Technician.objects.create(
+            name=data["name"],
+            email=data.get("email", ""),
+            skills=skills,
+            on_shift=data.get("on_shift", True),
+        )
+        events.record("technician", tech.id, "created", actor=user, name=tech.name, skills=skills)
+        return JsonResponse({"technician": _technician_to_dict(tech), "message": "Technician added successfully"})
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+@require_auth
+@transactional
+def update_technician(request, technician_id):
+    """Change a technician's details; taking them off shift hands their open faults to others."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can update technicians"}, status=403)
+    
+    try:
+        try:
+            tech = Technician.objects.select_for_update().get(id=technician_id)
+        except Technician.DoesNotExist:
+            return JsonResponse({"message": "Technician not found"}, status=404)
+        
+        data = json.loads(request.body)
+        was_on_shift = tech.on_shift
+        if "skills" in data:
+            try:
+                tech.skills = _skills(data)
+            except ValueError as e:
+                return JsonResponse({"message": str(e)}, status=400)
+        for field in ("name", "email", "on_shift"):
+            if field in data:
+                setattr(tech, field, data[field])
+        # open_faults is kept by assignment.py and left alone here
+        tech.save(update_fields=[field for field in ("name", "email", "skills", "on_shift") if field in data] + ["updated_at"])
+        
+        reassigned = []
+        if was_on_shift and not tech.on_shift:
+            reassigned = assignment.reassign(tech)
+            for fault in reassigned:
+                resultcache.invalidate("faults", fault.campus_id, fault.reported_by_id)
+                events.record("fault", fault.id, "reassigned", actor=user, from_technician=tech.id, technician_id=fault.technician_id)
+        events.record("technician", tech.id, "updated", actor=user, changes=_changes(data, ["name", "email", "skills", "on_shift"]))
+        tech.refresh_from_db(fields=["open_faults"])
+        
+        return JsonResponse({
+            "technician": _technician_to_dict(tech),
+            "reassigned": [{"id": f.id, "technician_id": f.technician_id, "assigned_to": f.assigned_to} for f in reassigned],
+            "message": "Technician updated successfully",
+        })
+    except Exception as e:
+        return JsonResponse({"message": f"Error: {str(e)}"}, status=500)
+
+# Export endpoints
+def _export(request, dataset):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can export data"}, status=403)
+    
+    try:
+        content_type, extension, chunks = export.stream(dataset, request.GET.get("format", "csv"), request.GET)
+    except export.ExportError as e:
+        return JsonResponse({"message": str(e)}, status=e.status)
+    
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    filename = f"{dataset.replace('_', '-')}-{date.today().isoformat()}.{extension}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def export_faults(request):
+    """Stream fault reports as CSV or Arrow (?format=csv|arrow)."""
+    return _export(request, "faults")
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def export_room_requests(request):
+    """Stream room requests as CSV or Arrow (?format=csv|arrow)."""
+    return _export(request, "room_requests")
+
+# Report endpoints
+REPORT_GROUPS = ("category", "severity")
+
+def _report_range(request):
+    """(start, end) from ?from and ?to as ISO dates; the last 12 weeks by default."""
+    try:
+        end = date.fromisoformat(request.GET["to"]) if request.GET.get("to") else date.today()
+        start = date.fromisoformat(request.GET["from"]) if request.GET.get("from") else end - timedelta(weeks=12)
+    except ValueError:
+        raise ValueError("from and to must be ISO dates")
+    if end < start or (end - start).days > 3660:
+        raise ValueError("The range must be between 1 day and 10 years")
+    return start, end
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def report_faults(request):
+    """Faults reported and resolved per week, by category and severity (?group= narrows it)."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view reports"}, status=403)
+    try:
+        start, end = _report_range(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    group = tuple(g for g in request.GET.get("group", ",".join(REPORT_GROUPS)).split(",") if g)
+    if any(g not in REPORT_GROUPS for g in group):
+        return JsonResponse({"message": f"group must be made of: {', '.join(REPORT_GROUPS)}"}, status=400)
+    return JsonResponse({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "weeks": reports.fault_weekly(request.campus, start, end, group),
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def report_fault_resolution(request):
+    """Mean time to resolution over the range, overall or per ?group=category|severity."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view reports"}, status=403)
+    try:
+        start, end = _report_range(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    group = request.GET.get("group") or None
+    if group is not None and group not in REPORT_GROUPS:
+        return JsonResponse({"message": f"group must be one of: {', '.join(REPORT_GROUPS)}"}, status=400)
+    return JsonResponse({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "resolution": reports.fault_resolution(request.campus, start, end, group),
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def report_fault_time_in_state(request):
+    """Mean and longest hours faults spent in each status, for stints that ended in the range."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view reports"}, status=403)
+    try:
+        start, end = _report_range(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    return JsonResponse({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "states": sla.time_in_state(request.campus, start, end),
+    })
+
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def report_room_utilization(request):
+    """Booked versus bookable room hours per week and room type."""
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role not in ["manager", "admin"]:
+        return JsonResponse({"message": "Only managers and admins can view reports"}, status=403)
+    try:
+        start, end = _report_range(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    return JsonResponse({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "weeks": reports.room_utilization(request.campus, start, end),
+    })
+
 # Admin endpoints
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -1089,6 +1997,11 @@ def admin_stats(request):
     all_faults = FaultReport.objects.all()
     open_faults = all_faults.filter(status__in=["open", "in_progress"]).count()
     total_faults = all_faults.count()
+    # Settled faults moved to the archive still count towards the total
+    archived_faults = ArchivedRecord.objects.filter(kind="faultreport")
+    if request.campus is not None:
+        archived_faults = archived_faults.filter(campus=request.campus)
+    total_faults += archived_faults.count()
     
     # Count pending role requests
     pending_role_requests = RoleRequest.objects.filter(status="pending").count()
@@ -1108,6 +2021,36 @@ def admin_stats(request):
         "pending_role_requests": pending_role_requests,
     })
 
+@csrf_exempt
+@require_http_methods(["GET"])
+@require_auth
+def admin_activity(request):
+    user = request.user_obj
+    prof, _ = Profile.objects.get_or_create(user=user)
+    if prof.role != "admin":
+        return JsonResponse({"message": "Only admins can view activity"}, status=403)
+    
+    # The read models are kept up to date by the project_events job
+    return JsonResponse({
+        "buildings": [{
+            "building": b.building,
+            "room_requests": b.room_requests,
+            "bookings_approved": b.bookings_approved,
+            "bookings_rejected": b.bookings_rejected,
+            "space_updates": b.space_updates,
+        } for b in BuildingActivity.objects.order_by("building")],
+        "users": [{
+            "user_id": a.user_id,
+            "email": a.user.email,
+            "faults_reported": a.faults_reported,
+            "room_requests": a.room_requests,
+            "role_requests": a.role_requests,
+            "update_requests": a.update_requests,
+            "decisions_made": a.decisions_made,
+            "last_active_at": a.last_active_at.isoformat() if a.last_active_at else None,
+        } for a in UserActivity.objects.select_related("user").order_by("-last_active_at")],
+    })
+
 @csrf_exempt
 @require_http_methods(["GET"])
 @require_auth
@@ -1119,6 +2062,8 @@ def admin_role_requests(request):
     
     # Get all role requests, not just pending
     requests = RoleRequest.objects.all().order_by("-created_at")
+    if archive.include_archived(request):
+        requests = archive.with_archived(list(requests), "rolerequest", related=["user"])
     return JsonResponse({
         "requests": [{
             "id": req.id,
@@ -1126,6 +2071,7 @@ def admin_role_requests(request):
             "requested_role": req.requested_role,
             "reason": req.reason or "",
             "status": req.status,
+            "version": req.version,
             "manager_type": Profile.objects.get(user=req.user).manager_type if Profile.objects.filter(user=req.user).exists() else None,  # Get manager_type from Profile
             "rejection_reason": getattr(req, 'rejection_reason', None) or None,
             "requested_at": req.created_at.isoformat() if hasattr(req, 'created_at') and req.created_at else None,
@@ -1137,6 +2083,7 @@ def admin_role_requests(request):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def admin_approve_role(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -1144,7 +2091,15 @@ def admin_approve_role(request, request_id):
         return JsonResponse({"message": "Only admins can approve roles"}, status=403)
     
     try:
-        req = RoleRequest.objects.get(id=request_id, status="pending")
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = RoleRequest.objects.get(id=request_id)
+        # Claim the request before changing the role
+        if not approvals.transition(req, "approved", version):
+            return approvals.conflict(req)
         user_prof, _ = Profile.objects.get_or_create(user=req.user)
         
         # Update the role
@@ -1157,15 +2112,8 @@ def admin_approve_role(request, request_id):
         
         user_prof.save()
         
-        # Update request status
-        req.status = "approved"
-        # Try to set approved_by if the field exists
-        try:
-            req.approved_by = user
-            req.approved_at = datetime.now()
-        except:
-            pass  # Field might not exist in older migrations
-        req.save()
+        events.record("role_request", req.id, "approved", actor=user, requested_role=req.requested_role)
+        _notify(req.user, "Role request approved", f"You are now a {req.requested_role}.")
         
         print(f"DEBUG: Role approved - User {req.user.email} is now {req.requested_role}")
         if user_prof.manager_type:
@@ -1186,6 +2134,7 @@ def admin_approve_role(request, request_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 @require_auth
+@transactional
 def admin_reject_role(request, request_id):
     user = request.user_obj
     prof, _ = Profile.objects.get_or_create(user=user)
@@ -1193,9 +2142,16 @@ def admin_reject_role(request, request_id):
         return JsonResponse({"message": "Only admins can reject roles"}, status=403)
     
     try:
-        req = RoleRequest.objects.get(id=request_id, status="pending")
-        req.status = "rejected"
-        req.save()
+        version = approvals.expected_version(request)
+    except ValueError as e:
+        return JsonResponse({"message": str(e)}, status=400)
+    
+    try:
+        req = RoleRequest.objects.get(id=request_id)
+        if not approvals.transition(req, "rejected", version):
+            return approvals.conflict(req)
+        events.record("role_request", req.id, "rejected", actor=user, requested_role=req.requested_role)
+        _notify(req.user, "Role request rejected", f"Your request for the {req.requested_role} role was rejected.")
         return JsonResponse({"message": "Role rejected"})
     except RoleRequest.DoesNotExist:
         return JsonResponse({"message": "Request not found"}, status=404)
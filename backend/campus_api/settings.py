@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,6 +26,7 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
+    "accounts.routing.ReplicaMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
@@ -54,15 +56,94 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Take the write lock when a transaction starts, so concurrent
+        # writers queue up (timeout seconds) instead of failing with
+        # "database is locked" when a read upgrades to a write
+        "OPTIONS": {"transaction_mode": "IMMEDIATE", "timeout": 20},
     }
 }
 
+# Read replicas for GET requests (see accounts/routing.py). Locally, point
+# DB_REPLICAS at comma-separated SQLite files and run manage.py sync_replicas.
+DATABASE_REPLICAS = []
+for i, path in enumerate(p for p in os.environ.get("DB_REPLICAS", "").split(",") if p.strip()):
+    alias = f"replica{i + 1}"
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["accounts.routing.DatabaseRouter"]
+# Users read from the primary for this long after they write
+REPLICA_STICKY_SECONDS = 5
+
+# Campuses whose spaces, requests and faults live in their own database,
+# e.g. {"North campus": "north"} with a matching DATABASES["north"] entry
+# migrated by `manage.py migrate --database north` (see accounts/campuses.py)
+CAMPUS_DATABASES = {}
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
 USE_I18N = True
 USE_TZ = True
 
 STATIC_URL = "static/"
+
+# Local state shared by the worker processes of one deployment
+RUNTIME_DIR = BASE_DIR / "run"
+
+# Cached list responses (see accounts/resultcache.py). RESULT_CACHE picks the
+# backend: "file" (shared by the workers of one machine), "redis" (shared by
+# every machine, REDIS_URL) or "locmem" (a single worker process only)
+RESULT_CACHE_BACKENDS = {
+    "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "results"},
+    "file": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": str(RUNTIME_DIR / "results")},
+    "redis": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": os.environ.get("REDIS_URL", "redis://127.0.0.1:6379/1")},
+}
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "results": RESULT_CACHE_BACKENDS[os.environ.get("RESULT_CACHE", "file")],
+}
+
+# Settled faults and requests older than this move to the archive
+# (manage.py archive_settled, see accounts/archive.py)
+ARCHIVE_AFTER_DAYS = 180
+
+# Bookable time per room for the utilization report (accounts/reports.py):
+# Monday to Friday, 12 hours a day
+REPORT_OPEN_WEEKDAYS = [0, 1, 2, 3, 4]
+REPORT_OPEN_MINUTES_PER_DAY = 12 * 60
+
+# Hours a fault may stay unresolved, by severity (see accounts/sla.py)
+FAULT_SLA_HOURS = {"critical": 4, "high": 24, "medium": 72, "low": 168}
+
+# Triage queue head start, in hours of age, by severity and by category:
+# a critical fault ranks like one reported 72 hours earlier (accounts/triage.py)
+FAULT_TRIAGE_WEIGHTS = {
+    "severity": {"critical": 72, "high": 24, "medium": 8, "low": 0},
+    "category": {"electrical": 6, "plumbing": 6, "hvac": 4, "equipment": 2, "furniture": 0, "other": 0},
+}
+
+# Stored responses to POSTs sent with an Idempotency-Key header are
+# replayed to retries for this long (see accounts/idempotency.py)
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+
+# Token buckets per user, client IP and endpoint (see accounts/ratelimit.py)
+RATE_LIMITS = {
+    "login": {"user": "10/min", "ip": "30/min"},
+    "create_fault": {"user": "10/min", "ip": "30/min", "endpoint": "300/min"},
+    "library_update": {"user": "30/min", "ip": "60/min", "endpoint": "600/min"},
+}
+
+# Uploaded fault images (content-addressed, see accounts/storage.py)
+MEDIA_URL = "/media/"
+MEDIA_ROOT = BASE_DIR / "media"
+FAULT_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+# Notification mail is sent by the run_jobs worker
+EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+DEFAULT_FROM_EMAIL = "campus-hub@localhost"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # ✅ Allow React
@@ -85,6 +166,7 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
     'Authorization',  # Explicitly allow capitalized version
 ]
 
@@ -99,7 +181,7 @@ CORS_ALLOW_METHODS = [
 ]
 
 # Expose Authorization header in response
-CORS_EXPOSE_HEADERS = ['authorization', 'Authorization']
+CORS_EXPOSE_HEADERS = ['authorization', 'Authorization', 'Idempotent-Replayed', 'Retry-After']
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [],
@@ -0,0 +1,37 @@
+"""
+API-only settings profile.
+
+The /api/ routes are csrf_exempt JSON views with JWT auth, so this profile
+drops what only the admin site and HTML pages need: the admin, sessions,
+messages, staticfiles and rest_framework apps, templates, and the session,
+CSRF, auth, messages and clickjacking middleware. CommonMiddleware stays,
+since it is what checks the Host header against ALLOWED_HOSTS. Serve it with
+campus_api.wsgi_api or campus_api.asgi_api; use the full settings for
+migrations and the admin site.
+
+`manage.py benchmark_profiles` compares the two profiles.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+
+    "corsheaders",
+
+    "accounts",
+]
+
+MIDDLEWARE = [
+    "corsheaders.middleware.CorsMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    # Calls request.get_host(), which is what enforces ALLOWED_HOSTS
+    "django.middleware.common.CommonMiddleware",
+    "accounts.routing.ReplicaMiddleware",
+]
+
+ROOT_URLCONF = "campus_api.urls_api"
+
+TEMPLATES = []
+
+WSGI_APPLICATION = "campus_api.wsgi_api.application"
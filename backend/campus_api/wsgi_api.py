@@ -0,0 +1,16 @@
+"""
+WSGI entry point for the API-only settings profile (campus_api.settings_api).
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'campus_api.settings_api')
+
+application = get_wsgi_application()
+
+# Import the URLconf and views now rather than on the first request, so a
+# preloading server (gunicorn --preload) forks workers that share them
+get_resolver().url_patterns